@@ -0,0 +1,90 @@
+"""Throughput benchmark of DatasetParser on the example datasets.
+
+Compares the original row parser (csv.DictReader and datetime.strptime() per tweet) with the current
+read(), read_batches() and read_chunks() paths. Results are printed as JSON lines, one per dataset
+and method:
+
+    python -m benchmarks.model.benchmark_dataset_parser
+    python -m benchmarks.model.benchmark_dataset_parser --repeats 20 --output parser.jsonl
+"""
+import argparse
+import csv
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable
+
+from src.model.datasets import DatasetParser, TweetData
+from src.server import PATHS
+
+DATASETS: list[str] = ["example_tweets.csv", "example_articles.csv"]
+
+
+def legacy_read(parser: DatasetParser) -> int:
+    """Parse the file the way DatasetParser.read() did before the fast timestamp parser."""
+    rows: int = 0
+    with open(parser.file_path, newline="", encoding="utf-8") as csvfile:
+        reader = csv.DictReader(csvfile, dialect=parser.dialect or "excel")
+        for row in reader:
+            row.pop("", "")
+            data = parser.data_type(**row)
+            if isinstance(data, TweetData):
+                datetime.strptime(data.datetime, "%a %b %d %X PDT %Y")
+            rows += 1
+    return rows
+
+
+def methods() -> dict[str, Callable[[DatasetParser], int]]:
+    """Return benchmarked parsing methods, each returning the number of parsed rows."""
+    return {
+        "legacy_read": legacy_read,
+        "read": lambda parser: sum(1 for _ in parser.read()),
+        "read_batches": lambda parser: sum(len(batch) for batch in parser.read_batches()),
+        "read_chunks": lambda parser: sum(len(chunk) for chunk in parser.read_chunks(1 << 20, 1)),
+    }
+
+
+def run(dataset: str, method: str, repeats: int) -> dict[str, Any]:
+    """Measure rows per second of a single method."""
+    parser: DatasetParser = DatasetParser(PATHS.DATASETS + dataset)
+    function: Callable[[DatasetParser], int] = methods()[method]
+    rows: int = function(parser)  # warm up caches and lazy imports
+
+    timings: list[float] = []
+    for _ in range(repeats):
+        start: float = time.perf_counter()
+        function(parser)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "dataset": dataset,
+        "method": method,
+        "rows": rows,
+        "time_median_ms": statistics.median(timings) * 1000,
+        "rows_per_sec": rows / statistics.median(timings),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--output", help="write JSON lines to this file as well")
+    args = parser.parse_args()
+
+    results: list[dict[str, Any]] = []
+    for dataset in DATASETS:
+        for method in methods():
+            results.append(run(dataset, method, args.repeats))
+            print(json.dumps(results[-1]), flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(result) + "\n" for result in results)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
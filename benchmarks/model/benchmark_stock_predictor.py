@@ -0,0 +1,201 @@
+"""Training and inference benchmark of the StockPredictor GRU model.
+
+Every case trains the model from scratch in a fresh process with fixed seeds and then measures the
+latency of 7-day forecasts. Results are printed as JSON lines, one per case:
+
+    python -m benchmarks.model.benchmark_stock_predictor --output bench.jsonl
+    python -m benchmarks.model.benchmark_stock_predictor --baseline bench.jsonl
+
+With --baseline the run fails (exit code 1) if any metric is worse than the baseline by more than
+--tolerance (relative).
+"""
+import argparse
+import dataclasses
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+import torch
+
+from src.model import StockPredictorConfig, StockPredictorManager
+from src.server import PATHS
+
+SEED: int = 2137
+
+# metric name -> True if higher is better
+METRICS: dict[str, bool] = {
+    "samples_per_sec": True,
+    "epoch_time_mean": False,
+    "peak_rss_mb": False,
+    "inference_p50_ms": False,
+    "inference_p99_ms": False,
+    "final_val_loss": False,
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class BenchmarkCase:
+    """Single benchmark configuration."""
+
+    dataset: str
+    history_length: int
+    hidden_dim: int = StockPredictorConfig.hidden_dim
+    num_layers: int = StockPredictorConfig.num_layers
+    batch_size: int = StockPredictorConfig.batch_size
+
+    @property
+    def name(self) -> str:
+        return (
+            f"{self.dataset}-n{self.history_length}-h{self.hidden_dim}"
+            f"-l{self.num_layers}-b{self.batch_size}"
+        )
+
+
+class InMemoryStockPredictorManager(StockPredictorManager):
+    """StockPredictorManager reading prices from arrays instead of the database."""
+
+    def __init__(self, config: StockPredictorConfig, dates: np.ndarray, values: np.ndarray):
+        super().__init__(config)
+        self.dates: np.ndarray = dates
+        self.values: np.ndarray = values.astype(np.float32).reshape(-1, 1)
+
+    def _get_data(self) -> tuple[np.ndarray, np.ndarray]:
+        return self.dates, self.values
+
+    def _get_newest_dates(self) -> tuple[np.ndarray, np.ndarray]:
+        newest = slice(None, -self.config.seq_length - 1, -1)
+        return self.dates[newest], self.values[newest]
+
+
+def load_dataset(name: str, length: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return last `length` (dates, values) of a named dataset."""
+    if name == "synthetic":
+        rng = np.random.default_rng(SEED)
+        values = 100.0 * np.exp(np.cumsum(rng.normal(0.0005, 0.03, length)))
+        dates = np.datetime64("2013-04-29") + np.arange(length).astype("timedelta64[D]")
+        return dates, values
+
+    if name == "bitcoin":
+        data = pd.read_csv(f"{PATHS.DATASETS}coin_Bitcoin.csv")
+        dates = data["Date"].str[:10].to_numpy(dtype="datetime64[D]")
+        values = data[["High", "Low", "Open", "Close"]].mean(axis=1).to_numpy()
+        return dates[-length:], values[-length:]
+
+    raise ValueError(f"Unknown dataset: {name}")
+
+
+def run_case(case: BenchmarkCase, max_epochs: int, predict_repeats: int) -> dict[str, Any]:
+    """Train and query the model for a single case, return its metrics."""
+    torch.manual_seed(SEED)
+    np.random.seed(SEED)
+
+    config = dataclasses.replace(
+        StockPredictorConfig(),
+        hidden_dim=case.hidden_dim,
+        num_layers=case.num_layers,
+        batch_size=case.batch_size,
+        max_epochs=max_epochs,
+    )
+    manager = InMemoryStockPredictorManager(
+        config, *load_dataset(case.dataset, case.history_length)
+    )
+
+    manager.train_model()
+    stats = manager.training_stats
+
+    latencies: list[float] = []
+    for _ in range(predict_repeats):
+        start = time.perf_counter()
+        manager.predict_values(days=7)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "case": case.name,
+        **dataclasses.asdict(case),
+        "epochs": stats.epochs,
+        "epoch_time_mean": stats.total_time / max(stats.epochs, 1),
+        "samples_per_sec": stats.samples_per_second,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "inference_p50_ms": float(np.percentile(latencies, 50)),
+        "inference_p99_ms": float(np.percentile(latencies, 99)),
+        "final_val_loss": stats.final_val_loss,
+    }
+
+
+def default_cases(history_length: int) -> list[BenchmarkCase]:
+    """One-factor-at-a-time variations around the default configuration."""
+    cases: list[BenchmarkCase] = []
+    for dataset in ["synthetic", "bitcoin"]:
+        base = BenchmarkCase(dataset, history_length)
+        cases.append(base)
+        cases += [dataclasses.replace(base, hidden_dim=dim) for dim in (64, 128)]
+        cases += [dataclasses.replace(base, num_layers=layers) for layers in (1, 3)]
+        cases += [dataclasses.replace(base, batch_size=size) for size in (64, 128)]
+        cases += [dataclasses.replace(base, history_length=history_length // 2)]
+    return cases
+
+
+def compare(
+    results: list[dict[str, Any]], baseline: list[dict[str, Any]], tolerance: float
+) -> list[str]:
+    """Return descriptions of metrics which regressed against the baseline."""
+    baseline_by_case = {entry["case"]: entry for entry in baseline}
+    regressions: list[str] = []
+
+    for result in results:
+        reference: Optional[dict[str, Any]] = baseline_by_case.get(result["case"])
+        if reference is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            current, previous = result[metric], reference[metric]
+            if higher_is_better:
+                regressed = current < previous * (1 - tolerance)
+            else:
+                regressed = current > previous * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{result['case']}: {metric} {previous:.6g} -> {current:.6g}")
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history-length", type=int, default=2000)
+    parser.add_argument("--max-epochs", type=int, default=20)
+    parser.add_argument("--predict-repeats", type=int, default=50)
+    parser.add_argument("--output", help="write JSON lines to this file as well")
+    parser.add_argument("--baseline", help="JSON lines file with results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results: list[dict[str, Any]] = []
+    for case in default_cases(args.history_length):
+        # Fresh process per case, so that peak RSS is not inherited from the previous cases.
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            result = executor.submit(run_case, case, args.max_epochs, args.predict_repeats)
+            results.append(result.result())
+        print(json.dumps(results[-1]), flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(result) + "\n" for result in results)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = [json.loads(line) for line in file if line.strip()]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
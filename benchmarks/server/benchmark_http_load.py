@@ -0,0 +1,283 @@
+"""End-to-end HTTP load test of the server with a mix of chart, price, login and trade requests.
+
+The application of create_app() is served by the threaded werkzeug server on a free local port and
+driven by client threads, each with its own keep-alive connection and logged in user. By default
+the database is an in-process stand-in seeded with res/dump.sql and synthetic users and
+transactions; with --dsn the same data is loaded into a disposable schema of a real Postgres
+database, which is dropped afterwards. Throughput and p50/p95/p99 latency of every endpoint are
+printed as JSON lines:
+
+    python -m benchmarks.server.benchmark_http_load --output load.jsonl
+    python -m benchmarks.server.benchmark_http_load --baseline load.jsonl
+    python -m benchmarks.server.benchmark_http_load --dsn "dbname=ctb_bench user=ctb host=localhost"
+
+With --baseline the run fails (exit code 1) if any metric is worse than the baseline by more than
+--tolerance (relative).
+"""
+import argparse
+import http.client
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Optional
+
+import numpy as np
+from werkzeug.serving import BaseWSGIServer, make_server
+
+from src.server.main import create_app
+
+from .load_test_database import (
+    PASSWORD,
+    InMemoryDatabase,
+    PostgresDatabase,
+    SyntheticUser,
+    install,
+    load_prices,
+    synthetic_transactions,
+    synthetic_users,
+)
+
+SEED: int = 2137
+
+# metric name -> True if higher is better
+METRICS: dict[str, bool] = {
+    "throughput_rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+}
+
+# method, path, JSON body
+Request = tuple[str, str, Optional[dict[str, Any]]]
+
+
+class LoadClient:
+    """Single simulated user sending requests over one keep-alive connection."""
+
+    def __init__(self, port: int, user: SyntheticUser, prices: list[tuple[date, float]]) -> None:
+        self.port: int = port
+        self.user: SyntheticUser = user
+        self.first_day: date = prices[0][0]
+        self.last_day: date = prices[-1][0]
+        self.connection: http.client.HTTPConnection = http.client.HTTPConnection("127.0.0.1", port)
+        self.token: str = ""
+        self.trades: int = 0
+
+    def send(self, method: str, path: str, body: Optional[dict[str, Any]] = None) -> int:
+        """Send request, read the whole response and return its status code."""
+        headers: dict[str, str] = {"x-access-token": self.token}
+        payload: Optional[bytes] = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        try:
+            self.connection.request(method, path, payload, headers)
+            response: http.client.HTTPResponse = self.connection.getresponse()
+            response.read()
+        except (ConnectionError, http.client.HTTPException):
+            self.connection.close()
+            return 0
+        return response.status
+
+    def log_in(self) -> None:
+        """Get the token used by trade requests."""
+        method, path, body = self.login(random.Random())
+        self.connection.request(
+            method, path, json.dumps(body).encode(), {"Content-Type": "application/json"}
+        )
+        self.token = json.loads(self.connection.getresponse().read())["auth_token"]
+
+    def chart(self, rng: random.Random) -> Request:
+        span: int = rng.choice((30, 365, 1500))
+        aggregate: int = rng.choice((1, 7, 30))
+        end: date = self.last_day - timedelta(
+            days=rng.randrange((self.last_day - self.first_day).days)
+        )
+        start: date = end - timedelta(days=span)
+        return "GET", f"/api/v1/stock/chart?from={start}&to={end}&aggregate={aggregate}", None
+
+    def price(self, _rng: random.Random) -> Request:
+        return "GET", "/api/v1/stock/price", None
+
+    def login(self, _rng: random.Random) -> Request:
+        return "POST", "/api/v1/auth/login", {"email": self.user.email, "password": PASSWORD}
+
+    def trade(self, _rng: random.Random) -> Request:
+        self.trades += 1
+        return "POST", f"/api/v1/wallet/{'buy' if self.trades % 2 else 'sell'}", {"amount": 0.001}
+
+
+# endpoint name -> request factory
+ENDPOINTS: dict[str, Callable[[LoadClient, random.Random], Request]] = {
+    "chart": LoadClient.chart,
+    "price": LoadClient.price,
+    "login": LoadClient.login,
+    "trade": LoadClient.trade,
+}
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """Parse "chart=30,price=50" into endpoint weights."""
+    mix: dict[str, float] = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {name}, use {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def start_server() -> BaseWSGIServer:
+    """Serve create_app() in a background thread on a free port."""
+    server: BaseWSGIServer = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    threading.Thread(target=server.serve_forever, name="load-test-server", daemon=True).start()
+    return server
+
+
+def run_load(
+    clients: list[LoadClient], mix: dict[str, float], warmup: float, duration: float
+) -> tuple[dict[str, list[float]], dict[str, int]]:
+    """Send requests from all clients, return measured latencies (s) and errors per endpoint."""
+    latencies: dict[str, list[float]] = {name: [] for name in mix}
+    errors: dict[str, int] = {name: 0 for name in mix}
+    names: list[str] = list(mix)
+    weights: list[float] = list(mix.values())
+    measure_from: float = time.perf_counter() + warmup
+    stop_at: float = measure_from + duration
+
+    def drive(client: LoadClient, seed: int) -> None:
+        rng = random.Random(seed)
+        while (now := time.perf_counter()) < stop_at:
+            name: str = rng.choices(names, weights)[0]
+            status: int = client.send(*ENDPOINTS[name](client, rng))
+            if now >= measure_from:
+                latencies[name].append(time.perf_counter() - now)
+                errors[name] += not 200 <= status < 300
+
+    threads: list[threading.Thread] = [
+        threading.Thread(target=drive, args=(client, SEED + index))
+        for index, client in enumerate(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def summarize(
+    case: str, latencies: list[float], errors: int, elapsed: float, clients: int
+) -> dict[str, Any]:
+    """Return throughput and latency percentiles of one endpoint."""
+    milliseconds: np.ndarray = np.array(latencies or [np.nan]) * 1000
+    return {
+        "case": case,
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p95_ms": float(np.percentile(milliseconds, 95)),
+        "p99_ms": float(np.percentile(milliseconds, 99)),
+    }
+
+
+def compare(
+    results: list[dict[str, Any]], baseline: list[dict[str, Any]], tolerance: float
+) -> list[str]:
+    """Return descriptions of metrics which regressed against the baseline."""
+    baseline_by_case = {entry["case"]: entry for entry in baseline}
+    regressions: list[str] = []
+
+    for result in results:
+        reference: Optional[dict[str, Any]] = baseline_by_case.get(result["case"])
+        if reference is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            current, previous = result[metric], reference[metric]
+            if higher_is_better:
+                regressed = current < previous * (1 - tolerance)
+            else:
+                regressed = current > previous * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{result['case']}: {metric} {previous:.6g} -> {current:.6g}")
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds before measuring")
+    parser.add_argument("--mix", type=parse_mix, default="chart=30,price=50,login=5,trade=15")
+    parser.add_argument("--users", type=int, default=1000, help="synthetic users to seed")
+    parser.add_argument("--transactions", type=int, default=20, help="seeded per user")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="stand-in only")
+    parser.add_argument("--dsn", help="load test against a disposable schema in this database")
+    parser.add_argument("--output", help="write JSON lines to this file as well")
+    parser.add_argument("--baseline", help="JSON lines file with results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    prices: list[tuple[date, float]] = load_prices()
+    users: list[SyntheticUser] = synthetic_users(max(args.users, args.clients), SEED)
+    transactions = synthetic_transactions(users, args.transactions, SEED)
+    database: Any
+    if args.dsn:
+        database = PostgresDatabase(args.dsn, users, transactions)
+        install(database.connection)
+    else:
+        database = InMemoryDatabase(prices, users, transactions, args.db_latency_ms / 1000)
+        install(database)
+
+    server: BaseWSGIServer = start_server()
+    try:
+        clients: list[LoadClient] = [
+            LoadClient(server.server_port, user, prices) for user in users[: args.clients]
+        ]
+        for client in clients:
+            client.log_in()
+        latencies, errors = run_load(clients, args.mix, args.warmup, args.duration)
+    finally:
+        server.shutdown()
+        database.close()
+
+    results: list[dict[str, Any]] = [
+        summarize(name, latencies[name], errors[name], args.duration, args.clients)
+        for name in args.mix
+    ]
+    results.append(
+        summarize(
+            "all",
+            [latency for values in latencies.values() for latency in values],
+            sum(errors.values()),
+            args.duration,
+            args.clients,
+        )
+    )
+    for result in results:
+        print(json.dumps(result), flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(result) + "\n" for result in results)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = [json.loads(line) for line in file if line.strip()]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
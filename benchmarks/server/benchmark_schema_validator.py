@@ -0,0 +1,98 @@
+"""Per-request cost of validating JSON bodies against the schemas in res/schemas/.
+
+Compares jsonschema.validate(), which checks the schema against its metaschema and builds a new
+validator on every call (the way SchemaValidator.validate worked before), with the validators
+compiled once by SchemaValidator.initialize(). Results are printed as JSON lines, one per schema,
+body and method:
+
+    python -m benchmarks.server.benchmark_schema_validator
+    python -m benchmarks.server.benchmark_schema_validator --repeats 5000 --output schemas.jsonl
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Any, Callable
+
+import jsonschema
+from jsonschema.exceptions import best_match
+
+from src.server import SchemaValidator
+
+# schema name -> valid request body
+BODIES: dict[str, dict[str, Any]] = {
+    "buy": {"amount": 0.5},
+    "sell": {"amount": 0.5},
+    "deposit": {"amount": 1000.0},
+    "withdraw": {"amount": 1000.0},
+    "login": {"email": "legit_email@gmail.com", "password": "thelegend27"},
+    "register": {
+        "email": "legit_email@gmail.com",
+        "password": "thelegend27",
+        "confirmPassword": "thelegend27",
+    },
+    "profiler": {"enabled": True, "sample_rate": 0.01, "route": "chart"},
+}
+INVALID_BODY: dict[str, Any] = {"totally_wrong_key": "what_even_is_this"}
+
+
+def methods() -> dict[str, Callable[[str, Any], bool]]:
+    """Return validation methods, each returning True if the body is valid."""
+
+    def validate_each_call(schema: str, body: Any) -> bool:
+        try:
+            jsonschema.validate(body, SchemaValidator.get_schema(schema))
+        except jsonschema.ValidationError:
+            return False
+        return True
+
+    def compiled(schema: str, body: Any) -> bool:
+        return best_match(SchemaValidator.get_validator(schema).iter_errors(body)) is None
+
+    return {"jsonschema.validate": validate_each_call, "compiled": compiled}
+
+
+def run(schema: str, body_name: str, body: Any, method: str, repeats: int) -> dict[str, Any]:
+    """Measure microseconds per validation of a single body."""
+    function: Callable[[str, Any], bool] = methods()[method]
+    valid: bool = function(schema, body)  # warm up caches and lazy imports
+
+    timings: list[float] = []
+    for _ in range(repeats):
+        start: float = time.perf_counter()
+        function(schema, body)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "schema": schema,
+        "body": body_name,
+        "method": method,
+        "valid": valid,
+        "time_median_us": statistics.median(timings) * 1e6,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=1000)
+    parser.add_argument("--output", help="write JSON lines to this file as well")
+    args = parser.parse_args()
+
+    SchemaValidator.initialize()
+    results: list[dict[str, Any]] = []
+    for schema in sorted(SchemaValidator.schemas):
+        for body_name, body in [("valid", BODIES.get(schema, {})), ("invalid", INVALID_BODY)]:
+            for method in methods():
+                results.append(run(schema, body_name, body, method, args.repeats))
+                print(json.dumps(results[-1]), flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(result) + "\n" for result in results)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
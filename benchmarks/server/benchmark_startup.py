@@ -0,0 +1,124 @@
+"""Startup time report of the API process.
+
+Every measurement runs in a fresh interpreter. Import time of the heaviest top-level packages comes
+from `python -X importtime -c "import src.server.main"`. The time of every initialize() call in
+Server.__init__ is measured with the database replaced by the in-process stand-in of the load test,
+with and without the scheduler (CTB_RUN_SCHEDULER). Results are printed as JSON lines:
+
+    python -m benchmarks.server.benchmark_startup
+    python -m benchmarks.server.benchmark_startup --top 20 --output startup.jsonl
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+from typing import Any
+
+ML_MODULES: list[str] = ["torch", "pandas", "sklearn", "numpy"]
+
+
+def import_times(top: int) -> list[dict[str, Any]]:
+    """Return cumulative import time of the slowest top-level packages imported by the server."""
+    output: str = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.server.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    # "import time:  self [us] | cumulative | imported package", nesting is shown by indentation
+    cumulative: dict[str, int] = {}
+    for match in re.finditer(r"^import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$", output, re.MULTILINE):
+        name: str = match.group(3)
+        if "." not in name or name.startswith("src."):
+            cumulative[name] = max(cumulative.get(name, 0), int(match.group(1)))
+
+    return [
+        {"kind": "import", "module": name, "cumulative_ms": microseconds / 1000}
+        for name, microseconds in sorted(cumulative.items(), key=lambda item: -item[1])[:top]
+    ]
+
+
+def initialize_times(run_scheduler: bool) -> list[dict[str, Any]]:
+    """Return time of every initialize() call, of the whole startup and resulting peak RSS."""
+    env: dict[str, str] = {**os.environ, "CTB_RUN_SCHEDULER": "1" if run_scheduler else "0"}
+    output: str = subprocess.run(
+        [sys.executable, "-m", "benchmarks.server.benchmark_startup", "--child"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    ).stdout
+    child: dict[str, Any] = json.loads(output.splitlines()[-1])
+
+    results: list[dict[str, Any]] = [
+        {"kind": "initialize", "scheduler": run_scheduler, "component": name, "ms": seconds * 1000}
+        for name, seconds in child["startup_times"].items()
+    ]
+    results.append({"kind": "process", "scheduler": run_scheduler, **child["process"]})
+    return results
+
+
+def child() -> int:
+    """Start the server with the stand-in database and print its startup report as JSON."""
+    start: float = time.perf_counter()
+    # pylint: disable=import-outside-toplevel
+    from src.server import Server
+
+    from .load_test_database import (
+        InMemoryDatabase,
+        install,
+        load_prices,
+        synthetic_users,
+    )
+
+    imported: float = time.perf_counter()
+    install(InMemoryDatabase(load_prices(), synthetic_users(1, 0)))
+    server: Server = Server()
+    end: float = time.perf_counter()
+
+    print(
+        json.dumps(
+            {
+                "startup_times": server.startup_times,
+                "process": {
+                    "import_ms": (imported - start) * 1000,
+                    "total_ms": (end - start) * 1000,
+                    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                    "ml_modules_loaded": [name for name in ML_MODULES if name in sys.modules],
+                },
+            }
+        ),
+        flush=True,
+    )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports reported")
+    parser.add_argument("--output", help="write JSON lines to this file as well")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child()
+
+    results: list[dict[str, Any]] = import_times(args.top)
+    for run_scheduler in (False, True):
+        results += initialize_times(run_scheduler)
+    for result in results:
+        print(json.dumps(result), flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(result) + "\n" for result in results)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+"""Databases seeded for HTTP load tests: an in-process stand-in and a disposable Postgres schema.
+
+Both are seeded with prices from res/dump.sql and the same synthetic users, wallets and
+transactions, and are installed as the connection of DatabaseProvider, so the server runs its
+real services, queries and error handling against them.
+"""
+import bisect
+import dataclasses
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Optional, Sequence
+
+import psycopg
+from werkzeug.security import generate_password_hash
+
+from src.server import CONSTANTS, PATHS, QUERIES
+from src.server.database import DatabaseProvider, InstrumentedCursor, Message
+
+PASSWORD: str = "load-test-password"
+TRANSACTION_TYPES: tuple[str, ...] = ("deposit", "withdraw", "buy", "sell")
+
+
+@dataclasses.dataclass(frozen=True)
+class SyntheticUser:
+    """User seeded in the database, all users share PASSWORD."""
+
+    uuid: str
+    email: str
+    wallet_usd: float
+    wallet_btc: float
+
+
+def load_prices(file_path: str = PATHS.DATABASE_DEFAULT_DUMP) -> list[tuple[date, float]]:
+    """Return (date, value) rows of the exchange_rate_history dump."""
+    with open(file_path, encoding="utf-8") as file:
+        rows = re.findall(r"\('(\d{4}-\d{2}-\d{2})', ([^)]+)\)", file.read())
+    return [(date.fromisoformat(day), float(value)) for day, value in rows]
+
+
+def synthetic_users(count: int, seed: int) -> list[SyntheticUser]:
+    """Return users with wallets large enough for any number of small trades."""
+    rng = random.Random(seed)
+    return [
+        SyntheticUser(
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            f"load-test-{index}@example.com",
+            round(rng.uniform(1.0e6, 1.0e7), 2),
+            round(rng.uniform(100.0, 1000.0), 8),
+        )
+        for index in range(count)
+    ]
+
+
+def synthetic_transactions(
+    users: Sequence[SyntheticUser], per_user: int, seed: int
+) -> list[tuple[str, datetime, str, str, float, float, float, float]]:
+    """Return transaction_history rows, (uuid, timestamp, user uuid, type, amounts, totals)."""
+    rng = random.Random(seed)
+    start = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for user in users:
+        for _ in range(per_user):
+            amount_usd, amount_btc = round(rng.uniform(1, 1000), 2), round(rng.uniform(0, 1), 8)
+            rows.append(
+                (
+                    str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                    start + timedelta(seconds=rng.randrange(180 * 24 * 3600)),
+                    user.uuid,
+                    rng.choice(TRANSACTION_TYPES),
+                    amount_usd,
+                    amount_btc,
+                    user.wallet_usd,
+                    user.wallet_btc,
+                )
+            )
+    return rows
+
+
+def install(connection: Any) -> None:
+    """Make DatabaseProvider use given connection instead of connecting on initialize()."""
+
+    def connect(_cls: type) -> Message:
+        DatabaseProvider.connection = connection
+        return Message.OK
+
+    DatabaseProvider.db_name = DatabaseProvider.db_name or "load_test"
+    DatabaseProvider.db_user = DatabaseProvider.db_user or "load_test"
+    DatabaseProvider.db_password = DatabaseProvider.db_password or "load_test"
+    DatabaseProvider.db_hostname = DatabaseProvider.db_hostname or "localhost"
+    DatabaseProvider._connect_to_database = classmethod(connect)  # type: ignore
+    DatabaseProvider.connection = connection
+
+
+class InMemoryDatabase:
+    """In-process stand-in of the Postgres database answering QUERIES of the server.
+
+    Tables are held in dictionaries and every statement runs under a single lock, like queries
+    sent over the single connection of DatabaseProvider. There are no transactions: commit and
+    rollback do nothing. Prices are those of CONSTANTS.DEFAULT_ASSET, the only tracked asset.
+    Constraint violations raise psycopg.IntegrityError, any statement which
+    is not one of QUERIES raises psycopg.NotSupportedError. Every statement may sleep for
+    `latency` seconds first, to model the network round trip to a database server.
+    """
+
+    def __init__(
+        self,
+        prices: Sequence[tuple[date, float]],
+        users: Sequence[SyntheticUser],
+        transactions: Sequence[tuple] = (),
+        latency: float = 0.0,
+    ) -> None:
+        self.latency: float = latency
+        self.lock: threading.Lock = threading.Lock()
+        self.dates: list[datetime] = [
+            datetime(day.year, day.month, day.day, tzinfo=timezone.utc) for day, _ in prices
+        ]
+        self.values: list[float] = [value for _, value in prices]
+        self.revoked_tokens: dict[str, datetime] = {}
+        self.transactions: dict[str, list[tuple]] = {}
+        # uuid -> [email, password hash, wallet_usd, wallet_btc]
+        self.users: dict[str, list[Any]] = {}
+        self.uuids_by_email: dict[str, str] = {}
+
+        password_hash: str = generate_password_hash(PASSWORD)
+        for user in users:
+            self._insert_user((user.uuid, user.email, password_hash))
+            self.users[user.uuid][2:] = [user.wallet_usd, user.wallet_btc]
+        for transaction in transactions:
+            self.transactions.setdefault(transaction[2], []).append(
+                (transaction[1],) + transaction[3:]
+            )
+
+        self.statements: dict[Any, Callable[[Sequence[Any]], list[tuple]]] = {
+            QUERIES.SELECT_USER_UUID: self._select_user_uuid,
+            QUERIES.SELECT_USER_EMAIL: self._select_user_email,
+            QUERIES.SELECT_USER_EMAIL_BY_UUID: self._select_user_email_by_uuid,
+            QUERIES.SELECT_USER_LOGIN_DATA_BY_EMAIL: self._select_user_login_data,
+            QUERIES.SELECT_USER_DATA_BY_UUID: self._select_user_data,
+            QUERIES.INSERT_USER: self._insert_user,
+            QUERIES.UPDATE_USER_PASSWORD_HASH: self._update_user_password_hash,
+            QUERIES.SELECT_REVOKED_TOKEN: self._select_revoked_token,
+            QUERIES.INSERT_REVOKED_TOKEN: self._insert_revoked_token,
+            QUERIES.SELECT_ASSETS: lambda _: [(CONSTANTS.DEFAULT_ASSET, "Bitcoin", "bitcoin")],
+            QUERIES.SELECT_ASSET: lambda params: [(params[0],)][: self._prices_count(params[0])],
+            QUERIES.SELECT_CHART: self._select_chart,
+            QUERIES.SELECT_CHART_AGGREGATED: self._select_chart_aggregated,
+            QUERIES.SELECT_CHART_INTRADAY: lambda _: [],  # no intraday bars
+            QUERIES.SELECT_LAST_KNOWN_DATE: lambda params: [
+                (self.dates[-1] if self._prices_count(params[0]) else None,)
+            ],
+            QUERIES.SELECT_LATEST_STOCK_PRICE: lambda params: [(self.values[-1],)][
+                : self._prices_count(params[0])
+            ],
+            QUERIES.WALLET_DEPOSIT: lambda params: self._update_wallet(params[1], params[0], 0.0),
+            QUERIES.WALLET_WITHDRAW: lambda params: self._update_wallet(params[1], -params[0], 0.0),
+            QUERIES.WALLET_BUY: lambda params: self._update_wallet(
+                params[2], -params[0], params[1]
+            ),
+            QUERIES.WALLET_SELL: lambda params: self._update_wallet(
+                params[2], params[0], -params[1]
+            ),
+            QUERIES.WALLET_TRANSACTION_HISTORY: lambda params: list(
+                self.transactions.get(params[0], [])
+            ),
+        }
+
+    def cursor(self) -> "InMemoryCursor":
+        """Return a new cursor, like psycopg.Connection.cursor()."""
+        return InMemoryCursor(self)
+
+    def commit(self) -> None:
+        """Do nothing, statements are applied immediately."""
+
+    def rollback(self) -> None:
+        """Do nothing, statements are applied immediately."""
+
+    def close(self) -> None:
+        """Do nothing, the database lives as long as the object."""
+
+    def execute(self, query: Any, params: Optional[Sequence[Any]]) -> list[tuple]:
+        """Run a single statement and return its rows."""
+        statement: Optional[Callable[[Sequence[Any]], list[tuple]]] = self.statements.get(query)
+        if statement is None:
+            raise psycopg.NotSupportedError(f"Statement not supported by the stand-in: {query}")
+
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            return statement(params or ())
+
+    def _select_user_uuid(self, params: Sequence[Any]) -> list[tuple]:
+        return [(params[0],)] if params[0] in self.users else []
+
+    def _select_user_email(self, params: Sequence[Any]) -> list[tuple]:
+        return [(params[0],)] if params[0] in self.uuids_by_email else []
+
+    def _select_user_email_by_uuid(self, params: Sequence[Any]) -> list[tuple]:
+        user: Optional[list[Any]] = self.users.get(params[0])
+        return [(user[0],)] if user is not None else []
+
+    def _select_user_login_data(self, params: Sequence[Any]) -> list[tuple]:
+        user_uuid: Optional[str] = self.uuids_by_email.get(params[0])
+        if user_uuid is None:
+            return []
+        return [(user_uuid, params[0], self.users[user_uuid][1])]
+
+    def _select_user_data(self, params: Sequence[Any]) -> list[tuple]:
+        user: Optional[list[Any]] = self.users.get(params[0])
+        return [(user[0], user[2], user[3])] if user is not None else []
+
+    def _insert_user(self, params: Sequence[Any]) -> list[tuple]:
+        if params[0] in self.users or params[1] in self.uuids_by_email:
+            raise psycopg.IntegrityError(f"User {params[1]} already exists")
+        self.users[params[0]] = [params[1], params[2], 0.0, 0.0]
+        self.uuids_by_email[params[1]] = params[0]
+        return []
+
+    def _update_user_password_hash(self, params: Sequence[Any]) -> list[tuple]:
+        if params[1] in self.users:
+            self.users[params[1]][1] = params[0]
+        return []
+
+    def _select_revoked_token(self, params: Sequence[Any]) -> list[tuple]:
+        expiry: Optional[datetime] = self.revoked_tokens.get(params[0])
+        return [(params[0],)] if expiry is not None and expiry > params[1] else []
+
+    def _insert_revoked_token(self, params: Sequence[Any]) -> list[tuple]:
+        if params[0] in self.revoked_tokens:
+            raise psycopg.IntegrityError("Token is already revoked")
+        self.revoked_tokens[params[0]] = params[1]
+        return []
+
+    def _prices_count(self, asset: str) -> int:
+        return len(self.values) if asset == CONSTANTS.DEFAULT_ASSET else 0
+
+    def _date_range(self, start: str, end: str) -> range:
+        """Return indices of prices between two ISO dates, inclusive."""
+        first: datetime = datetime.fromisoformat(start).replace(tzinfo=timezone.utc)
+        last: datetime = datetime.fromisoformat(end).replace(tzinfo=timezone.utc)
+        return range(bisect.bisect_left(self.dates, first), bisect.bisect_right(self.dates, last))
+
+    def _select_chart(self, params: Sequence[Any]) -> list[tuple]:
+        if not self._prices_count(params[0]):
+            return []
+        return [(self.dates[index], self.values[index]) for index in self._date_range(*params[1:])]
+
+    def _select_chart_aggregated(self, params: Sequence[Any]) -> list[tuple]:
+        origin: datetime = datetime.fromisoformat(params[0]).replace(tzinfo=timezone.utc)
+        periods: dict[int, list[Any]] = {}
+        if not self._prices_count(params[2]):
+            return []
+        for index in self._date_range(params[3], params[4]):
+            # (DATE_PART('day', date - origin) / period)::INT rounds half away from zero
+            ratio: float = (self.dates[index] - origin).days / params[1]
+            period: int = int(math.copysign(math.floor(abs(ratio) + 0.5), ratio))
+            value: float = self.values[index]
+            if period not in periods:
+                periods[period] = [self.dates[index].date(), 0.0, 0, value, value]
+            aggregate: list[Any] = periods[period]
+            aggregate[1] += value
+            aggregate[2] += 1
+            aggregate[3] = min(aggregate[3], value)
+            aggregate[4] = max(aggregate[4], value)
+        return [
+            (period, day, total / count, low, high)
+            for period, (day, total, count, low, high) in sorted(periods.items())
+        ]
+
+    def _update_wallet(self, user_uuid: str, usd: float, btc: float) -> list[tuple]:
+        """Change wallet balances and record the transaction like the trigger in schema.sql."""
+        user: Optional[list[Any]] = self.users.get(user_uuid)
+        if user is None:
+            return []
+        wallet_usd, wallet_btc = user[2] + usd, user[3] + btc
+        if not (0.0 <= wallet_usd <= 1.0e12 and 0.0 <= wallet_btc <= 1.0e12):
+            raise psycopg.IntegrityError("Wallet balance out of range")
+
+        if btc:
+            kind: str = "buy" if btc > 0 else "sell"
+        else:
+            kind = "deposit" if usd > 0 else "withdraw"
+        user[2:] = [wallet_usd, wallet_btc]
+        self.transactions.setdefault(user_uuid, []).append(
+            (datetime.now(timezone.utc), kind, usd, btc, wallet_usd, wallet_btc)
+        )
+        return []
+
+
+class InMemoryCursor:
+    """Cursor of InMemoryDatabase with the psycopg.Cursor methods used by the server."""
+
+    def __init__(self, database: InMemoryDatabase) -> None:
+        self.database: InMemoryDatabase = database
+        self.rows: list[tuple] = []
+        self.position: int = 0
+
+    @property
+    def rowcount(self) -> int:
+        return len(self.rows)
+
+    def execute(self, query: Any, params: Optional[Sequence[Any]] = None) -> "InMemoryCursor":
+        self.rows = self.database.execute(query, params)
+        self.position = 0
+        return self
+
+    def fetchone(self) -> Optional[tuple]:
+        if self.position >= len(self.rows):
+            return None
+        self.position += 1
+        return self.rows[self.position - 1]
+
+    def fetchall(self) -> list[tuple]:
+        rows: list[tuple] = self.rows[self.position :]
+        self.position = len(self.rows)
+        return rows
+
+
+class PostgresDatabase:
+    """Disposable schema in a real Postgres database, dropped by close().
+
+    res/schema.sql and res/dump.sql are loaded into a new schema, which is first on the
+    search_path of the connection, so tables of the server in the same database are not touched.
+    The uuid-ossp extension is created in the public schema if it does not exist yet.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        users: Sequence[SyntheticUser],
+        transactions: Sequence[tuple] = (),
+    ) -> None:
+        self.schema: str = f"ctb_load_test_{os.getpid()}"
+        self.connection: psycopg.Connection = psycopg.connect(
+            dsn, cursor_factory=InstrumentedCursor
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS "uuid-ossp" SCHEMA public')
+            cursor.execute(f"CREATE SCHEMA {self.schema}")
+            cursor.execute(f"SET search_path TO {self.schema}, public")
+            for file_path in (PATHS.DATABASE_SCHEMA, PATHS.DATABASE_DEFAULT_DUMP):
+                with open(file_path, encoding="utf-8") as file:
+                    cursor.execute(file.read())  # type: ignore
+
+            password_hash: str = generate_password_hash(PASSWORD)
+            with cursor.copy(
+                "COPY users (uuid, email, password_hash, wallet_usd, wallet_btc) FROM STDIN"
+            ) as copy:
+                for user in users:
+                    copy.write_row(
+                        (user.uuid, user.email, password_hash, user.wallet_usd, user.wallet_btc)
+                    )
+            with cursor.copy(
+                "COPY transaction_history (uuid, timestamp, user_uuid, type, amount_usd, "
+                "amount_btc, total_usd_after_transaction, total_btc_after_transaction) FROM STDIN"
+            ) as copy:
+                for transaction in transactions:
+                    copy.write_row(transaction)
+            cursor.execute("ANALYZE")
+        self.connection.commit()
+
+    def close(self) -> None:
+        """Drop the schema with all its data and close the connection."""
+        self.connection.rollback()
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA {self.schema} CASCADE")
+        self.connection.commit()
+        self.connection.close()
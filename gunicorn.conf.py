@@ -0,0 +1,28 @@
+"""Gunicorn settings: the server is created once in the master and shared by forked workers.
+
+With preload_app the master imports the application and builds it with create_app(preload=True),
+which loads only immutable data. Before workers are forked the garbage collector freezes all
+objects allocated so far, so that collections in workers do not write to (and copy) the shared
+pages. Every worker then opens its own database connection and starts its threads in post_fork.
+There is one worker, as before, unless WEB_CONCURRENCY says otherwise.
+
+    gunicorn --config gunicorn.conf.py
+"""
+import gc
+import os
+from typing import Any
+
+wsgi_app = "src.server.main:create_app(preload=True)"
+preload_app = True
+bind = os.getenv("CTB_BIND", "0.0.0.0:8080")
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+
+
+def when_ready(_server: Any) -> None:
+    """Move objects of the preloaded application to the permanent GC generation."""
+    gc.freeze()
+
+
+def post_fork(_server: Any, worker: Any) -> None:
+    """Open connections and start threads of the server in the new worker process."""
+    worker.app.wsgi().extensions["ctb_server"].start()
@@ -0,0 +1,74 @@
+-- Move a database created before multi-asset support to the layout of res/schema.sql:
+-- the assets table and exchange_rate_history keyed by (asset, date), partitioned by year.
+-- Existing prices become BTC prices. Run once, before starting the new server version:
+--
+--     psql --single-transaction --file res/migrations/001_multi_asset_exchange_rate_history.sql
+--
+-- The copy is checked before the old table is dropped: a row count mismatch raises an exception,
+-- so --single-transaction rolls the whole migration back. tests/server/test_server.py checks that
+-- the table and the partition function created here are the ones of res/schema.sql. Try it on a
+-- restored dump of the production database before running it there.
+
+CREATE TABLE assets
+(
+    symbol       TEXT PRIMARY KEY,
+    name         TEXT NOT NULL,
+    coingecko_id TEXT NOT NULL UNIQUE
+);
+
+INSERT INTO assets (symbol, name, coingecko_id)
+VALUES ('BTC', 'Bitcoin', 'bitcoin');
+
+ALTER TABLE exchange_rate_history RENAME TO exchange_rate_history_unpartitioned;
+ALTER TABLE exchange_rate_history_unpartitioned
+    RENAME CONSTRAINT exchange_rate_history_pkey TO exchange_rate_history_unpartitioned_pkey;
+DROP INDEX IF EXISTS exchange_rate_history_date_index;
+
+CREATE TABLE exchange_rate_history
+(
+    asset     TEXT                     NOT NULL DEFAULT 'BTC' REFERENCES assets (symbol),
+    date      TIMESTAMP WITH TIME ZONE NOT NULL CHECK (date::date = date),
+    timestamp FLOAT GENERATED ALWAYS AS (EXTRACT(EPOCH FROM date AT TIME ZONE 'UTC')) STORED,
+    value     FLOAT,
+    PRIMARY KEY (asset, date)
+) PARTITION BY RANGE (date);
+
+CREATE OR REPLACE FUNCTION create_exchange_rate_history_partition(for_date TIMESTAMP WITH TIME ZONE)
+    RETURNS VOID AS
+$$
+DECLARE
+    partition_year INT := EXTRACT(YEAR FROM for_date AT TIME ZONE 'UTC');
+BEGIN
+    EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF exchange_rate_history FOR VALUES FROM (%L) TO (%L)',
+                   'exchange_rate_history_' || partition_year,
+                   make_timestamptz(partition_year, 1, 1, 0, 0, 0, 'UTC'),
+                   make_timestamptz(partition_year + 1, 1, 1, 0, 0, 0, 'UTC'));
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_exchange_rate_history_partition(make_timestamptz(partition_year, 7, 1, 0, 0, 0, 'UTC'))
+FROM generate_series(
+             LEAST(2013, (SELECT EXTRACT(YEAR FROM MIN(date) AT TIME ZONE 'UTC')::INT
+                          FROM exchange_rate_history_unpartitioned)),
+             EXTRACT(YEAR FROM current_timestamp)::INT + 1
+     ) AS partition_year;
+
+INSERT INTO exchange_rate_history (asset, date, value)
+SELECT 'BTC', date, value
+FROM exchange_rate_history_unpartitioned;
+
+DO
+$$
+    DECLARE
+        old_rows BIGINT := (SELECT COUNT(*) FROM exchange_rate_history_unpartitioned);
+        new_rows BIGINT := (SELECT COUNT(*) FROM exchange_rate_history WHERE asset = 'BTC');
+    BEGIN
+        IF old_rows <> new_rows THEN
+            RAISE EXCEPTION 'Copied % of % exchange rate history rows', new_rows, old_rows;
+        END IF;
+    END
+$$;
+
+DROP TABLE exchange_rate_history_unpartitioned;
+
+ANALYZE exchange_rate_history;
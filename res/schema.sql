@@ -25,16 +25,77 @@ CREATE TABLE IF NOT EXISTS revoked_tokens
 
 CREATE UNIQUE INDEX IF NOT EXISTS token_index ON revoked_tokens (token);
 
--- Exchange rate history
+-- Assets
+
+CREATE TABLE IF NOT EXISTS assets
+(
+    symbol       TEXT PRIMARY KEY,
+    name         TEXT NOT NULL,
+    coingecko_id TEXT NOT NULL UNIQUE
+);
+
+INSERT INTO assets (symbol, name, coingecko_id)
+VALUES ('BTC', 'Bitcoin', 'bitcoin')
+ON CONFLICT DO NOTHING;
+
+-- Exchange rate history, partitioned by year so that range queries of an asset scan only the
+-- partitions of the requested years
 
 CREATE TABLE IF NOT EXISTS exchange_rate_history
 (
-    date      TIMESTAMP WITH TIME ZONE PRIMARY KEY CHECK (date::date = date),
+    asset     TEXT                     NOT NULL DEFAULT 'BTC' REFERENCES assets (symbol),
+    date      TIMESTAMP WITH TIME ZONE NOT NULL CHECK (date::date = date),
     timestamp FLOAT GENERATED ALWAYS AS (EXTRACT(EPOCH FROM date AT TIME ZONE 'UTC')) STORED,
-    value     FLOAT
-);
+    value     FLOAT,
+    PRIMARY KEY (asset, date)
+) PARTITION BY RANGE (date);
+
+CREATE OR REPLACE FUNCTION create_exchange_rate_history_partition(for_date TIMESTAMP WITH TIME ZONE)
+    RETURNS VOID AS
+$$
+DECLARE
+    partition_year INT := EXTRACT(YEAR FROM for_date AT TIME ZONE 'UTC');
+BEGIN
+    EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF exchange_rate_history FOR VALUES FROM (%L) TO (%L)',
+                   'exchange_rate_history_' || partition_year,
+                   make_timestamptz(partition_year, 1, 1, 0, 0, 0, 'UTC'),
+                   make_timestamptz(partition_year + 1, 1, 1, 0, 0, 0, 'UTC'));
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_exchange_rate_history_partition(make_timestamptz(partition_year, 7, 1, 0, 0, 0, 'UTC'))
+FROM generate_series(2013, EXTRACT(YEAR FROM current_timestamp)::INT + 1) AS partition_year;
+
+-- Intraday prices, one-minute OHLC bars partitioned by month, built from polled ticks. Prices are
+-- REAL and fixed-width columns come first, so there is no alignment padding: a bar of a
+-- three-letter asset takes 56 bytes with its tuple header
+
+CREATE TABLE IF NOT EXISTS intraday_price_history
+(
+    minute TIMESTAMP WITH TIME ZONE NOT NULL CHECK (date_trunc('minute', minute) = minute),
+    open   REAL                     NOT NULL,
+    high   REAL                     NOT NULL,
+    low    REAL                     NOT NULL,
+    close  REAL                     NOT NULL,
+    asset  TEXT                     NOT NULL REFERENCES assets (symbol),
+    PRIMARY KEY (asset, minute)
+) PARTITION BY RANGE (minute);
+
+CREATE OR REPLACE FUNCTION create_intraday_price_history_partition(for_time TIMESTAMP WITH TIME ZONE)
+    RETURNS VOID AS
+$$
+DECLARE
+    partition_start TIMESTAMP := date_trunc('month', for_time AT TIME ZONE 'UTC');
+BEGIN
+    EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF intraday_price_history FOR VALUES FROM (%L) TO (%L)',
+                   'intraday_price_history_' || to_char(partition_start, 'YYYY_MM'),
+                   partition_start AT TIME ZONE 'UTC',
+                   (partition_start + INTERVAL '1 month') AT TIME ZONE 'UTC');
+END;
+$$ LANGUAGE plpgsql;
 
-CREATE INDEX IF NOT EXISTS exchange_rate_history_date_index ON exchange_rate_history (date);
+SELECT create_intraday_price_history_partition(current_timestamp);
+SELECT create_intraday_price_history_partition(current_timestamp + INTERVAL '1 month');
 
 -- Future value
 
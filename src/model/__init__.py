@@ -1,3 +1,7 @@
 from .stock_predictor import StockPredictor
+from .text_features import DailyTextFeatures, TextFeaturePipeline
 from .stock_predictor_manager import StockPredictorManager
 from .stock_predictor_config import StockPredictorConfig
+from .training_stats import TrainingStats
+from .forecast_scenario import FORECAST_DTYPE, ForecastScenario
+from .backtester import Backtester, BacktestResult
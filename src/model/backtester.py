@@ -0,0 +1,176 @@
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+import numpy as np
+import torch
+
+from .forecast_scenario import ForecastScenario
+from .stock_predictor_config import StockPredictorConfig
+from .stock_predictor_manager import StockPredictorManager
+from .text_features import DailyTextFeatures
+
+
+@dataclass(frozen=True)
+class BacktestResult:
+    """Prediction quality for a single forecast horizon."""
+
+    horizon: int
+    windows: int
+    mae: float
+    mape: float
+    directional_accuracy: float
+
+
+class Backtester:
+    """Walk-forward evaluation of the predictor over the price history.
+
+    The as-of date slides over the history and, for every position, a forecast is made using only
+    the prices known at that date. Forecasts are computed with StockPredictorManager.predict_batch()
+    in chunks of as-of dates, which are distributed over a pool of processes.
+
+    The model is not retrained for every as-of date: the same weights are used for all of them.
+    If they were trained on the evaluated history, later prices have already been seen by the
+    model (look-ahead bias) and the metrics are optimistic; backtest a model trained only on data
+    older than the history to get an honest estimate.
+
+        results = Backtester(manager).run(horizons=(1, 7, 30))
+    """
+
+    def __init__(self, manager: StockPredictorManager, workers: Optional[int] = None):
+        self.manager: StockPredictorManager = manager
+        self.workers: int = workers if workers is not None else os.cpu_count() or 1
+
+    def run(
+        self,
+        horizons: Sequence[int] = (1, 7),
+        history: Optional[tuple[np.ndarray, np.ndarray]] = None,
+        step: int = 1,
+        chunk_size: int = 256,
+    ) -> list[BacktestResult]:
+        """Run walk-forward backtest.
+
+        Args:
+            horizons (Sequence[int]): Forecast horizons (in days) to evaluate.
+            history (Optional[tuple[np.ndarray, np.ndarray]]): Ascending dates and
+                (n, input_dim) values, whole price history is loaded if not given.
+            step (int): Distance between consecutive as-of positions.
+            chunk_size (int): Number of as-of positions forecasted in a single batch.
+
+        Returns:
+            list[BacktestResult]: Metrics for every horizon.
+
+        Raises:
+            ValueError: If the history is too short for a single input window followed by the
+                longest horizon.
+
+        """
+        if history is None:
+            history = self.manager._get_data()  # pylint: disable=W0212
+        dates, values = history
+        max_horizon: int = max(horizons)
+
+        # Every as-of position needs a full input window and known values for all horizons.
+        positions: np.ndarray = np.arange(
+            self.manager.config.seq_length - 1, len(dates) - max_horizon, step
+        )
+        if len(positions) == 0:
+            raise ValueError(
+                f"History of {len(dates)} days is too short to backtest, at least "
+                f"{self.manager.config.seq_length + max_horizon} days are needed"
+            )
+        chunks: list[np.ndarray] = np.array_split(
+            positions, max(1, -(-len(positions) // chunk_size))
+        )
+
+        with ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initialize_worker,
+            initargs=(
+                self.manager.config,
+                self.manager.text_features,
+                self.manager.stock_predictor.state_dict(),
+                dates,
+                values,
+            ),
+        ) as executor:
+            errors: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = list(
+                executor.map(
+                    _evaluate_chunk,
+                    [chunk for chunk in chunks if len(chunk)],
+                    itertools.repeat(max_horizon),
+                )
+            )
+
+        absolute_error: np.ndarray = np.concatenate([error[0] for error in errors])
+        percentage_error: np.ndarray = np.concatenate([error[1] for error in errors])
+        direction_hit: np.ndarray = np.concatenate([error[2] for error in errors])
+
+        return [
+            BacktestResult(
+                horizon=horizon,
+                windows=int(np.count_nonzero(~np.isnan(absolute_error[:, horizon - 1]))),
+                mae=float(np.nanmean(absolute_error[:, horizon - 1])),
+                mape=float(np.nanmean(percentage_error[:, horizon - 1])),
+                directional_accuracy=float(np.nanmean(direction_hit[:, horizon - 1])),
+            )
+            for horizon in horizons
+        ]
+
+
+_worker_state: dict[str, Any] = {}
+
+
+def _initialize_worker(
+    config: StockPredictorConfig,
+    text_features: Optional[DailyTextFeatures],
+    state_dict: dict,
+    dates: np.ndarray,
+    values: np.ndarray,
+) -> None:
+    """Rebuild the model in a worker process, one intra-op thread per process."""
+    torch.set_num_threads(1)
+    manager: StockPredictorManager = StockPredictorManager(config, text_features)
+    manager.stock_predictor.load_state_dict(state_dict)
+
+    _worker_state["manager"] = manager
+    _worker_state["dates"] = dates
+    _worker_state["values"] = values
+
+
+def _evaluate_chunk(
+    positions: np.ndarray, max_horizon: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Forecast from the given as-of positions and compare with the actual values.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Absolute error, absolute percentage error and
+            directional hit (1.0 or 0.0), each of shape (positions, max_horizon). Days missing
+            in the history are NaN.
+
+    """
+    manager: StockPredictorManager = _worker_state["manager"]
+    dates: np.ndarray = _worker_state["dates"]
+    prices: np.ndarray = _worker_state["values"][:, 0]
+
+    forecast: np.ndarray = manager.predict_batch(
+        [ForecastScenario(horizon=max_horizon, as_of=dates[position]) for position in positions],
+        (dates, _worker_state["values"]),
+    )
+    predicted: np.ndarray = forecast["value"].reshape(len(positions), max_horizon)
+    forecast_dates: np.ndarray = forecast["date"].reshape(len(positions), max_horizon)
+
+    actual_index: np.ndarray = np.minimum(np.searchsorted(dates, forecast_dates), len(dates) - 1)
+    known: np.ndarray = dates[actual_index] == forecast_dates
+    actual: np.ndarray = np.where(known, prices[actual_index], np.nan)
+    last_known: np.ndarray = prices[positions][:, np.newaxis]
+
+    absolute_error: np.ndarray = np.abs(predicted - actual)
+    direction_hit: np.ndarray = np.where(
+        known, np.sign(predicted - last_known) == np.sign(actual - last_known), np.nan
+    )
+    return absolute_error, absolute_error / np.abs(actual), direction_hit
@@ -1,2 +1,4 @@
 from .data_types import ArticleData, MlData, TweetData, InvalidData, UnparsedBaseData
+from .data_types import MlBatch, StringColumn
+from .dataset_cache import DatasetCache
 from .dataset_parser import DatasetParser
@@ -1,7 +1,10 @@
 from dataclasses import dataclass
+from typing import Generator, Iterable, Sequence, Union, overload
 
+import numpy as np
 
-@dataclass
+
+@dataclass(slots=True)
 class BaseData:
     """Base dataclass for model data."""
 
@@ -11,17 +14,17 @@ class BaseData:
         return list(cls.__annotations__.keys())
 
 
-@dataclass
+@dataclass(slots=True)
 class UnparsedBaseData(BaseData):
     """Unparsed data base dataclass."""
 
 
-@dataclass
+@dataclass(slots=True)
 class InvalidData(UnparsedBaseData):
     """Unparsed data with invalid format."""
 
 
-@dataclass
+@dataclass(slots=True)
 class ArticleData(UnparsedBaseData):
     """Unparsed single article's data."""
 
@@ -36,7 +39,7 @@ class ArticleData(UnparsedBaseData):
     content: str
 
 
-@dataclass
+@dataclass(slots=True)
 class TweetData(UnparsedBaseData):
     """Unparsed single tweet's data."""
 
@@ -47,7 +50,7 @@ class TweetData(UnparsedBaseData):
     content: str
 
 
-@dataclass
+@dataclass(slots=True)
 class MlData(BaseData):
     """The final data which is used in an AI model."""
 
@@ -57,3 +60,108 @@ class MlData(BaseData):
     hour: int
     minute: int
     content: str
+
+
+@dataclass(slots=True)
+class StringColumn:
+    """Column of strings stored as a single UTF-8 buffer with offsets (like Arrow string array).
+
+    String i is data[offsets[i] : offsets[i + 1]], decoded only when accessed.
+    """
+
+    data: np.ndarray  # uint8
+    offsets: np.ndarray  # int64, len(column) + 1 entries
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> "StringColumn":
+        """Build column from Python strings."""
+        encoded: list[bytes] = [string.encode("utf-8") for string in strings]
+        offsets: np.ndarray = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), np.int64, len(encoded)), out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    @classmethod
+    def concatenate(cls, columns: Sequence["StringColumn"]) -> "StringColumn":
+        """Join columns into a single one."""
+        datas: list[np.ndarray] = []
+        offsets: list[np.ndarray] = [np.zeros(1, dtype=np.int64)]
+        size: int = 0
+        for column in columns:
+            datas.append(column.data[column.offsets[0] : column.offsets[-1]])
+            offsets.append(column.offsets[1:] - column.offsets[0] + size)
+            size += int(column.offsets[-1] - column.offsets[0])
+        return cls(np.concatenate(datas or [np.empty(0, np.uint8)]), np.concatenate(offsets))
+
+    def __len__(self) -> int:
+        """Number of strings in the column."""
+        return len(self.offsets) - 1
+
+    @overload
+    def __getitem__(self, index: int) -> str:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "StringColumn":
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, "StringColumn"]:
+        """Decode a single string or return a slice of the column without copying data."""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("StringColumn supports only contiguous slices")
+            return StringColumn(self.data, self.offsets[start : max(start, stop) + 1])
+        if index < 0:
+            index += len(self)
+        return self.data[self.offsets[index] : self.offsets[index + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Generator[str, None, None]:
+        """Decode strings one by one."""
+        for index in range(len(self)):
+            yield self[index]
+
+
+@dataclass(slots=True)
+class MlBatch:
+    """Batch of MlData rows stored column-wise."""
+
+    year: np.ndarray  # int16
+    month: np.ndarray  # int8
+    day: np.ndarray  # int8
+    hour: np.ndarray  # int8
+    minute: np.ndarray  # int8
+    content: StringColumn
+
+    @classmethod
+    def concatenate(cls, batches: Sequence["MlBatch"]) -> "MlBatch":
+        """Join batches into a single one."""
+
+        def join(name: str, dtype: type) -> np.ndarray:
+            return np.concatenate(
+                [getattr(batch, name) for batch in batches] or [np.empty(0, dtype)]
+            )
+
+        return cls(
+            year=join("year", np.int16),
+            month=join("month", np.int8),
+            day=join("day", np.int8),
+            hour=join("hour", np.int8),
+            minute=join("minute", np.int8),
+            content=StringColumn.concatenate([batch.content for batch in batches]),
+        )
+
+    def __len__(self) -> int:
+        """Number of rows in the batch."""
+        return len(self.year)
+
+    def rows(self) -> Generator[MlData, None, None]:
+        """Convert batch back to MlData rows."""
+        for index, content in enumerate(self.content):
+            yield MlData(
+                year=int(self.year[index]),
+                month=int(self.month[index]),
+                day=int(self.day[index]),
+                hour=int(self.hour[index]),
+                minute=int(self.minute[index]),
+                content=content,
+            )
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Optional
+
+import numpy as np
+
+from ...server.constants import PATHS
+from ...server.metrics import METRICS
+from .data_types import MlBatch, StringColumn
+
+
+class DatasetCache:
+    """On-disk cache of parsed datasets.
+
+    Every source file is identified by the SHA-256 of its content. Parsed columns of MlBatch are
+    stored as .npy files in a directory named after the hash, together with the sniffed CSV format,
+    and are loaded back with np.load(mmap_mode="r"), so a cached dataset is available without
+    reading it into memory. The hash is recomputed only when the path, size or mtime of the source
+    changes, so unchanged files are not read at all and modified ones get a new entry.
+
+        parser = DatasetParser("res/datasets/example_tweets.csv", cache=DatasetCache())
+        batch = parser.read_all()
+    """
+
+    _version: int = 1
+    _columns: tuple[str, ...] = ("year", "month", "day", "hour", "minute")
+
+    def __init__(self, directory: str = PATHS.DATASET_CACHE) -> None:
+        self.directory: str = directory
+        self._index_path: str = os.path.join(directory, "index.json")
+
+    def key(self, file_path: str) -> str:
+        """Return cache key (content hash) of the file, rehashed only if the file has changed."""
+        path: str = os.path.realpath(file_path)
+        stat: os.stat_result = os.stat(path)
+        index: dict[str, dict[str, Any]] = self._read_index()
+
+        entry: Optional[dict[str, Any]] = index.get(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return str(entry["key"])
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            while block := file.read(1 << 20):
+                digest.update(block)
+
+        index[path] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "key": f"{digest.hexdigest()}-v{self._version}",
+        }
+        if entry and entry["key"] not in (other["key"] for other in index.values()):
+            # Source changed and no other file has the old content, drop its entry.
+            shutil.rmtree(os.path.join(self.directory, entry["key"]), ignore_errors=True)
+        self._write_index(index)
+        return str(index[path]["key"])
+
+    def load_format(self, key: str) -> Optional[dict[str, Any]]:
+        """Return stored CSV format ("dialect" parameters and "header"), None if not cached."""
+        try:
+            with open(os.path.join(self.directory, key, "format.json"), encoding="utf-8") as file:
+                return dict(json.load(file))
+        except (OSError, ValueError):
+            return None
+
+    def store_format(self, key: str, format_: dict[str, Any]) -> None:
+        """Store CSV format of the source file."""
+        entry: str = os.path.join(self.directory, key)
+        os.makedirs(entry, exist_ok=True)
+        self._write_atomic(os.path.join(entry, "format.json"), json.dumps(format_).encode("utf-8"))
+
+    def load_batch(self, key: str) -> Optional[MlBatch]:
+        """Return memory-mapped parsed dataset, None if not cached."""
+        directory: str = os.path.join(self.directory, key, "columns")
+        if not os.path.isdir(directory):
+            METRICS.CACHE_REQUESTS.inc("dataset", "miss")
+            return None
+
+        def column(name: str) -> np.ndarray:
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        try:
+            batch: MlBatch = MlBatch(
+                year=column("year"),
+                month=column("month"),
+                day=column("day"),
+                hour=column("hour"),
+                minute=column("minute"),
+                content=StringColumn(column("content_data"), column("content_offsets")),
+            )
+        except (OSError, ValueError):
+            METRICS.CACHE_REQUESTS.inc("dataset", "miss")
+            return None
+
+        METRICS.CACHE_REQUESTS.inc("dataset", "hit")
+        return batch
+
+    def store_batch(self, key: str, batch: MlBatch) -> None:
+        """Store parsed dataset, columns appear at once when all of them are written."""
+        entry: str = os.path.join(self.directory, key)
+        os.makedirs(entry, exist_ok=True)
+
+        temporary: str = tempfile.mkdtemp(dir=entry)
+        for name in self._columns:
+            np.save(os.path.join(temporary, f"{name}.npy"), getattr(batch, name))
+        np.save(os.path.join(temporary, "content_data.npy"), batch.content.data)
+        np.save(os.path.join(temporary, "content_offsets.npy"), batch.content.offsets)
+
+        try:
+            os.rename(temporary, os.path.join(entry, "columns"))
+        except OSError:
+            # Stored concurrently by another process.
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    def clear(self) -> None:
+        """Remove all cached datasets."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _read_index(self) -> dict[str, dict[str, Any]]:
+        try:
+            with open(self._index_path, encoding="utf-8") as file:
+                return dict(json.load(file))
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index: dict[str, dict[str, Any]]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_atomic(self._index_path, json.dumps(index).encode("utf-8"))
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        """Write file through a temporary one, so readers never see it partially written."""
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
@@ -1,8 +1,28 @@
 import csv
+import functools
+import io
+import itertools
+import mmap
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime
-from typing import Generator, Optional, Type, cast
+from typing import Any, Generator, Optional, Sequence, Type, cast
 
-from . import ArticleData, InvalidData, MlData, TweetData, UnparsedBaseData
+import numpy as np
+
+from . import (
+    ArticleData,
+    InvalidData,
+    MlBatch,
+    MlData,
+    StringColumn,
+    TweetData,
+    UnparsedBaseData,
+)
+from .dataset_cache import DatasetCache
 
 
 class DatasetParser:
@@ -18,17 +38,31 @@ class DatasetParser:
             print(f"{content.year}, {content.month}, {content.day}")
             if idx > 50: # limit large parsed csv data to 50 rows
                 break
+
+    Large files can be parsed in parallel with read_chunks(), which yields lists of rows in the same
+    order as read(). read_batches() yields MlBatch column arrays instead of MlData objects, and
+    read_all() returns the whole dataset, cached on disk if the parser has a DatasetCache.
     """
 
-    def __init__(self, file_path: str) -> None:
-        """Initialize parser and setup reader according to CSV file format."""
-        self.file_cursor: int = 0
+    def __init__(self, file_path: str, cache: Optional[DatasetCache] = None) -> None:
+        """Initialize parser and setup reader according to CSV file format.
+
+        With a cache, the CSV format is sniffed only once per file content and read_all() returns
+        the parsed dataset memory-mapped from the cache.
+        """
+        self.file_cursor: int = 0  # byte offset of the first row not yet read by read_new()
         self.file_path = file_path
         self.dialect: Optional[Type[csv.Dialect]] = None
+        self.header: list[str] = []
         self.field_names: list[str] = []
         self.data_type: Type[UnparsedBaseData] = InvalidData
+        self.cache: Optional[DatasetCache] = cache
+        self._cache_key: Optional[str] = cache.key(file_path) if cache is not None else None
+        self._file_id: Optional[tuple[int, int]] = None
 
-        self._prepare_reader()
+        if not self._load_format():
+            self._prepare_reader()
+            self._store_format()
         self._guess_data_type()
 
     def _prepare_reader(self) -> None:
@@ -46,10 +80,38 @@ class DatasetParser:
             else:
                 reader = csv.reader(csvfile)
 
-            self.field_names.extend(next(reader))
+            self.header.extend(next(reader))
+            self.field_names.extend(self.header)
             self.field_names.remove("")  # remove a field named: ''
             csvfile.seek(0)
 
+    def _load_format(self) -> bool:
+        """Restore dialect and header from the cache, return False if they are not cached."""
+        if self.cache is None or self._cache_key is None:
+            return False
+        format_: Optional[dict[str, Any]] = self.cache.load_format(self._cache_key)
+        if format_ is None:
+            return False
+
+        if format_["dialect"] is not None:
+            self.dialect = type(
+                "CachedDialect", (csv.Dialect,), {**format_["dialect"], "lineterminator": "\r\n"}
+            )
+        self.header.extend(format_["header"])
+        self.field_names.extend(self.header)
+        self.field_names.remove("")  # remove a field named: ''
+        return True
+
+    def _store_format(self) -> None:
+        if self.cache is not None and self._cache_key is not None:
+            self.cache.store_format(
+                self._cache_key,
+                {
+                    "dialect": self._format_parameters() if self.dialect is not None else None,
+                    "header": self.header,
+                },
+            )
+
     def _guess_data_type(self) -> None:
         types: list[Type[UnparsedBaseData]] = [ArticleData, TweetData]
 
@@ -64,7 +126,11 @@ class DatasetParser:
         print(f"INFO: Assuming {self.data_type.__name__} type")
 
     def _parse(self, data: UnparsedBaseData) -> MlData:
-        match self.data_type.__name__:
+        return self._parse_as(self.data_type, data)
+
+    @staticmethod
+    def _parse_as(data_type: Type[UnparsedBaseData], data: UnparsedBaseData) -> MlData:
+        match data_type.__name__:
             case ArticleData.__name__:
                 return MlData(
                     year=cast(ArticleData, data).year,
@@ -75,13 +141,15 @@ class DatasetParser:
                     content=cast(ArticleData, data).content,
                 )
             case TweetData.__name__:
-                time = datetime.strptime(cast(TweetData, data).datetime, "%a %b %d %X PDT %Y")
+                year, month, day, hour, minute = DatasetParser._parse_tweet_timestamp(
+                    cast(TweetData, data).datetime
+                )
                 return MlData(
-                    year=time.year,
-                    month=time.month,
-                    day=time.day,
-                    hour=time.hour,
-                    minute=time.minute,
+                    year=year,
+                    month=month,
+                    day=day,
+                    hour=hour,
+                    minute=minute,
                     content=cast(TweetData, data).content,
                 )
             case _:
@@ -91,10 +159,328 @@ class DatasetParser:
         """Yield one row from CSV without loading whole contents."""
         with open(self.file_path, newline="", encoding="utf-8") as csvfile:
             if self.dialect is not None:
-                reader = csv.DictReader(csvfile, dialect=self.dialect)
+                reader = csv.DictReader(csvfile, dialect=self.dialect, restval="")
             else:
-                reader = csv.DictReader(csvfile)
+                reader = csv.DictReader(csvfile, restval="")
 
             for row in reader:
                 row.pop("", "")  # remove a key-value pair where key == ''
                 yield self._parse(self.data_type(**row))
+
+    def read_new(self) -> Generator[MlData, None, None]:
+        """Yield rows appended to the file since the previous call, all rows on the first call.
+
+        Only complete rows are read, a partially written last row is left for the next call. The
+        cursor moves past the read rows once all of them are consumed, so rows of an abandoned
+        generator are read again. The cursor is reset if the file was truncated or replaced.
+        """
+        stat: os.stat_result = os.stat(self.file_path)
+        if self._file_id != (stat.st_dev, stat.st_ino) or stat.st_size < self.file_cursor:
+            if self._file_id is not None:
+                print(f"INFO: {self.file_path} was truncated or replaced, reading from start")
+            self._file_id = (stat.st_dev, stat.st_ino)
+            self.file_cursor = 0
+        if stat.st_size == self.file_cursor:
+            return
+
+        quote: bytes = self._quote()
+        with open(self.file_path, "rb") as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as view:
+            if self.file_cursor == 0:
+                self.file_cursor = self._next_row_start(file, 0, quote, 0)  # skip header
+            end: int = self._last_row_end(view, self.file_cursor, quote)
+
+            reader = csv.DictReader(
+                _mapped_lines(view, self.file_cursor, end),
+                fieldnames=self.header,
+                restval="",
+                **self._format_parameters(),
+            )
+            for row in reader:
+                row.pop("", "")  # remove a key-value pair where key == ''
+                yield self._parse(self.data_type(**row))
+
+        self.file_cursor = end
+
+    def follow(
+        self, poll_interval: float = 1.0, stop: Optional[threading.Event] = None
+    ) -> Generator[MlData, None, None]:
+        """Yield existing rows and then rows appended to the file, until stop is set.
+
+        Args:
+            poll_interval (float): Seconds between checks of the file size.
+            stop (Optional[threading.Event]): Event ending the iteration, follows forever if None.
+
+        Yields:
+            MlData: Parsed rows, each one exactly once unless the file is truncated.
+
+        """
+        stop = stop if stop is not None else threading.Event()
+        while not stop.is_set():
+            yield from self.read_new()
+            stop.wait(poll_interval)
+
+    @staticmethod
+    def _last_row_end(view: mmap.mmap, start: int, quote: bytes) -> int:
+        """Return offset just after the last complete row after start, which is a row start."""
+        end: int = view.rfind(b"\n", start)
+        while end != -1 and view[start : end + 1].count(quote) % 2:
+            end = view.rfind(b"\n", start, end)  # newline inside a quoted field
+        return start if end == -1 else end + 1
+
+    def read_all(self) -> MlBatch:
+        """Return the whole dataset as a single batch, memory-mapped from the cache if possible."""
+        if self.cache is None or self._cache_key is None:
+            return MlBatch.concatenate(list(self.read_batches()))
+
+        batch: Optional[MlBatch] = self.cache.load_batch(self._cache_key)
+        if batch is None:
+            self.cache.store_batch(self._cache_key, MlBatch.concatenate(list(self.read_batches())))
+            batch = self.cache.load_batch(self._cache_key)
+        if batch is None:
+            raise RuntimeError(f"Cannot load cached dataset of {self.file_path}")
+        return batch
+
+    def read_batches(self, batch_size: int = 1 << 16) -> Generator[MlBatch, None, None]:
+        """Yield rows as column arrays of at most batch_size rows, no MlData objects are created."""
+        if os.path.getsize(self.file_path) == 0:
+            return
+
+        with open(self.file_path, "rb") as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as view:
+            lines: Generator[str, None, None] = _mapped_lines(view, 0, len(view))
+            if self.dialect is not None:
+                reader = csv.reader(lines, dialect=self.dialect)
+            else:
+                reader = csv.reader(lines)
+
+            next(reader, None)  # skip header
+            while rows := list(itertools.islice(reader, batch_size)):
+                yield self._to_batch(self.data_type, self.header, rows)
+
+    @staticmethod
+    def _to_batch(
+        data_type: Type[UnparsedBaseData], header: list[str], rows: list[list[str]]
+    ) -> MlBatch:
+        """Convert raw CSV rows to a columnar batch."""
+        index: dict[str, int] = {name: position for position, name in enumerate(header)}
+        size: int = len(rows)
+        # Missing trailing fields are empty strings, as restval="" of csv.DictReader in read().
+        columns: list[Sequence[str]] = list(itertools.zip_longest(*rows, fillvalue=""))
+        columns.extend([("",) * size] * (len(header) - len(columns)))
+
+        match data_type.__name__:
+            case ArticleData.__name__:
+                dates: np.ndarray = np.array(columns[index["date"]], dtype="datetime64[D]")
+                days: np.ndarray = (dates - dates.astype("datetime64[M]")).astype(np.int8) + 1
+                return MlBatch(
+                    year=np.array(columns[index["year"]], dtype=np.float32).astype(np.int16),
+                    month=np.array(columns[index["month"]], dtype=np.float32).astype(np.int8),
+                    day=days,
+                    hour=np.zeros(size, dtype=np.int8),
+                    minute=np.zeros(size, dtype=np.int8),
+                    content=StringColumn.from_strings(columns[index["content"]]),
+                )
+            case TweetData.__name__:
+                times: np.ndarray = np.array(
+                    [
+                        DatasetParser._parse_tweet_timestamp(value)
+                        for value in columns[index["datetime"]]
+                    ],
+                    dtype=np.int16,
+                ).reshape(size, 5)
+                return MlBatch(
+                    year=times[:, 0].copy(),
+                    month=times[:, 1].astype(np.int8),
+                    day=times[:, 2].astype(np.int8),
+                    hour=times[:, 3].astype(np.int8),
+                    minute=times[:, 4].astype(np.int8),
+                    content=StringColumn.from_strings(columns[index["content"]]),
+                )
+            case _:
+                raise RuntimeError("Tried to parse unknown data type")
+
+    @staticmethod
+    def _parse_tweet_timestamp(value: str) -> tuple[int, int, int, int, int]:
+        """Parse tweet timestamp like "Mon Apr 06 22:19:45 PDT 2009" without datetime.strptime().
+
+        Fields are read from fixed positions, the date part is cached as tweets are mostly sorted
+        by time. Time zone may be any abbreviation and is ignored, i.e. the local wall-clock time is
+        returned, the same as for the previously hardcoded "PDT".
+
+        Returns:
+            tuple[int, int, int, int, int]: Year, month, day, hour and minute.
+
+        """
+        if len(value) < 25 or value[3] != " " or value[13] != ":" or value[-5] != " ":
+            # Unexpected layout, drop the time zone and let strptime() validate it.
+            time = datetime.strptime(value[:20] + value[-4:], "%a %b %d %X %Y")
+            return time.year, time.month, time.day, time.hour, time.minute
+
+        hour, minute = int(value[11:13]), int(value[14:16])
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(f"Invalid tweet timestamp: {value}")
+        return (*DatasetParser._parse_tweet_date(value[4:10], value[-4:]), hour, minute)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _parse_tweet_date(month_day: str, year: str) -> tuple[int, int, int]:
+        """Parse "Apr 06" and "2009" into validated (year, month, day)."""
+        date = datetime(int(year), _MONTHS[month_day[:3]], int(month_day[4:]))
+        return date.year, date.month, date.day
+
+    def read_chunks(
+        self, chunk_size: int = 1 << 22, workers: Optional[int] = None
+    ) -> Generator[list[MlData], None, None]:
+        """Parse CSV in parallel and yield lists of rows in file order.
+
+        The file is split into chunks of roughly chunk_size bytes on row boundaries, which are
+        parsed in a pool of spawned processes. At most two chunks per worker are in flight at
+        once, so memory usage does not depend on the file size.
+
+        Args:
+            chunk_size (int): Approximate size of a single chunk in bytes.
+            workers (Optional[int]): Number of worker processes, CPU count by default.
+
+        Yields:
+            list[MlData]: Parsed rows of a single chunk.
+
+        """
+        workers = workers if workers is not None else os.cpu_count() or 1
+        pending: deque[Future[list[MlData]]] = deque()
+
+        # Spawned workers, since forking a process which runs threads (the server) may deadlock.
+        with ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            for start, end in self._chunk_boundaries(chunk_size):
+                pending.append(
+                    executor.submit(
+                        _parse_chunk,
+                        self.file_path,
+                        start,
+                        end,
+                        self.header,
+                        self.data_type,
+                        self._format_parameters(),
+                    )
+                )
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def _format_parameters(self) -> dict[str, Any]:
+        """Return sniffed dialect as csv.reader() keyword arguments, dialects cannot be pickled."""
+        if self.dialect is None:
+            return {}
+        return {
+            "delimiter": self.dialect.delimiter,
+            "quotechar": self.dialect.quotechar,
+            "escapechar": self.dialect.escapechar,
+            "doublequote": self.dialect.doublequote,
+            "skipinitialspace": self.dialect.skipinitialspace,
+            "quoting": self.dialect.quoting,
+        }
+
+    def _quote(self) -> bytes:
+        return ((self.dialect and self.dialect.quotechar) or '"').encode("utf-8")
+
+    def _chunk_boundaries(self, chunk_size: int) -> Generator[tuple[int, int], None, None]:
+        """Yield (start, end) byte offsets of chunks, header excluded.
+
+        A newline ends a row only if it is outside of a quoted field, i.e. if the number of quote
+        characters before it is even. Rows are assumed to be quoted with doubled quote characters,
+        files using an escape character are not split at all.
+        """
+        quote: bytes = self._quote()
+        splittable: bool = self.dialect is None or self.dialect.escapechar is None
+        file_size: int = os.path.getsize(self.file_path)
+
+        with open(self.file_path, "rb") as file:
+            start: int = self._next_row_start(file, 0, quote, 0)
+            while start < file_size:
+                target: int = min(start + chunk_size, file_size) if splittable else file_size
+                file.seek(start)
+                quotes: int = file.read(target - start).count(quote)
+                end: int = self._next_row_start(file, target, quote, quotes)
+                yield start, end
+                start = end
+
+    @staticmethod
+    def _next_row_start(file: io.BufferedReader, offset: int, quote: bytes, quotes: int) -> int:
+        """Return offset of the first row starting at or after offset.
+
+        Args:
+            file (io.BufferedReader): File opened in binary mode.
+            offset (int): Position to search from.
+            quote (bytes): Quote character.
+            quotes (int): Number of quote characters between the last row start and offset.
+
+        Returns:
+            int: Offset just after the row terminator, or file size if there is none.
+
+        """
+        file.seek(offset)
+        position: int = offset
+        while block := file.read(1 << 16):
+            newline: int = block.find(b"\n")
+            last: int = 0
+            while newline != -1:
+                quotes += block.count(quote, last, newline)
+                if quotes % 2 == 0:
+                    return position + newline + 1
+                last = newline
+                newline = block.find(b"\n", newline + 1)
+            quotes += block.count(quote, last)
+            position += len(block)
+        return position
+
+
+def _parse_chunk(
+    file_path: str,
+    start: int,
+    end: int,
+    header: list[str],
+    data_type: Type[UnparsedBaseData],
+    format_parameters: dict[str, Any],
+) -> list[MlData]:
+    """Parse rows between given byte offsets of a CSV file, run in worker processes."""
+    rows: list[MlData] = []
+    with open(file_path, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as view:
+        reader = csv.DictReader(
+            _mapped_lines(view, start, end), fieldnames=header, restval="", **format_parameters
+        )
+        for row in reader:
+            row.pop("", "")  # remove a key-value pair where key == ''
+            rows.append(
+                DatasetParser._parse_as(data_type, data_type(**row))  # pylint: disable=W0212
+            )
+    return rows
+
+
+def _mapped_lines(view: mmap.mmap, start: int, end: int) -> Generator[str, None, None]:
+    """Yield decoded lines of a memory-mapped file between given byte offsets.
+
+    Lines are decoded one at a time straight from the page cache, so neither the whole file nor
+    the whole chunk is copied into a Python string. Newlines are kept, as csv.reader() expects.
+    """
+    position: int = start
+    while position < end:
+        line_end: int = view.find(b"\n", position, end)
+        line_end = end if line_end == -1 else line_end + 1
+        yield view[position:line_end].decode("utf-8")
+        position = line_end
+
+
+_MONTHS: dict[str, int] = {
+    name: number
+    for number, name in enumerate(
+        ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1
+    )
+}
@@ -0,0 +1,23 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+FORECAST_DTYPE: np.dtype = np.dtype(
+    [("scenario", np.int32), ("step", np.int32), ("date", "datetime64[D]"), ("value", np.float32)]
+)
+
+
+@dataclass(frozen=True)
+class ForecastScenario:
+    """Single forecast computed by StockPredictorManager.predict_batch().
+
+    Attributes:
+        horizon (int): Number of days to predict.
+        as_of (Optional[np.datetime64]): Last date the forecast may use, None for the newest one.
+        noise (float): Std of multiplicative gaussian noise applied to the input window.
+    """
+
+    horizon: int = 7
+    as_of: Optional[np.datetime64] = None
+    noise: float = 0.0
@@ -0,0 +1,142 @@
+from typing import Generator, Optional, Sequence
+
+import numpy as np
+from psycopg.abc import Query
+
+from ..server.constants import QUERIES
+from ..server.database import DatabaseProvider
+
+
+class RateHistoryLoader:
+    """Load price history from the database straight into typed NumPy arrays.
+
+    Rows are transferred with binary COPY of (date, real) columns, which have a fixed width, so the
+    received bytes are decoded in bulk with np.frombuffer() - no tuple, datetime or float object is
+    created per row. The stream is consumed in chunks, so histories larger than memory can be
+    processed with iter_chunks(), while load() fills arrays preallocated for the whole result.
+
+        dates, values = RateHistoryLoader.load(QUERIES.COPY_RATE_HISTORY, ["BTC"])
+        # dates: datetime64[D], values: float32
+    """
+
+    _signature: bytes = b"PGCOPY\n\xff\r\n\x00"
+    _trailer: bytes = b"\xff\xff"
+    _postgres_epoch: np.datetime64 = np.datetime64("2000-01-01", "D")
+    _record_dtype: np.dtype = np.dtype(
+        [
+            ("field_count", ">i2"),
+            ("date_length", ">i4"),
+            ("date", ">i4"),
+            ("value_length", ">i4"),
+            ("value", ">f4"),
+        ]
+    )
+
+    @classmethod
+    def iter_chunks(
+        cls, query: Query, params: Optional[Sequence] = None, chunk_rows: int = 1 << 16
+    ) -> Generator[tuple[np.ndarray, np.ndarray], None, None]:
+        """Yield (dates, values) arrays of at most chunk_rows rows each.
+
+        Args:
+            query (Query): COPY ... TO STDOUT (FORMAT BINARY) query returning (date, real) rows.
+            params (Optional[Sequence]): Parameters of the query.
+            chunk_rows (int): Maximum number of rows decoded at once.
+
+        Yields:
+            tuple[np.ndarray, np.ndarray]: datetime64[D] dates and float32 values.
+
+        """
+        chunk_size: int = chunk_rows * cls._record_dtype.itemsize
+        buffer: bytearray = bytearray()
+        header_parsed: bool = False
+
+        with DatabaseProvider.handler() as handler:
+            with handler().copy(query, params) as copy:
+                for data in copy:
+                    buffer += data
+                    if not header_parsed:
+                        header_parsed = cls._strip_header(buffer)
+                    if header_parsed and len(buffer) >= chunk_size:
+                        yield cls._decode(buffer, chunk_rows)
+                        del buffer[:chunk_size]
+
+        if not handler.success:
+            raise RuntimeError(f"Cannot read rate history: {handler.message}")
+
+        if buffer[-len(cls._trailer) :] == cls._trailer:
+            del buffer[-len(cls._trailer) :]
+        if buffer:
+            yield cls._decode(buffer, len(buffer) // cls._record_dtype.itemsize)
+
+    @classmethod
+    def load(
+        cls, query: Query, params: Optional[Sequence] = None, size: Optional[int] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Load the whole result of a query into preallocated arrays.
+
+        Args:
+            query (Query): COPY ... TO STDOUT (FORMAT BINARY) query returning (date, real) rows.
+            params (Optional[Sequence]): Parameters of the query.
+            size (Optional[int]): Expected number of rows. If not given, rows are counted with
+                QUERIES.SELECT_RATE_HISTORY_COUNT, which takes the same parameters (the asset).
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: datetime64[D] dates and float32 values.
+
+        """
+        if size is None:
+            size = cls._count(params)
+
+        dates: np.ndarray = np.empty(size, dtype="datetime64[D]")
+        values: np.ndarray = np.empty(size, dtype=np.float32)
+        filled: int = 0
+
+        for chunk_dates, chunk_values in cls.iter_chunks(query, params):
+            end: int = filled + len(chunk_dates)
+            if end > len(dates):
+                # Rows inserted after counting, grow the arrays instead of failing.
+                dates = np.resize(dates, max(end, 2 * len(dates)))
+                values = np.resize(values, max(end, 2 * len(values)))
+            dates[filled:end] = chunk_dates
+            values[filled:end] = chunk_values
+            filled = end
+
+        return dates[:filled], values[:filled]
+
+    @classmethod
+    def _count(cls, params: Optional[Sequence]) -> int:
+        """Return the number of rows in the exchange rate history of an asset."""
+        with DatabaseProvider.handler() as handler:
+            handler().execute(QUERIES.SELECT_RATE_HISTORY_COUNT, params)
+            count: Optional[tuple[int]] = handler().fetchone()
+
+        if not handler.success or count is None:
+            return 0
+        return int(count[0])
+
+    @classmethod
+    def _strip_header(cls, buffer: bytearray) -> bool:
+        """Remove binary COPY header from the buffer, return False if it is not complete yet."""
+        fixed_size: int = len(cls._signature) + 8  # signature, flags, extension length
+        if len(buffer) < fixed_size:
+            return False
+        if buffer[: len(cls._signature)] != cls._signature:
+            raise RuntimeError("Invalid binary COPY signature")
+
+        extension_length: int = int.from_bytes(buffer[fixed_size - 4 : fixed_size], "big")
+        if len(buffer) < fixed_size + extension_length:
+            return False
+
+        del buffer[: fixed_size + extension_length]
+        return True
+
+    @classmethod
+    def _decode(cls, buffer: bytearray, rows: int) -> tuple[np.ndarray, np.ndarray]:
+        """Decode fixed-width binary COPY records into dates and values."""
+        records: np.ndarray = np.frombuffer(buffer, dtype=cls._record_dtype, count=rows)
+        if np.any(records["value_length"] != 4):
+            raise RuntimeError("Unexpected NULL or non-real value in rate history")
+
+        dates: np.ndarray = cls._postgres_epoch + records["date"].astype("timedelta64[D]")
+        return dates, records["value"].astype(np.float32)
@@ -18,3 +18,11 @@ class StockPredictorConfig:
     min_delta: float = 0.00001
     learning_rate: float = 0.001
     weight_decay: float = 2 * min_delta
+
+    fine_tune_max_epochs: int = 100
+    replay_size: int = 256
+
+    intra_op_threads: int = 1
+    inter_op_threads: int = 1
+    quantize_inference: bool = False
+    inference_tolerance: float = 0.01
@@ -1,6 +1,8 @@
-import datetime
+import copy
+import logging
 import sys
-from typing import Optional
+import time
+from typing import Any, Optional, Sequence
 
 import numpy as np
 import pandas as pd
@@ -9,22 +11,39 @@ from sklearn.preprocessing import MinMaxScaler
 from torch import nn, optim
 from torch.utils.data import DataLoader, TensorDataset
 
-from ..server.constants import QUERIES
-from ..server.database import DatabaseProvider
+from ..server.constants import CONSTANTS, QUERIES
+from ..server.metrics import METRICS
+from .forecast_scenario import FORECAST_DTYPE, ForecastScenario
+from .rate_history_loader import RateHistoryLoader
 from .stock_predictor import StockPredictor
 from .stock_predictor_config import StockPredictorConfig
+from .text_features import DailyTextFeatures
+from .training_stats import TrainingStats
 
 
 class StockPredictorManager:
     """Class for managing StockPredictor GRU model"""
 
-    def __init__(self) -> None:
-        self.config = StockPredictorConfig()
+    def __init__(
+        self,
+        config: Optional[StockPredictorConfig] = None,
+        text_features: Optional[DailyTextFeatures] = None,
+    ) -> None:
+        """Create the model, with text_features the price is followed by daily text features."""
+        self.config = config if config is not None else StockPredictorConfig()
+        self.text_features: Optional[DailyTextFeatures] = text_features
+
+        expected_dim: int = 1 + (len(text_features.FEATURE_NAMES) if text_features else 0)
+        if self.config.input_dim != expected_dim:
+            raise ValueError(f"input_dim is {self.config.input_dim}, expected {expected_dim}")
 
         self._initialize_model()
 
         self.train_size_pct: float = 0.8
         self.scaler: MinMaxScaler = MinMaxScaler()
+        self.last_trained_date: Optional[np.datetime64] = None
+        self.training_stats: TrainingStats = TrainingStats()
+        self._inference_model: Optional[nn.Module] = None
 
         self.criterion: nn.MSELoss = nn.MSELoss()
         self.optimizer: optim.adam.Adam = optim.Adam(  # pylint: disable=no-member
@@ -42,40 +61,34 @@ class StockPredictorManager:
             self.config.output_dim,
         )
 
-    def _get_data(self) -> pd.DataFrame:
-        """Return all data from the stock values table."""
-        data: list = []
-
-        with DatabaseProvider.handler() as handler:
-            handler().execute(QUERIES.SELECT_ALL_RATE_HISTORY)
-            data = handler().fetchall()
-            data = [{"date": date.strftime("%Y-%m-%d"), "avg": avg} for date, avg in data]
-
-        data_frame = pd.DataFrame(data, columns=["date", "value"])
-        data_frame["date"] = pd.to_datetime(data_frame["date"])
-        data_frame.set_index("date", inplace=True)
+    def _get_data(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return all data from the stock values table.
 
-        return data_frame
+        Returns:
+            tuple[np.ndarray, np.ndarray]: datetime64[D] dates and (n, input_dim) float32 values,
+                price first.
 
-    def _get_newest_dates(self) -> pd.DataFrame:
-        """Return last 'seq_length' dates to predict future value"""
-        data: list = []
+        """
+        dates, values = RateHistoryLoader.load(QUERIES.COPY_RATE_HISTORY, [CONSTANTS.DEFAULT_ASSET])
+        return dates, self._with_features(dates, values)
 
-        with DatabaseProvider.handler() as handler:
-            handler().execute(QUERIES.SELECT_ALL_RATE_HISTORY_DESC, [self.config.seq_length])
-            data = handler().fetchall()
-            data = [{"date": date.strftime("%Y-%m-%d"), "avg": avg} for date, avg in data]
-
-        data_frame = pd.DataFrame(data, columns=["date", "value"])
-        data_frame["date"] = pd.to_datetime(data_frame["date"])
-        data_frame.set_index("date", inplace=True)
+    def _get_newest_dates(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return last 'seq_length' dates (newest first) to predict future value."""
+        dates, values = RateHistoryLoader.load(
+            QUERIES.COPY_NEWEST_RATE_HISTORY,
+            [CONSTANTS.DEFAULT_ASSET, self.config.seq_length],
+            self.config.seq_length,
+        )
+        return dates, self._with_features(dates, values)
 
-        return data_frame
+    def _with_features(self, dates: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        """Return prices as (n, input_dim) model input with text features of the same days."""
+        if self.text_features is None:
+            return prices.reshape(-1, 1)
+        return np.hstack([prices.reshape(-1, 1), self.text_features.align(dates)])
 
-    def _get_train_val_data(self) -> tuple[np.ndarray, np.ndarray]:
+    def _get_train_val_data(self, data: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
         """Split data into train and validation dataset."""
-        data: pd.DataFrame = self._get_data()
-
         train_size: int = int(len(data) * self.train_size_pct)
         val_size: int = int(len(data) * (1 - self.train_size_pct))
 
@@ -86,44 +99,32 @@ class StockPredictorManager:
 
         return train_data, val_data
 
-    def _get_data_loader(self, data: np.ndarray) -> DataLoader:
-        """Create dataloader for given dataset."""
+    def _get_windows(self, data: np.ndarray) -> tuple[torch.Tensor, torch.Tensor]:
+        """Cut dataset into (input sequence, next value) pairs."""
         data_tensor: torch.Tensor = torch.tensor(data).float()  # pylint: disable=no-member
+        window_count: int = len(data_tensor) - self.config.seq_length
 
-        sequence: list = []
-        for i in range(len(data_tensor) - self.config.seq_length):
-            sequence.append(
-                (
-                    data_tensor[i : i + self.config.seq_length],
-                    data_tensor[i + self.config.seq_length : i + self.config.seq_length + 1],
-                )
-            )
-
-        data_loader: DataLoader = DataLoader(
-            TensorDataset(
-                torch.stack([i[0] for i in sequence]),  # pylint: disable=no-member
-                torch.stack([i[1] for i in sequence]),  # pylint: disable=no-member
-            ),
-            batch_size=self.config.batch_size,
-        )
-
-        return data_loader
+        # unfold() returns views of shape (windows, features, seq_length), no data is copied.
+        inputs: torch.Tensor = data_tensor.unfold(0, self.config.seq_length, 1)[:window_count]
+        targets: torch.Tensor = data_tensor[self.config.seq_length :].unsqueeze(1)
 
-    def train_model(self, verbose: bool = False) -> None:
-        """Train model"""
+        return inputs.transpose(1, 2), targets
 
-        train_data: Optional[np.ndarray] = None
-        val_data: Optional[np.ndarray] = None
-        train_data, val_data = self._get_train_val_data()
-
-        train_loader: DataLoader = self._get_data_loader(train_data)
-        val_loader: DataLoader = self._get_data_loader(val_data)
+    def _get_data_loader(self, inputs: torch.Tensor, targets: torch.Tensor) -> DataLoader:
+        """Create dataloader for given input sequences and targets."""
+        return DataLoader(TensorDataset(inputs, targets), batch_size=self.config.batch_size)
 
+    def _fit(
+        self, train_loader: DataLoader, val_loader: DataLoader, max_epochs: int, verbose: bool
+    ) -> None:
+        """Train model with early stopping on validation loss, statistics go to training_stats."""
+        self.training_stats = TrainingStats(train_samples=len(train_loader.dataset))  # type: ignore
         no_improvement_count: int = 0
         best_val_loss: float = sys.float_info.max
         loss: torch.Tensor = torch.tensor(0)  # pylint: disable=no-member
 
-        for epoch in range(self.config.max_epochs):
+        for epoch in range(max_epochs):
+            epoch_start: float = time.perf_counter()
             self.stock_predictor.train()
             for _, (inputs, targets) in enumerate(train_loader):
                 self.optimizer.zero_grad()
@@ -140,6 +141,10 @@ class StockPredictorManager:
                     val_loss += self.criterion(outputs[:, -1], targets[:, -1, 0])
             val_loss /= len(val_loader)
 
+            self.training_stats.epoch_times.append(time.perf_counter() - epoch_start)
+            self.training_stats.train_losses.append(float(loss))
+            self.training_stats.val_losses.append(float(val_loss))
+
             if verbose:
                 print(
                     f"Epoch {epoch + 1}: Train Loss = {loss:.6f}, Validation Loss = {val_loss:.6f}"
@@ -158,66 +163,260 @@ class StockPredictorManager:
                 best_val_loss = val_loss
                 no_improvement_count = 0
 
-    def predict_values(self, days: int = 7) -> pd.DataFrame:
-        """Predict stock value for next x days"""
+        self._inference_model = None
 
-        # Gets newest seq_length dates from the data source.
-        data: pd.DataFrame = self._get_newest_dates()
+    def train_model(self, verbose: bool = False) -> None:
+        """Train model from scratch on the whole price history."""
+        dates, data = self._get_data()
 
-        # Get first date for which the stock value will be predicted.
-        current_date: datetime.date = pd.to_datetime(data.index[0]).date() + datetime.timedelta(
-            days=1
+        train_data: Optional[np.ndarray] = None
+        val_data: Optional[np.ndarray] = None
+        train_data, val_data = self._get_train_val_data(data)
+
+        train_loader: DataLoader = self._get_data_loader(*self._get_windows(train_data))
+        val_loader: DataLoader = self._get_data_loader(*self._get_windows(val_data))
+
+        self._fit(train_loader, val_loader, self.config.max_epochs, verbose)
+        self.last_trained_date = dates[-1]
+
+    def fine_tune_model(self, verbose: bool = False) -> bool:
+        """Fine-tune model on prices added since the last training run.
+
+        Training starts from the current weights and scaler (e.g. restored with load_model()) and
+        uses only windows which include new prices, mixed with a random replay sample of older
+        windows so that the model does not forget the rest of the history. Validation is done on
+        windows never used for training: the newest of the new windows and the held-out part of
+        the replay sample. Falls back to train_model() if the model has never been trained.
+
+        Returns:
+            bool: True if model has been updated, False if there was no new data or too little
+                data to hold out validation windows.
+
+        """
+        if self.last_trained_date is None:
+            self.train_model(verbose)
+            return True
+
+        dates, data = self._get_data()
+        first_new: int = int(np.searchsorted(dates, self.last_trained_date, side="right"))
+        if first_new >= len(data) or len(data) <= self.config.seq_length:
+            return False
+
+        inputs, targets = self._get_windows(self.scaler.transform(data))
+
+        # Window i spans data[i : i + seq_length + 1], so it includes new data from this one on.
+        first_new_window: int = max(first_new - self.config.seq_length, 0)
+        new_windows: np.ndarray = np.arange(first_new_window, len(inputs))
+        replay_windows: np.ndarray = np.random.default_rng().permutation(first_new_window)
+        replay_windows = replay_windows[: self.config.replay_size]
+        replay_train_size: int = int(len(replay_windows) * self.train_size_pct)
+        # The oldest new windows are trained on and the newest validate them. A single new window
+        # (one new day) is trained on when replay windows are held out for validation.
+        new_train_size: int = int(np.ceil(len(new_windows) * self.train_size_pct))
+        if replay_train_size == len(replay_windows) and new_train_size == len(new_windows):
+            new_train_size -= 1
+
+        train_windows: torch.Tensor = torch.from_numpy(  # pylint: disable=no-member
+            np.concatenate([new_windows[:new_train_size], replay_windows[:replay_train_size]])
         )
+        val_windows: torch.Tensor = torch.from_numpy(  # pylint: disable=no-member
+            np.concatenate([new_windows[new_train_size:], replay_windows[replay_train_size:]])
+        )
+        if len(train_windows) == 0:
+            return False
 
-        date_to_predict: datetime.date = pd.to_datetime(data.index[0]).date() + datetime.timedelta(
-            days=days
+        train_loader: DataLoader = self._get_data_loader(
+            inputs[train_windows], targets[train_windows]
+        )
+        val_loader: DataLoader = self._get_data_loader(inputs[val_windows], targets[val_windows])
+
+        self._fit(train_loader, val_loader, self.config.fine_tune_max_epochs, verbose)
+        self.last_trained_date = dates[-1]
+        return True
+
+    def configure_threads(self) -> None:
+        """Apply intra-op and inter-op thread limits from config to the whole process.
+
+        Torch defaults to one intra-op thread per core, which oversubscribes the CPU when many
+        server threads run inference at the same time.
+        """
+        torch.set_num_threads(self.config.intra_op_threads)
+
+        # Inter-op pool size can be set only once, before the pool is started (reported as 0),
+        # otherwise torch aborts the whole process instead of raising an exception.
+        interop_threads: int = torch.get_num_interop_threads()
+        if interop_threads == 0:
+            torch.set_num_interop_threads(self.config.inter_op_threads)
+        elif interop_threads != self.config.inter_op_threads:
+            logging.warning("Inter-op thread pool already started with %s threads", interop_threads)
+
+    def export_inference_model(self, quantize: Optional[bool] = None) -> nn.Module:
+        """Return a copy of the model optimized for CPU inference.
+
+        The model is compiled with TorchScript and frozen. If quantize is set (defaults to
+        config.quantize_inference), GRU and Linear layers are dynamically quantized to int8.
+        The exported model is compared with the eager one on random scaled windows, if outputs
+        differ by more than config.inference_tolerance the eager model is returned instead.
+
+        Args:
+            quantize (Optional[bool]): Whether to apply dynamic int8 quantization.
+
+        Returns:
+            nn.Module: Model to be used for inference.
+
+        """
+        if quantize is None:
+            quantize = self.config.quantize_inference
+
+        self.stock_predictor.eval()
+        model: nn.Module = copy.deepcopy(self.stock_predictor)
+        if quantize:
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {nn.GRU, nn.Linear}, dtype=torch.qint8  # pylint: disable=no-member
+            )
+        exported: nn.Module = torch.jit.optimize_for_inference(
+            torch.jit.freeze(torch.jit.script(model))
         )
 
-        date_index: pd.DatetimeIndex = pd.date_range(
-            start=current_date, end=date_to_predict, freq="D"
+        # Inputs of the model are min-max scaled windows, so they lie in [0, 1].
+        reference_input: torch.Tensor = torch.rand(  # pylint: disable=no-member
+            64,
+            self.config.seq_length,
+            self.config.input_dim,
+            generator=torch.Generator().manual_seed(0),
         )
-        predicted_values: pd.DataFrame = pd.DataFrame(index=date_index, columns=["value"])
-
-        # Predict values until date reaches date_to_predict.
-        while current_date <= date_to_predict:
-            # Scale data and convert it to tensor
-            input_seq_scaled: np.ndarray = self.scaler.fit_transform(data)
-            input_seq_tensor: torch.Tensor = (
-                torch.tensor(input_seq_scaled).float().unsqueeze(0)  # pylint: disable=no-member
+        with torch.no_grad():
+            error: float = (
+                (exported(reference_input) - self.stock_predictor(reference_input))
+                .abs()
+                .max()
+                .item()
             )
 
-            # Predict output for the next date
-            self.stock_predictor.eval()
+        if error > self.config.inference_tolerance:
+            logging.warning("Exported model differs from eager one by %s, not using it", error)
+            return self.stock_predictor
+
+        logging.debug("Exported inference model (quantize=%s, error=%s)", quantize, error)
+        return exported
+
+    def _get_inference_model(self) -> nn.Module:
+        """Return inference model, exporting it on first use after (re)training or loading."""
+        if self._inference_model is None:
+            METRICS.CACHE_REQUESTS.inc("inference_model", "miss")
+            self._inference_model = self.export_inference_model()
+        else:
+            METRICS.CACHE_REQUESTS.inc("inference_model", "hit")
+        return self._inference_model
+
+    def predict_batch(
+        self,
+        scenarios: Sequence[ForecastScenario],
+        history: Optional[tuple[np.ndarray, np.ndarray]] = None,
+        seed: Optional[int] = None,
+    ) -> np.ndarray:
+        """Compute many forecasts at once.
+
+        Input windows of all scenarios are stacked into one batch, so every forecasted day costs
+        a single model call regardless of the number of scenarios. Every window is min-max scaled
+        on its own before it is passed to the model.
+
+        Args:
+            scenarios (Sequence[ForecastScenario]): Forecasts to compute.
+            history (Optional[tuple[np.ndarray, np.ndarray]]): Ascending dates and (n, input_dim)
+                values to forecast from, whole price history is loaded if not given.
+            seed (Optional[int]): Seed of the noise applied to perturbed scenarios.
+
+        Returns:
+            np.ndarray: Array of FORECAST_DTYPE with one row per scenario and forecasted day.
+
+        """
+        dates, values = history if history is not None else self._get_data()
+        seq_length: int = self.config.seq_length
+
+        last_dates: np.ndarray = np.array(
+            [dates[-1] if scenario.as_of is None else scenario.as_of for scenario in scenarios],
+            dtype="datetime64[D]",
+        )
+        horizons: np.ndarray = np.array([scenario.horizon for scenario in scenarios])
+        noise: np.ndarray = np.array([scenario.noise for scenario in scenarios], dtype=np.float32)
+
+        window_ends: np.ndarray = np.searchsorted(dates, last_dates, side="right")
+        if np.any(window_ends < seq_length):
+            raise ValueError(f"Not enough history, {seq_length} days are required before as_of")
+        last_dates = dates[window_ends - 1].astype("datetime64[D]")
+
+        # windows[s] = values[window_ends[s] - seq_length : window_ends[s]]
+        windows: np.ndarray = values[
+            window_ends[:, np.newaxis] - seq_length + np.arange(seq_length)
+        ].astype(np.float32)
+        if np.any(noise):
+            windows *= 1 + noise[:, np.newaxis, np.newaxis] * np.random.default_rng(
+                seed
+            ).standard_normal(windows.shape, dtype=np.float32)
+
+        inference_model: nn.Module = self._get_inference_model()
+        max_horizon: int = int(horizons.max(initial=0))
+        predictions: np.ndarray = np.empty((len(scenarios), max_horizon), dtype=np.float32)
+
+        for step in range(max_horizon):
+            low: np.ndarray = windows.min(axis=1, keepdims=True)
+            span: np.ndarray = windows.max(axis=1, keepdims=True) - low
+            span[span == 0] = 1  # same as MinMaxScaler for constant features
+
             with torch.no_grad():
-                predicted_output_tensor: torch.Tensor = self.stock_predictor(input_seq_tensor)
+                output: torch.Tensor = inference_model(
+                    torch.from_numpy((windows - low) / span)  # pylint: disable=no-member
+                )
+            predictions[:, step] = output.numpy()[:, 0] * span[:, 0, 0] + low[:, 0, 0]
 
-            # Convert predicted output from tensor and scale it back.
-            predicted_output_scaled: np.ndarray = predicted_output_tensor.numpy().squeeze()
-            predicted_output: np.ndarray = self.scaler.inverse_transform(
-                predicted_output_scaled.reshape(-1, 1)
-            )
-            # Create pd.DataFrame with predicted output.
-            new_data: pd.DataFrame = pd.DataFrame(
-                predicted_output, columns=["value"], index=[pd.to_datetime(current_date)]
-            )
+            # Slide windows by one day, features other than price are carried forward.
+            next_day: np.ndarray = windows[:, -1:, :].copy()
+            next_day[:, 0, 0] = predictions[:, step]
+            windows = np.concatenate([windows[:, 1:], next_day], axis=1)
 
-            # Create new sequence in order to predict value for the next date.
-            data = pd.concat([new_data, data])
-            # Delete oldest date from the dataframe
-            data.drop(data.index[self.config.seq_length - 1], inplace=True)
+        scenario_index, step_index = np.nonzero(np.arange(max_horizon) < horizons[:, np.newaxis])
+        forecast: np.ndarray = np.empty(len(scenario_index), dtype=FORECAST_DTYPE)
+        forecast["scenario"] = scenario_index
+        forecast["step"] = step_index + 1
+        forecast["date"] = last_dates[scenario_index] + (step_index + 1).astype("timedelta64[D]")
+        forecast["value"] = predictions[scenario_index, step_index]
 
-            # Update value
-            predicted_values.loc[pd.to_datetime(current_date), "value"] = predicted_output[0][0]
+        return forecast
 
-            # Increment date.
-            current_date += datetime.timedelta(days=1)
+    def predict_values(self, days: int = 7) -> pd.DataFrame:
+        """Predict stock value for next x days"""
+        dates, values = self._get_newest_dates()
+        forecast: np.ndarray = self.predict_batch(
+            [ForecastScenario(horizon=days)], (dates[::-1], values[::-1])
+        )
 
-        return predicted_values
+        return pd.DataFrame(
+            {"value": forecast["value"].astype(float)},
+            index=pd.DatetimeIndex(forecast["date"]),
+        )
 
     def load_model(self, path: str = "stock_predictor_model.pt") -> None:
-        """Load saved model."""
-        self.stock_predictor.load_state_dict(torch.load(path))
+        """Load saved model along with its scaler and last training date."""
+        artifact: dict[str, Any] = torch.load(path)
+        if "state_dict" not in artifact:
+            # Older artifacts contain just the model weights.
+            self.stock_predictor.load_state_dict(artifact)
+            self._inference_model = None
+            return
+
+        self.stock_predictor.load_state_dict(artifact["state_dict"])
+        self.scaler = artifact["scaler"]
+        self.last_trained_date = artifact["last_trained_date"]
+        self._inference_model = None
 
     def save_model(self, path: str = "stock_predictor_model.pt") -> None:
-        """Save current loaded model."""
-        torch.save(self.stock_predictor.state_dict(), path)
+        """Save current loaded model along with its scaler and last training date."""
+        torch.save(
+            {
+                "state_dict": self.stock_predictor.state_dict(),
+                "scaler": self.scaler,
+                "last_trained_date": self.last_trained_date,
+            },
+            path,
+        )
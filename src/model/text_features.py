@@ -0,0 +1,141 @@
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import ClassVar, Iterable, Optional
+
+import numpy as np
+
+from .datasets import DatasetCache, DatasetParser, MlBatch, StringColumn
+
+POSITIVE_WORDS: frozenset[str] = frozenset(
+    "good great excellent amazing awesome love like happy best win winning gain gains profit "
+    "profits bull bullish rally surge soar soaring up rise rising moon growth strong success "
+    "successful optimistic positive record boom adopt adoption support beat beats".split()
+)
+NEGATIVE_WORDS: frozenset[str] = frozenset(
+    "bad terrible awful hate sad worst lose losing loss losses bear bearish crash dump drop "
+    "fall falling down decline weak fail failure fear panic scam fraud hack hacked ban banned "
+    "risk negative sell selloff bubble collapse worry upset".split()
+)
+
+# Matches only lexicon words, so text without sentiment words costs a single regex scan.
+_LEXICON_PATTERN: re.Pattern[bytes] = re.compile(
+    rb"\b(" + b"|".join(word.encode() for word in POSITIVE_WORDS | NEGATIVE_WORDS) + rb")\b"
+)
+
+
+@dataclass(frozen=True)
+class DailyTextFeatures:
+    """Text features aggregated per day.
+
+    Attributes:
+        days (np.ndarray): Ascending datetime64[D] days with any text.
+        values (np.ndarray): (days, len(FEATURE_NAMES)) float32 features of every day.
+    """
+
+    FEATURE_NAMES: ClassVar[tuple[str, ...]] = ("mean_sentiment", "positive_share", "log_volume")
+
+    days: np.ndarray = field(default_factory=lambda: np.empty(0, dtype="datetime64[D]"))
+    values: np.ndarray = field(default_factory=lambda: np.empty((0, 3), dtype=np.float32))
+
+    def align(self, dates: np.ndarray) -> np.ndarray:
+        """Return (len(dates), features) array for given dates, days without text are zeros."""
+        aligned: np.ndarray = np.zeros((len(dates), len(self.FEATURE_NAMES)), dtype=np.float32)
+        if len(self.days) == 0:
+            return aligned
+
+        index: np.ndarray = np.minimum(np.searchsorted(self.days, dates), len(self.days) - 1)
+        known: np.ndarray = self.days[index] == dates
+        aligned[known] = self.values[index[known]]
+        return aligned
+
+
+class TextFeaturePipeline:
+    """Turn timestamped text records into daily features aligned with price dates.
+
+    Every text is scored with a word lexicon, (positive - negative) / (positive + negative) words,
+    in a pool of processes. Scores are then grouped by day into the mean sentiment, the share of
+    positive texts and the log of the number of texts.
+
+        features = TextFeaturePipeline().from_files(["res/datasets/example_tweets.csv"])
+        manager = StockPredictorManager(StockPredictorConfig(input_dim=4), features)
+    """
+
+    def __init__(self, workers: Optional[int] = None, chunk_rows: int = 1 << 16) -> None:
+        self.workers: int = workers if workers is not None else os.cpu_count() or 1
+        self.chunk_rows: int = chunk_rows
+
+    def from_files(
+        self, file_paths: Iterable[str], cache: Optional[DatasetCache] = None
+    ) -> DailyTextFeatures:
+        """Parse datasets (through the cache if given) and compute their daily features."""
+        return self.daily_features(
+            MlBatch.concatenate(
+                [DatasetParser(file_path, cache=cache).read_all() for file_path in file_paths]
+            )
+        )
+
+    def daily_features(self, batch: MlBatch) -> DailyTextFeatures:
+        """Score texts of the batch and aggregate the scores per day."""
+        if len(batch) == 0:
+            return DailyTextFeatures()
+
+        scores: np.ndarray = self.score(batch.content)
+        days, inverse = np.unique(self._days(batch), return_inverse=True)
+        counts: np.ndarray = np.bincount(inverse, minlength=len(days))
+
+        values: np.ndarray = np.empty((len(days), 3), dtype=np.float32)
+        values[:, 0] = np.bincount(inverse, weights=scores, minlength=len(days)) / counts
+        values[:, 1] = np.bincount(inverse, weights=scores > 0, minlength=len(days)) / counts
+        values[:, 2] = np.log1p(counts)
+        return DailyTextFeatures(days, values)
+
+    def score(self, content: StringColumn) -> np.ndarray:
+        """Return float32 sentiment in [-1, 1] of every text, scored in chunks in parallel."""
+        chunks: list[StringColumn] = [
+            StringColumn.concatenate([content[start : start + self.chunk_rows]])
+            for start in range(0, len(content), self.chunk_rows)
+        ]
+        if self.workers == 1 or len(chunks) == 1:
+            return np.concatenate([_score_chunk(chunk) for chunk in chunks] or [np.empty(0)])
+
+        with ProcessPoolExecutor(
+            min(self.workers, len(chunks)), mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            return np.concatenate(list(executor.map(_score_chunk, chunks)))
+
+    @staticmethod
+    def _days(batch: MlBatch) -> np.ndarray:
+        """Return datetime64[D] dates of the batch rows."""
+        months: np.ndarray = (batch.year.astype(np.int64) - 1970) * 12 + batch.month - 1
+        return months.astype("datetime64[M]").astype("datetime64[D]") + (
+            batch.day.astype(np.int64) - 1
+        ).astype("timedelta64[D]")
+
+
+def _score_chunk(content: StringColumn) -> np.ndarray:
+    """Score texts of a column holding only these texts, run in worker processes.
+
+    Lexicon words are found with a single scan of the lowercased buffer and assigned to texts by
+    their byte offsets, so no per-text string is created.
+    """
+    # Texts are separated by a newline, so words at the end and the start of two texts are not
+    # glued together. Text i starts i bytes further in the separated buffer.
+    separated: np.ndarray = np.insert(content.data, content.offsets[1:-1], ord("\n"))
+    text: bytes = separated.tobytes().lower()
+    offsets: np.ndarray = content.offsets + np.arange(len(content.offsets))
+    starts: list[int] = []
+    signs: list[int] = []
+    for match in _LEXICON_PATTERN.finditer(text):
+        starts.append(match.start())
+        signs.append(1 if match.group().decode() in POSITIVE_WORDS else -1)
+
+    rows: np.ndarray = np.searchsorted(offsets, starts, side="right") - 1
+    sign: np.ndarray = np.array(signs, dtype=np.int64)
+    positive: np.ndarray = np.bincount(rows, weights=sign > 0, minlength=len(content))
+    negative: np.ndarray = np.bincount(rows, weights=sign < 0, minlength=len(content))
+
+    total: np.ndarray = positive + negative
+    return ((positive - negative) / np.maximum(total, 1)).astype(np.float32)
@@ -0,0 +1,33 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class TrainingStats:
+    """Class to store throughput and loss statistics of a single training run."""
+
+    train_samples: int = 0
+    epoch_times: list[float] = field(default_factory=list)
+    train_losses: list[float] = field(default_factory=list)
+    val_losses: list[float] = field(default_factory=list)
+
+    @property
+    def epochs(self) -> int:
+        """Number of finished epochs."""
+        return len(self.epoch_times)
+
+    @property
+    def total_time(self) -> float:
+        """Time spent in training and validation, in seconds."""
+        return sum(self.epoch_times)
+
+    @property
+    def samples_per_second(self) -> float:
+        """Training samples processed per second, validation included in the time."""
+        if self.total_time == 0:
+            return 0.0
+        return self.train_samples * self.epochs / self.total_time
+
+    @property
+    def final_val_loss(self) -> float:
+        """Validation loss after the last epoch."""
+        return self.val_losses[-1] if self.val_losses else float("nan")
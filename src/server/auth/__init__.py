@@ -1,3 +1,4 @@
+from .password_hasher import PasswordHasher
 from .token_service import TokenService
 from .auth_service import AuthService
 from .auth_controller import AuthController
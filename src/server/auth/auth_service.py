@@ -1,12 +1,12 @@
 import logging
 import uuid
+from typing import Optional
 
 from flask import Response
-from werkzeug.security import check_password_hash, generate_password_hash
 
 from .. import QUERIES, Responses
 from ..database import DatabaseProvider, Message
-from . import TokenService
+from . import PasswordHasher, TokenService
 
 
 class AuthService:
@@ -43,12 +43,14 @@ class AuthService:
         if user_exists:
             return Responses.user_already_exists()
 
+        password_hash: Optional[str] = PasswordHasher.hash(password)
+        if password_hash is None:
+            return Responses.service_unavailable()
+
         with DatabaseProvider.handler() as handler:
-            handler().execute(
-                QUERIES.INSERT_USER, (str(new_uuid), email, generate_password_hash(password))
-            )
+            handler().execute(QUERIES.INSERT_USER, (str(new_uuid), email, password_hash))
         if not handler.success:
-            logging.error(f"{handler.message}")
+            logging.error("%s", handler.message)
             return Responses.internal_database_error(handler.message)
 
         return Responses.successfully_registered()
@@ -79,13 +81,31 @@ class AuthService:
         user_email: str = user_information[0][1]  # email
         user_password: str = user_information[0][2]  # password
 
-        if check_password_hash(user_password, password):
+        password_matches: Optional[bool] = PasswordHasher.verify(user_password, password)
+        if password_matches is None:
+            return Responses.service_unavailable()
+
+        if password_matches:
+            if PasswordHasher.needs_rehash(user_password):
+                AuthService._rehash_password(user_uuid, password)
             token = TokenService.get_token(user_uuid, user_email)
 
             return Responses.auth_token(token)
 
         return Responses.could_not_verify_error()
 
+    @staticmethod
+    def _rehash_password(user_uuid: str, password: str) -> None:
+        """Replace hash created with outdated parameters, failures are retried on next login."""
+        password_hash: Optional[str] = PasswordHasher.hash(password)
+        if password_hash is None:
+            return
+
+        with DatabaseProvider.handler() as handler:
+            handler().execute(QUERIES.UPDATE_USER_PASSWORD_HASH, (password_hash, user_uuid))
+        if not handler.success:
+            logging.warning("Cannot update password hash of %s: %s", user_uuid, handler.message)
+
     @staticmethod
     def me(user_uuid: str) -> Response:
         """Get user`s info.
@@ -100,8 +120,8 @@ class AuthService:
         with DatabaseProvider.handler() as handler:
             handler().execute(QUERIES.SELECT_USER_DATA_BY_UUID, (user_uuid,))
             user_information: list = handler().fetchall()
-            logging.debug(f"{user_information=}")
-        logging.debug(f"{user_information=}")
+            logging.debug("user_information=%r", user_information)
+        logging.debug("user_information=%r", user_information)
 
         if not handler.success:
             return Responses.internal_database_error(handler.message)
@@ -0,0 +1,97 @@
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from .. import CONSTANTS
+from ..metrics import METRICS
+
+Result = TypeVar("Result")
+
+
+class PasswordHasher:
+    """Hash and verify passwords in a bounded pool of worker threads.
+
+    Password hashing is CPU-expensive by design. Only `workers` hashes are computed at a time
+    (hashlib releases the GIL meanwhile), so a burst of logins cannot take the CPU away from
+    the rest of the API, and at most `max_pending` operations wait for or run in the pool. Any
+    further operation is rejected immediately, hash() and verify() return None and the caller
+    responds with 503.
+
+    Hashes are created with `method`, including its cost, e.g. "pbkdf2:sha256:600000", which is
+    stored as the prefix of every hash, so hashes created with outdated parameters are found by
+    needs_rehash(). A method without cost, e.g. "pbkdf2:sha256", is stored with the default cost
+    of werkzeug, so hashes are compared with the prefix werkzeug actually stores.
+    """
+
+    method: str = CONSTANTS.PASSWORD_HASH_METHOD
+    workers: int = CONSTANTS.PASSWORD_HASH_WORKERS
+    max_pending: int = CONSTANTS.PASSWORD_HASH_WORKERS + CONSTANTS.PASSWORD_HASH_QUEUE_SIZE
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _pending: int = 0
+    _lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def initialize(cls) -> None:
+        """Start worker threads, does nothing if they are already running."""
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    cls.workers, thread_name_prefix="password-hasher"
+                )
+
+    @classmethod
+    def hash(cls, password: str) -> Optional[str]:
+        """Return hash of the password created with `method`, None if the pool is overloaded."""
+        return cls._run("hash", generate_password_hash, password, cls.method)
+
+    @classmethod
+    def verify(cls, password_hash: str, password: str) -> Optional[bool]:
+        """Return True if the password matches its hash, None if the pool is overloaded."""
+        return cls._run("verify", check_password_hash, password_hash, password)
+
+    @classmethod
+    def needs_rehash(cls, password_hash: str) -> bool:
+        """Return True if the hash was not created with the current method and cost."""
+        return password_hash.split("$", 1)[0] != cls._stored_prefix(cls.method)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _stored_prefix(method: str) -> str:
+        """Return the prefix stored by werkzeug for the method, computed once per method."""
+        return generate_password_hash("x", method).split("$", 1)[0]
+
+    @classmethod
+    def _run(cls, operation: str, function: Callable[..., Result], *args: Any) -> Optional[Result]:
+        """Run function in the pool and wait for its result, None if too many are pending."""
+        cls.initialize()
+        with cls._lock:
+            if cls._pending >= cls.max_pending:
+                METRICS.PASSWORD_HASH_REJECTED.inc(operation)
+                return None
+            cls._pending += 1
+            METRICS.PASSWORD_HASH_PENDING.set(cls._pending)
+
+        try:
+            return cls._executor.submit(  # type: ignore[union-attr]
+                cls._timed, operation, time.perf_counter(), function, *args
+            ).result()
+        finally:
+            with cls._lock:
+                cls._pending -= 1
+                METRICS.PASSWORD_HASH_PENDING.set(cls._pending)
+
+    @staticmethod
+    def _timed(
+        operation: str, submitted: float, function: Callable[..., Result], *args: Any
+    ) -> Result:
+        start: float = time.perf_counter()
+        METRICS.PASSWORD_HASH_WAIT.observe(start - submitted, operation)
+        try:
+            return function(*args)
+        finally:
+            METRICS.PASSWORD_HASH_DURATION.observe(time.perf_counter() - start, operation)
@@ -1,3 +1,4 @@
+import hmac
 import logging
 import os
 from datetime import datetime, timedelta
@@ -7,7 +8,7 @@ from typing import Any, Callable
 import jwt
 from flask import Response, request
 
-from .. import QUERIES, Responses
+from .. import CONSTANTS, QUERIES, Responses
 from ..database import DatabaseProvider, Message
 
 
@@ -20,6 +21,9 @@ class TokenService:
     _token_expiration_minutes: int = 30
     _secret: str = os.getenv("SECRET_KEY", "secret")
     _algorithms: list[str] = ["HS256"]
+    _internal_token: str = CONSTANTS.INTERNAL_TOKEN
+
+    INTERNAL_TOKEN_HEADER: str = "X-CTB-Internal-Token"
 
     @classmethod
     def token_required(cls, fun: Callable[..., Response]) -> Callable[..., Response]:
@@ -40,7 +44,7 @@ class TokenService:
             try:
                 data: dict[str, Any] = jwt.decode(token, cls._secret, algorithms=cls._algorithms)
             except jwt.InvalidTokenError as e:
-                logging.error(f"{e=}")
+                logging.error("e=%r", e)
                 return Responses.unauthorized_error()
 
             user_uuid: str = data["uuid"]
@@ -60,6 +64,28 @@ class TokenService:
 
         return decorated
 
+    @classmethod
+    def has_internal_token(cls) -> bool:
+        """Check if the request carries the token of internal endpoints (CTB_INTERNAL_TOKEN)."""
+        token: str = request.headers.get(cls.INTERNAL_TOKEN_HEADER, "")
+        return bool(cls._internal_token) and hmac.compare_digest(
+            token.encode(), cls._internal_token.encode()
+        )
+
+    @classmethod
+    def internal_token_required(cls, fun: Callable[..., Response]) -> Callable[..., Response]:
+        """Allow only requests with the internal token, the endpoint is disabled if none is set."""
+
+        @wraps(fun)
+        def decorated(*args: tuple, **kwargs: dict) -> Response:
+            if not cls._internal_token:
+                return Responses.internal_endpoint_disabled()
+            if not cls.has_internal_token():
+                return Responses.unauthorized_error()
+            return fun(*args, **kwargs)
+
+        return decorated
+
     @classmethod
     def revoke_token(cls, token: str) -> Message:
         """Revoke activated token.
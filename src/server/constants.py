@@ -9,6 +9,9 @@ class PATHS:
     """Paths (constants) to any resources in the project."""
 
     APPLICATION_ROOT_PATH: str = os.getenv("APPLICATION_ROOT_PATH", "./")
+    # Must be persistent storage in production: the fine-tuned model is saved there and every
+    # daily update fine-tunes it further, so with the /tmp/ default a restart falls back to the
+    # shipped model and retrains on all the prices ingested since it was built.
     VAR_PATH: str = os.getenv("VAR_PATH", "/tmp/")
 
     RESOURCES: str = APPLICATION_ROOT_PATH + "res/"
@@ -18,6 +21,9 @@ class PATHS:
     DATABASE_SCHEMA: str = RESOURCES + "schema.sql"
     DATABASE_DEFAULT_DUMP: str = RESOURCES + "dump.sql"
     DATABASE: str = VAR_PATH + "database_ctb.db"
+    MODEL_ARTIFACT: str = VAR_PATH + "stock_predictor_model.pt"
+    SHIPPED_MODEL_ARTIFACT: str = APPLICATION_ROOT_PATH + "src/model/stock_predictor_model.pt"
+    DATASET_CACHE: str = VAR_PATH + "dataset_cache/"
 
 
 @dataclass(frozen=True)
@@ -31,7 +37,27 @@ class CONSTANTS:
     DATABASE_CONNECTION_TIMEOUT: int = int(os.getenv("CTB_DB_CONN_TMOUT", 30))
     LOG_DIRECTORY: str = os.getenv("CTB_LOG_DIR", f"{PATHS.APPLICATION_ROOT_PATH}/logs/")
     LOG_LEVEL: str = os.getenv("CTB_LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("CTB_LOG_FORMAT", "text")  # "text" or "json"
+    LOG_QUEUE_SIZE: int = int(os.getenv("CTB_LOG_QUEUE_SIZE", 10000))
+    PRELOAD_MODEL: bool = os.getenv("CTB_PRELOAD_MODEL", "0") == "1"
+    RUN_SCHEDULER: bool = os.getenv("CTB_RUN_SCHEDULER", "1") == "1"
+    LEADER_LOCK_ID: int = int(os.getenv("CTB_LEADER_LOCK_ID", 2137))
+    LEADER_POLL_INTERVAL: float = float(os.getenv("CTB_LEADER_POLL_INTERVAL", 10.0))
+    INTRADAY_POLL_INTERVAL: float = float(os.getenv("CTB_INTRADAY_POLL_INTERVAL", 60.0))
+    PASSWORD_HASH_METHOD: str = os.getenv("CTB_PASSWORD_HASH_METHOD", "pbkdf2:sha256:260000")
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("CTB_PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("CTB_PASSWORD_HASH_QUEUE_SIZE", 32))
+    CHART_MAX_POINTS: int = int(os.getenv("CTB_CHART_MAX_POINTS", 5000))
     MAXIMUM_ALLOWED_OPERATION_AMOUNT: float = float(os.getenv("CTB_MAX_AMOUNT", 1.0e12))
+    DEFAULT_ASSET: str = "BTC"  # asset of wallets and of the model, default of stock endpoints
+    INTERNAL_TOKEN: str = os.getenv("CTB_INTERNAL_TOKEN", "")  # internal endpoints off if empty
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("CTB_PROFILE_RATE", 0.0))
+    PROFILE_ROUTE: str = os.getenv("CTB_PROFILE_ROUTE", "")
+    PROFILE_INTERVAL: float = float(os.getenv("CTB_PROFILE_INTERVAL_MS", 5)) / 1000
+    PROFILE_MIN_INTERVAL: float = 0.001
+    PROFILE_MAX_FILE_SIZE: int = int(os.getenv("CTB_PROFILE_MAX_FILE_MB", 16)) * 1024 * 1024
+    SLOW_QUERY_THRESHOLD: float = float(os.getenv("CTB_SLOW_QUERY_MS", 250)) / 1000
+    SLOW_QUERY_EXPLAIN_RATE: float = float(os.getenv("CTB_SLOW_QUERY_EXPLAIN_RATE", 0.0))
 
 
 @dataclass(frozen=True)
@@ -48,35 +74,70 @@ class QUERIES:
         "SELECT email, wallet_usd, wallet_btc FROM users WHERE uuid=%s"
     )
     INSERT_USER: Query = "INSERT INTO users(uuid, email, password_hash) VALUES (%s, %s, %s)"
+    UPDATE_USER_PASSWORD_HASH: Query = "UPDATE users SET password_hash=%s WHERE uuid=%s"
 
     SELECT_REVOKED_TOKEN: Query = "SELECT token FROM revoked_tokens WHERE token=%s AND expiry > %s"
     INSERT_REVOKED_TOKEN: Query = "INSERT INTO revoked_tokens (token, expiry) VALUES (%s, %s)"
 
+    SELECT_ASSETS: Query = "SELECT symbol, name, coingecko_id FROM assets ORDER BY symbol"
+    SELECT_ASSET: Query = "SELECT symbol FROM assets WHERE symbol=%s"
+
     SELECT_CHART: Query = """SELECT date, value FROM exchange_rate_history
-                        WHERE date BETWEEN %s and %s
+                        WHERE asset=%s AND date BETWEEN %s and %s
                         ORDER BY date"""
     SELECT_CHART_AGGREGATED: Query = """SELECT (DATE_PART('day', date - %s) / %s)::INT as period_number,
                                         MIN(date)::DATE, AVG(value), MIN(value), MAX(value)
                                         FROM exchange_rate_history
-                                        WHERE date BETWEEN %s AND %s
+                                        WHERE asset=%s AND date BETWEEN %s AND %s
                                         GROUP BY period_number
                                         ORDER BY period_number"""
 
-    SELECT_LAST_KNOWN_DATE: Query = """SELECT MAX(date)
-                                       FROM exchange_rate_history"""
-
-    INSERT_PRICE: Query = """INSERT INTO exchange_rate_history (date, value)
-                             VALUES (%s, %s)"""
+    SELECT_CHART_INTRADAY: Query = """SELECT TO_TIMESTAMP(FLOOR(EXTRACT(EPOCH FROM minute) / %s) * %s)
+                                      AS bucket, AVG(close), MIN(low), MAX(high)
+                                      FROM intraday_price_history
+                                      WHERE asset=%s AND minute >= %s
+                                      AND minute < %s::TIMESTAMPTZ + %s::INTERVAL
+                                      GROUP BY bucket
+                                      ORDER BY bucket"""
 
-    SELECT_ALL_RATE_HISTORY: Query = "SELECT date, value FROM exchange_rate_history"
-    SELECT_ALL_RATE_HISTORY_DESC: Query = (
-        "SELECT date, value FROM exchange_rate_history ORDER BY date DESC LIMIT %s"
+    SELECT_LAST_KNOWN_DATE: Query = """SELECT MAX(date)
+                                       FROM exchange_rate_history
+                                       WHERE asset=%s"""
+
+    CREATE_RATE_HISTORY_PARTITION: Query = "SELECT create_exchange_rate_history_partition(%s)"
+    INSERT_PRICE: Query = """INSERT INTO exchange_rate_history (asset, date, value)
+                             VALUES (%s, %s, %s)"""
+    CREATE_INTRADAY_PARTITION: Query = "SELECT create_intraday_price_history_partition(%s)"
+    UPSERT_INTRADAY_TICK: Query = """INSERT INTO intraday_price_history
+                                     (asset, minute, open, high, low, close)
+                                     VALUES (%s, DATE_TRUNC('minute', %s::TIMESTAMPTZ), %s, %s, %s, %s)
+                                     ON CONFLICT (asset, minute) DO UPDATE
+                                     SET high = GREATEST(intraday_price_history.high, EXCLUDED.high),
+                                         low = LEAST(intraday_price_history.low, EXCLUDED.low),
+                                         close = EXCLUDED.close"""
+
+    SELECT_RATE_HISTORY_COUNT: Query = (
+        "SELECT COUNT(*) FROM exchange_rate_history WHERE asset=%s AND value IS NOT NULL"
     )
+    COPY_RATE_HISTORY: Query = """COPY (SELECT date::DATE, value::REAL FROM exchange_rate_history
+                                  WHERE asset=%s AND value IS NOT NULL
+                                  ORDER BY date) TO STDOUT (FORMAT BINARY)"""
+    COPY_NEWEST_RATE_HISTORY: Query = """COPY (SELECT date::DATE, value::REAL
+                                         FROM exchange_rate_history
+                                         WHERE asset=%s AND value IS NOT NULL
+                                         ORDER BY date DESC
+                                         LIMIT %s) TO STDOUT (FORMAT BINARY)"""
 
     WALLET_DEPOSIT: Query = "UPDATE users SET wallet_usd = wallet_usd + %s WHERE uuid=%s"
     WALLET_WITHDRAW: Query = "UPDATE users SET wallet_usd = wallet_usd - %s WHERE uuid=%s"
 
-    SELECT_LATEST_STOCK_PRICE: Query = """SELECT value FROM exchange_rate_history
+    SELECT_LATEST_STOCK_PRICE: Query = """SELECT value FROM (
+                            (SELECT date, value FROM exchange_rate_history
+                             WHERE asset=%s ORDER BY date DESC LIMIT 1)
+                            UNION ALL
+                            (SELECT minute, close FROM intraday_price_history
+                             WHERE asset=%s ORDER BY minute DESC LIMIT 1)
+                        ) AS latest
                         ORDER BY date DESC
                         LIMIT 1"""
     WALLET_BUY: Query = (
@@ -91,6 +152,9 @@ class QUERIES:
                                            FROM transaction_history
                                            WHERE user_uuid=%s"""
 
+    TRY_ADVISORY_LOCK: Query = "SELECT pg_try_advisory_lock(%s)"
+    NOTIFY_DATA_UPDATED: Query = "SELECT pg_notify(%s, %s)"
+
     TRUNCATE_FUTURE_VALUE: Query = "TRUNCATE future_value"
     INSERT_FUTURE_VALUE: Query = "INSERT INTO future_value (date, value) VALUES (%s, %s)"
     SELECT_FUTURE_VALUE: Query = "SELECT date, value FROM future_value ORDER BY date DESC LIMIT %s"
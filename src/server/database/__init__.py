@@ -1,4 +1,6 @@
 from .database_message import Message
 from .database_handler import DatabaseHandler
+from .instrumented_cursor import InstrumentedCursor, QueryStats
 from .database_provider import DatabaseProvider
+from .leader_election import LeaderElection
 from .database_updater import DatabaseUpdater
@@ -65,7 +65,7 @@ class DatabaseHandler:
 
         """
         self._message = msg
-        logging.debug(f"Query result -- {self._message}")
+        logging.debug("Query result -- %s", self._message)
 
     def __call__(self) -> psycopg.Cursor:
         """Magic function allowing to treat Handler as a function.
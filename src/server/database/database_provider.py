@@ -5,7 +5,8 @@ from typing import Generator
 import psycopg
 
 from .. import CONSTANTS
-from . import DatabaseHandler, Message
+from ..metrics import METRICS
+from . import DatabaseHandler, InstrumentedCursor, Message
 
 
 class DatabaseProvider:
@@ -16,7 +17,9 @@ class DatabaseProvider:
         - connection to in-memory database (in case file database failed);
         - safe creation of cursor and transaction (with error handling);
         - execution of queries that we submitted (with error handling);
-        - commit of changes in the actual database.
+        - commit of changes in the actual database;
+        - timing of queries and counting of errors in METRICS, slow queries are logged to
+          a separate slow query log.
 
     If an error occurs on one of the queries, any subsequent queries present in the same context
     will not be executed.
@@ -82,19 +85,33 @@ class DatabaseProvider:
                     handler.message = Message.UNKNOWN_ERROR
                 case _:
                     handler.message = Message.UNKNOWN_ERROR
+            METRICS.DATABASE_ERRORS.inc(handler.message.name)
         else:
+            if isinstance(handler._cursor, InstrumentedCursor):  # pylint: disable=W0212
+                handler._cursor.finish()  # pylint: disable=W0212
             cls.connection.commit()
             handler.message = Message.OK
+        finally:
+            # Slow queries of a failed handler are logged, not explained after the rollback.
+            if isinstance(handler._cursor, InstrumentedCursor):  # pylint: disable=W0212
+                handler._cursor.finish(explain=False)  # pylint: disable=W0212
+
+    @classmethod
+    def conninfo(cls) -> str:
+        """Connection string of the database, for processes opening their own connections."""
+        return (
+            f"dbname={cls.db_name} "
+            f"user={cls.db_user} "
+            f"host={cls.db_hostname} "
+            f"password={cls.db_password} "
+            f"connect_timeout={cls.db_connection_timeout}"
+        )
 
     @classmethod
     def _connect_to_database(cls) -> Message:
         try:
             cls.connection = psycopg.connect(
-                conninfo=f"dbname={cls.db_name} "
-                f"user={cls.db_user} "
-                f"host={cls.db_hostname} "
-                f"password={cls.db_password} "
-                f"connect_timeout={cls.db_connection_timeout}"
+                conninfo=cls.conninfo(), cursor_factory=InstrumentedCursor
             )
         except psycopg.errors.ConnectionTimeout as err:
             logging.exception(f"Can't connect to the database: {err}")
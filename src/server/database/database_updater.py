@@ -1,31 +1,79 @@
 import logging
-from datetime import date, timedelta
-from typing import Optional
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Optional
 
-import requests
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
+from .. import CONSTANTS, PATHS, QUERIES
+from . import DatabaseProvider, LeaderElection
 
-from ...model import StockPredictorManager
-from .. import QUERIES
-from . import DatabaseProvider
+if TYPE_CHECKING:
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    from ...model import StockPredictorManager
 
 
 class DatabaseUpdater:
-    """Class for updating the database with new stock matket data."""
+    """Class for updating the database with new stock matket data.
+
+    Prices of every asset in the assets table are fetched daily. A yearly partition of
+    exchange_rate_history is created before the first price of a new year is inserted.
+    Current prices are also polled every CONSTANTS.INTRADAY_POLL_INTERVAL seconds (0 disables
+    polling) and merged into one-minute bars of intraday_price_history.
+
+    The ML stack (torch, pandas, sklearn) is imported and the model is built on the first
+    scheduled update, not in initialize(), so API processes start fast and stay small.
 
-    scheduler: Optional[BackgroundScheduler] = None
-    stock_predictor: StockPredictorManager
+    Updates are scheduled only in processes with CONSTANTS.RUN_SCHEDULER set and, of those, only
+    in the one elected by LeaderElection, so prices are fetched and predictions are made once for
+    all server processes, which are notified about new data. Processes which never lead do not
+    import the scheduler, the HTTP client or the ML stack. A process which is not the leader
+    drops its model when new predictions are announced, as they come with a fine-tuned model, so
+    the saved one is loaded on its next use.
+    """
+
+    scheduler: Optional["BackgroundScheduler"] = None
+    _stock_predictor: Optional["StockPredictorManager"] = None
+    _stock_predictor_lock: threading.Lock = threading.Lock()
 
     @classmethod
     def initialize(cls) -> None:
-        """Initialize DatabaseUpdater."""
+        """Compete for running scheduled updates, does nothing if it already competes."""
+        if not CONSTANTS.RUN_SCHEDULER:
+            logging.info("Scheduler disabled in this process")
+            return
+
+        if cls._on_data_updated not in LeaderElection.listeners:
+            LeaderElection.subscribe(cls._on_data_updated)
+        LeaderElection.start(on_elected=cls._start_scheduler, on_demoted=cls._stop_scheduler)
+
+    @classmethod
+    def _on_data_updated(cls, payload: str) -> None:
+        """Drop the model of a follower when the leader announces new predictions."""
+        if payload != "predictions" or LeaderElection.is_leader:
+            return
+        with cls._stock_predictor_lock:
+            if cls._stock_predictor is not None:
+                logging.info("Model updated by the leader, reloading it on next use")
+                cls._stock_predictor = None
+
+    @classmethod
+    def _start_scheduler(cls) -> None:
+        """Schedule daily and intraday updates, called when this process becomes the leader."""
+        if cls.scheduler is not None:
+            return
+
+        # pylint: disable=import-outside-toplevel
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from apscheduler.triggers.cron import CronTrigger
+        from apscheduler.triggers.interval import IntervalTrigger
+
         cls.scheduler = BackgroundScheduler()
         cls.scheduler.start()
-        cls.stock_predictor = StockPredictorManager()
 
         def scheduled_tasks() -> None:
             DatabaseUpdater.daily_prices_update()
+            DatabaseUpdater.daily_model_update()
             DatabaseUpdater.daily_predictions_update()
 
         cls.scheduler.add_job(
@@ -33,12 +81,63 @@ class DatabaseUpdater:
             trigger=CronTrigger(hour=6, minute=0, second=0),
             max_instances=1,
         )
+        if CONSTANTS.INTRADAY_POLL_INTERVAL > 0:
+            cls.scheduler.add_job(
+                func=DatabaseUpdater.intraday_prices_update,
+                trigger=IntervalTrigger(seconds=CONSTANTS.INTRADAY_POLL_INTERVAL),
+                max_instances=1,
+                coalesce=True,
+            )
+
+    @classmethod
+    def _stop_scheduler(cls) -> None:
+        """Stop scheduling updates, called when this process stops being the leader."""
+        if cls.scheduler is not None:
+            cls.scheduler.shutdown(wait=False)
+            cls.scheduler = None
+
+    @classmethod
+    def get_stock_predictor(cls) -> "StockPredictorManager":
+        """Return the model manager, built on first use.
+
+        The model fine-tuned by daily_model_update is loaded if saved, the one shipped with the
+        application otherwise. A model whose weights do not fit the current architecture is
+        skipped, leaving the untrained model to be trained by the next daily_model_update.
+        """
+        with cls._stock_predictor_lock:
+            if cls._stock_predictor is None:
+                # src.model depends on src.server, so it cannot be imported at module level.
+                from ...model import (
+                    StockPredictorManager,  # pylint: disable=import-outside-toplevel
+                )
+
+                stock_predictor: StockPredictorManager = StockPredictorManager()
+                stock_predictor.configure_threads()
+                for artifact in (PATHS.MODEL_ARTIFACT, PATHS.SHIPPED_MODEL_ARTIFACT):
+                    if not os.path.exists(artifact):
+                        continue
+                    try:
+                        stock_predictor.load_model(artifact)
+                    except RuntimeError as err:
+                        logging.warning("Cannot load model from %s: %s", artifact, err)
+                    else:
+                        break
+                cls._stock_predictor = stock_predictor
+            return cls._stock_predictor
+
+    @classmethod
+    def daily_model_update(cls) -> None:
+        """Fine-tune the model on prices ingested since its last training run."""
+        logging.debug("Daily model update triggered.")
+        stock_predictor: "StockPredictorManager" = cls.get_stock_predictor()
+        if stock_predictor.fine_tune_model():
+            stock_predictor.save_model(PATHS.MODEL_ARTIFACT)
 
     @classmethod
     def daily_predictions_update(cls) -> None:
         """Update the database with predictions up to the current day."""
         logging.debug(f"Daily predictions update triggered.")
-        predictions = cls.stock_predictor.predict_values()
+        predictions = cls.get_stock_predictor().predict_values()
         with DatabaseProvider.handler() as handler:
             handler().execute(QUERIES.TRUNCATE_FUTURE_VALUE)
             for date in predictions.index:
@@ -46,57 +145,126 @@ class DatabaseUpdater:
                     QUERIES.INSERT_FUTURE_VALUE,
                     (date.strftime("%Y-%m-%d"), predictions["value"][date]),
                 )
+            LeaderElection.notify(handler(), "predictions")
 
     @staticmethod
     def daily_prices_update() -> None:
-        """Update the database with prices up to the current day."""
+        """Update the database with prices of all tracked assets up to the current day."""
+        with DatabaseProvider.handler() as handler:
+            handler().execute(QUERIES.SELECT_ASSETS)
+            assets: list[tuple[str, str, str]] = handler().fetchall()
+
+        if not handler.success:
+            return
+
+        for asset, _name, coingecko_id in assets:
+            DatabaseUpdater._update_asset_prices(asset, coingecko_id)
+
+    @staticmethod
+    def intraday_prices_update() -> None:
+        """Fetch current prices of all tracked assets and merge them into one-minute bars."""
+        import requests  # pylint: disable=import-outside-toplevel
+
+        with DatabaseProvider.handler() as handler:
+            handler().execute(QUERIES.SELECT_ASSETS)
+            assets: list[tuple[str, str, str]] = handler().fetchall()
+
+        if not handler.success or not assets:
+            return
+
+        ids: str = ",".join(coingecko_id for _, _, coingecko_id in assets)
+        url = (
+            "https://api.coingecko.com/api/v3/simple/price"
+            f"?ids={ids}&vs_currencies=usd&include_last_updated_at=true"
+        )
+        try:
+            response = requests.get(url, timeout=10)
+            response.raise_for_status()
+            quotes: dict[str, dict[str, float]] = response.json()
+        except (requests.RequestException, ValueError) as err:
+            logging.warning("Cannot fetch intraday prices: %s", err)
+            return
+
+        now: datetime = datetime.now(timezone.utc)
+        with DatabaseProvider.handler() as handler:
+            for asset, _name, coingecko_id in assets:
+                quote: Optional[dict[str, float]] = quotes.get(coingecko_id)
+                if quote is None or "usd" not in quote:
+                    logging.warning("No intraday price of %s", asset)
+                    continue
+                price: float = float(quote["usd"])
+                tick_time: datetime = (
+                    datetime.fromtimestamp(quote["last_updated_at"], timezone.utc)
+                    if "last_updated_at" in quote
+                    else now
+                )
+                handler().execute(QUERIES.CREATE_INTRADAY_PARTITION, (tick_time,))
+                handler().execute(
+                    QUERIES.UPSERT_INTRADAY_TICK, (asset, tick_time, price, price, price, price)
+                )
+            LeaderElection.notify(handler(), "intraday")
+
+    @staticmethod
+    def _update_asset_prices(asset: str, coingecko_id: str) -> None:
+        """Update the database with prices of one asset up to the current day."""
         today_date: date = date.today()
-        last_known_date: Optional[date] = DatabaseUpdater._get_last_known_date()
+        last_known_date: Optional[date] = DatabaseUpdater._get_last_known_date(asset)
         if last_known_date is None:
             return
-        logging.debug(f"Daily historical prices update triggered. Today is {today_date}.")
+        logging.debug(f"Daily historical {asset} prices update triggered. Today is {today_date}.")
 
         if today_date == last_known_date:
             logging.debug("Nothing to update.")
 
         while last_known_date < today_date:
             current_date: date = last_known_date + timedelta(days=1)
-            logging.debug(f"Updating price for {current_date}.")
-            DatabaseUpdater._update_selected_date(current_date)
+            logging.debug(f"Updating {asset} price for {current_date}.")
+            DatabaseUpdater._update_selected_date(asset, coingecko_id, current_date)
             last_known_date += timedelta(days=1)
 
     @staticmethod
-    def _get_last_known_date() -> Optional[date]:
-        """Check the date of last known price."""
+    def _get_last_known_date(asset: str) -> Optional[date]:
+        """Check the date of last known price, yesterday for assets without any prices yet."""
         last_known_date: Optional[date] = None
 
         with DatabaseProvider.handler() as handler:
-            handler().execute(QUERIES.SELECT_LAST_KNOWN_DATE)
-            last_known_date = handler().fetchall()[0][0].date()
+            handler().execute(QUERIES.SELECT_LAST_KNOWN_DATE, (asset,))
+            last_known: Optional[datetime] = handler().fetchall()[0][0]
+            if last_known is not None:
+                last_known_date = last_known.date()
+            else:
+                last_known_date = date.today() - timedelta(days=1)
 
         if not handler.success:
             return None
 
-        logging.debug(f"{last_known_date=}")
+        logging.debug(f"{asset=}, {last_known_date=}")
         return last_known_date
 
     @staticmethod
-    def _update_selected_date(selected_date: date) -> bool:
-        """Fetch price for chosen date and put it in the database."""
+    def _update_selected_date(asset: str, coingecko_id: str, selected_date: date) -> bool:
+        """Fetch price of an asset for chosen date and put it in the database."""
+        import requests  # pylint: disable=import-outside-toplevel
+
         date_string_dmy: str = selected_date.strftime("%d-%m-%Y")
-        url = f"https://api.coingecko.com/api/v3/coins/bitcoin/history?date={date_string_dmy}"
+        url = (
+            f"https://api.coingecko.com/api/v3/coins/{coingecko_id}/history?date={date_string_dmy}"
+        )
         response = requests.get(url)
         price: float = float(response.json()["market_data"]["current_price"]["usd"])
 
         date_string_ymd: str = selected_date.strftime("%Y-%m-%d")
         with DatabaseProvider.handler() as handler:
+            handler().execute(QUERIES.CREATE_RATE_HISTORY_PARTITION, (date_string_ymd,))
             handler().execute(
                 QUERIES.INSERT_PRICE,
                 (
+                    asset,
                     date_string_ymd,
                     price,
                 ),
             )
+            LeaderElection.notify(handler(), "prices")
 
         if handler.success:
             return True
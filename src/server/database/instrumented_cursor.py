@@ -0,0 +1,226 @@
+import dataclasses
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Iterable, Iterator, Optional
+
+import psycopg
+from psycopg.abc import Params, Query
+
+from .. import CONSTANTS, QUERIES
+from ..metrics import METRICS
+
+
+@dataclasses.dataclass
+class QueryStats:
+    """Statistics of the query most recently executed on a cursor."""
+
+    query: Query
+    params: Optional[Params]
+    name: str
+    execute_time: float = 0.0
+    fetch_time: float = 0.0
+    rows: int = 0
+
+    @property
+    def total_time(self) -> float:
+        """Time spent in execute and fetch calls, in seconds."""
+        return self.execute_time + self.fetch_time
+
+
+class InstrumentedCursor(psycopg.Cursor):
+    """Cursor recording execution time and row counts of every query.
+
+    Queries are labelled with their QUERIES attribute name (e.g. SELECT_CHART), so the number of
+    label values is bounded; any other query is labelled "other". Execute time goes to
+    METRICS.DATABASE_QUERY_DURATION as soon as the query returns. When the next query starts or
+    finish() is called, the query is complete: its fetched rows are counted, and if execute and
+    fetch calls took more than CONSTANTS.SLOW_QUERY_THRESHOLD it is written to the slow query
+    log, with a sample of read-only queries explained with EXPLAIN (ANALYZE, BUFFERS). Queries
+    are explained only in the transaction which ran them, before it commits, so DatabaseProvider
+    finishes the cursor before commit and with explain=False after a rollback.
+    """
+
+    query_names: dict[Any, str] = {
+        field.default: field.name for field in dataclasses.fields(QUERIES)  # type: ignore
+    }
+    slow_query_logger: logging.Logger = logging.getLogger("ctb.slow_query")
+    # Queries without side effects. Some SELECT statements call functions which lock, notify or
+    # create partitions (TRY_ADVISORY_LOCK, NOTIFY_DATA_UPDATED, CREATE_*_PARTITION), so they
+    # are not told apart by the statement text.
+    explainable_queries: frozenset[str] = frozenset(
+        {
+            "SELECT_USER_UUID",
+            "SELECT_USER_EMAIL",
+            "SELECT_USER_EMAIL_BY_UUID",
+            "SELECT_USER_LOGIN_DATA_BY_EMAIL",
+            "SELECT_USER_DATA_BY_UUID",
+            "SELECT_REVOKED_TOKEN",
+            "SELECT_ASSETS",
+            "SELECT_ASSET",
+            "SELECT_CHART",
+            "SELECT_CHART_AGGREGATED",
+            "SELECT_CHART_INTRADAY",
+            "SELECT_LAST_KNOWN_DATE",
+            "SELECT_RATE_HISTORY_COUNT",
+            "SELECT_LATEST_STOCK_PRICE",
+            "WALLET_TRANSACTION_HISTORY",
+            "SELECT_FUTURE_VALUE",
+        }
+    )
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._stats: Optional[QueryStats] = None
+
+    def execute(  # type: ignore[override]
+        self,
+        query: Query,
+        params: Optional[Params] = None,
+        *,
+        prepare: Optional[bool] = None,
+        binary: Optional[bool] = None,
+    ) -> "InstrumentedCursor":
+        stats: QueryStats = self._start(query, params)
+        start: float = time.perf_counter()
+        try:
+            super().execute(query, params, prepare=prepare, binary=binary)
+        finally:
+            self._executed(stats, start)
+        return self
+
+    def executemany(
+        self, query: Query, params_seq: Iterable[Params], *, returning: bool = False
+    ) -> None:
+        stats: QueryStats = self._start(query, None)
+        start: float = time.perf_counter()
+        try:
+            super().executemany(query, params_seq, returning=returning)
+        finally:
+            self._executed(stats, start)
+
+    @contextmanager
+    def copy(  # type: ignore[override]
+        self, statement: Query, params: Optional[Params] = None, **kwargs: Any
+    ) -> Iterator[psycopg.Copy]:
+        stats: QueryStats = self._start(statement, params)
+        start: float = time.perf_counter()
+        try:
+            with super().copy(statement, params, **kwargs) as copy:
+                yield copy
+        finally:
+            self._executed(stats, start)
+
+    def fetchone(self) -> Any:
+        start: float = time.perf_counter()
+        row: Any = super().fetchone()
+        self._fetched(start, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size: int = 0) -> list[Any]:
+        start: float = time.perf_counter()
+        rows: list[Any] = super().fetchmany(size)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self) -> list[Any]:
+        start: float = time.perf_counter()
+        rows: list[Any] = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+    def finish(self, explain: bool = True) -> None:
+        """Complete statistics of the last query, called when the handler context ends.
+
+        Args:
+            explain (bool): Whether a slow query may be explained, False once its transaction
+                has ended, e.g. rolled back after an error.
+
+        """
+        stats: Optional[QueryStats] = self._stats
+        self._stats = None
+        if stats is None:
+            return
+
+        METRICS.DATABASE_ROWS.inc(stats.name, amount=stats.rows)
+        if stats.total_time >= CONSTANTS.SLOW_QUERY_THRESHOLD:
+            METRICS.DATABASE_SLOW_QUERIES.inc(stats.name)
+            self._log_slow_query(stats, explain)
+
+    def _start(self, query: Query, params: Optional[Params]) -> QueryStats:
+        self.finish()
+        self._stats = QueryStats(query, params, self.query_names.get(query, "other"))
+        return self._stats
+
+    def _executed(self, stats: QueryStats, start: float) -> None:
+        stats.execute_time = time.perf_counter() - start
+        if self.rowcount > 0 and self.pgresult is not None and not self.pgresult.nfields:
+            stats.rows = self.rowcount  # rows affected by INSERT, UPDATE or DELETE
+        METRICS.DATABASE_QUERY_DURATION.observe(stats.execute_time, stats.name)
+
+    def _fetched(self, start: float, rows: int) -> None:
+        if self._stats is not None:
+            self._stats.fetch_time += time.perf_counter() - start
+            self._stats.rows += rows
+
+    def _log_slow_query(self, stats: QueryStats, explain: bool) -> None:
+        """Write slow query to its own log, parameter values are replaced with their types."""
+        entry: dict[str, Any] = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "query": stats.name,
+            "execute_ms": round(stats.execute_time * 1000, 3),
+            "fetch_ms": round(stats.fetch_time * 1000, 3),
+            "rows": stats.rows,
+            "params": _redact(stats.params),
+        }
+        if stats.name == "other" and isinstance(stats.query, str):
+            entry["statement"] = stats.query[:200]
+        if (
+            explain
+            and self._in_transaction()
+            and random.random() < CONSTANTS.SLOW_QUERY_EXPLAIN_RATE
+        ):
+            entry["plan"] = self._explain(stats)
+
+        self.slow_query_logger.warning(json.dumps(entry, default=str))
+
+    def _in_transaction(self) -> bool:
+        """Whether the connection is in a transaction which has not failed."""
+        return self.connection.info.transaction_status == psycopg.pq.TransactionStatus.INTRANS
+
+    def _explain(self, stats: QueryStats) -> Any:
+        """Return EXPLAIN (ANALYZE, BUFFERS) plan of a read-only query, None for other statements.
+
+        ANALYZE executes the statement again, so only queries in explainable_queries are
+        explained. It runs in a savepoint which is always rolled back, so neither its effects nor
+        its failure reach the transaction of the handler.
+        """
+        if stats.name not in self.explainable_queries:
+            return None
+
+        plan: Optional[tuple[Any]] = None
+        try:
+            with self.connection.transaction() as savepoint:
+                cursor: psycopg.Cursor = psycopg.Cursor(self.connection)
+                cursor.execute(
+                    "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + stats.query,  # type: ignore
+                    stats.params,
+                )
+                plan = cursor.fetchone()
+                raise psycopg.Rollback(savepoint)
+        except psycopg.Error as err:
+            logging.warning("Cannot explain slow query %s: %s", stats.name, err)
+            return None
+        return plan[0] if plan is not None else None
+
+
+def _redact(params: Optional[Params]) -> Any:
+    """Return parameters with values replaced by their type names."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
@@ -0,0 +1,156 @@
+import logging
+import os
+import select
+import threading
+from typing import Callable, Optional
+
+import psycopg
+
+from .. import CONSTANTS, QUERIES
+from ..metrics import METRICS
+from . import DatabaseProvider
+
+
+class LeaderElection:
+    """Elect a single process, out of all server processes, to run scheduled jobs.
+
+    Every process started with start() keeps its own autocommit connection to the database and
+    tries to take the session-level advisory lock CONSTANTS.LEADER_LOCK_ID on it. The process
+    holding the lock is the leader. The lock is released by Postgres when the connection of the
+    leader closes, e.g. when the leader process dies, and is taken by another process on its
+    next attempt, every CONSTANTS.LEADER_POLL_INTERVAL seconds. A leader which loses its
+    connection stops leading before it reconnects.
+
+    All processes LISTEN on the DATA_UPDATED_CHANNEL, notify() sends a notification to all of
+    them when the transaction of the current handler commits:
+
+        LeaderElection.start(on_elected=start_jobs, on_demoted=stop_jobs)
+        LeaderElection.subscribe(lambda payload: logging.info("New %s", payload))
+
+        with DatabaseProvider.handler() as handler:
+            handler().execute(QUERIES.INSERT_PRICE, (asset, date, price))
+            LeaderElection.notify(handler(), "prices")
+    """
+
+    DATA_UPDATED_CHANNEL: str = "ctb_data_updated"
+    # Payloads sent by notify(), other notifications on the channel are counted and ignored.
+    PAYLOADS: tuple[str, ...] = ("prices", "intraday", "predictions")
+
+    is_leader: bool = False
+    listeners: list[Callable[[str], None]] = []
+
+    _connection: Optional[psycopg.Connection] = None
+    _thread: Optional[threading.Thread] = None
+    _stop: threading.Event = threading.Event()
+    _on_elected: Callable[[], None] = lambda: None
+    _on_demoted: Callable[[], None] = lambda: None
+
+    @classmethod
+    def start(
+        cls,
+        on_elected: Callable[[], None],
+        on_demoted: Callable[[], None],
+    ) -> None:
+        """Start competing for leadership in the background, does nothing if already started.
+
+        Args:
+            on_elected (Callable[[], None]): Called when this process becomes the leader.
+            on_demoted (Callable[[], None]): Called when this process stops being the leader.
+
+        """
+        if cls._thread is not None and cls._thread.is_alive():
+            return
+
+        cls._on_elected = on_elected
+        cls._on_demoted = on_demoted
+        cls._stop.clear()
+        cls._thread = threading.Thread(target=cls._run, name="leader-election", daemon=True)
+        cls._thread.start()
+
+    @classmethod
+    def stop(cls) -> None:
+        """Give up leadership and stop competing for it."""
+        cls._stop.set()
+        if cls._thread is not None:
+            cls._thread.join()
+            cls._thread = None
+
+    @classmethod
+    def subscribe(cls, listener: Callable[[str], None]) -> None:
+        """Call listener with the payload of every data update notification."""
+        cls.listeners.append(listener)
+
+    @staticmethod
+    def notify(cursor: psycopg.Cursor, payload: str) -> None:
+        """Notify all processes about new data once the transaction of the cursor commits."""
+        cursor.execute(QUERIES.NOTIFY_DATA_UPDATED, (LeaderElection.DATA_UPDATED_CHANNEL, payload))
+
+    @classmethod
+    def _run(cls) -> None:
+        while not cls._stop.is_set():
+            try:
+                if cls._connection is None or cls._connection.closed:
+                    cls._disconnect()
+                    cls._connect()
+                cls._poll()
+            except psycopg.Error as err:
+                logging.warning("Leader election connection failed: %s", err)
+                cls._disconnect()
+                cls._stop.wait(CONSTANTS.LEADER_POLL_INTERVAL)
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("Leader election failed")
+                cls._disconnect()
+                cls._stop.wait(CONSTANTS.LEADER_POLL_INTERVAL)
+        cls._disconnect()
+
+    @classmethod
+    def _connect(cls) -> None:
+        cls._connection = psycopg.connect(DatabaseProvider.conninfo(), autocommit=True)
+        cls._connection.add_notify_handler(cls._dispatch)
+        cls._connection.execute(f"LISTEN {cls.DATA_UPDATED_CHANNEL}")
+
+    @classmethod
+    def _poll(cls) -> None:
+        """Try to take the lock (leader: check the connection), wait for notifications."""
+        connection: psycopg.Connection = cls._connection  # type: ignore[assignment]
+        if cls.is_leader:
+            connection.execute("SELECT 1")
+        else:
+            row: Optional[tuple[bool]] = connection.execute(
+                QUERIES.TRY_ADVISORY_LOCK, (CONSTANTS.LEADER_LOCK_ID,)
+            ).fetchone()
+            if row is not None and row[0]:
+                cls.is_leader = True
+                METRICS.SCHEDULER_LEADER.set(1)
+                logging.info("This process is the leader, pid %s", os.getpid())
+                cls._on_elected()
+
+        # Notifications are dispatched by the next query, after waiting for one to arrive.
+        select.select([connection.fileno()], [], [], CONSTANTS.LEADER_POLL_INTERVAL)
+
+    @classmethod
+    def _disconnect(cls) -> None:
+        """Close the connection, which releases the lock, and stop leading."""
+        if cls.is_leader:
+            cls.is_leader = False
+            METRICS.SCHEDULER_LEADER.set(0)
+            logging.warning("This process is no longer the leader")
+            cls._on_demoted()
+        if cls._connection is not None:
+            cls._connection.close()
+            cls._connection = None
+
+    @classmethod
+    def _dispatch(cls, notification: psycopg.Notify) -> None:
+        if notification.payload not in cls.PAYLOADS:
+            # Anyone can NOTIFY the channel, so unknown payloads share one metrics label.
+            METRICS.DATA_UPDATE_NOTIFICATIONS.inc("other")
+            logging.warning("Ignoring data update notification %r", notification.payload)
+            return
+
+        METRICS.DATA_UPDATE_NOTIFICATIONS.inc(notification.payload)
+        for listener in cls.listeners:
+            try:
+                listener(notification.payload)
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("Data update listener failed")
@@ -1 +1,4 @@
+from .dropping_queue_handler import DroppingQueueHandler
+from .draining_queue_listener import DrainingQueueListener
+from .json_formatter import JsonFormatter
 from .log_manager import LogManager
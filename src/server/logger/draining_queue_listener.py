@@ -0,0 +1,32 @@
+import logging
+import queue
+from logging.handlers import QueueListener
+
+
+class DrainingQueueListener(QueueListener):
+    """Queue listener which can be stopped while its bounded queue is full.
+
+    QueueListener.stop() puts its sentinel with put_nowait(), which raises queue.Full if the
+    queue is full at shutdown. The sentinel is put here with a blocking put instead, which
+    succeeds as soon as the listener thread takes a record. If the thread does not take any
+    within `stop_timeout` seconds (e.g. the disk stalls), queued records are abandoned and the
+    thread, a daemon one, is not waited for.
+    """
+
+    def __init__(
+        self, log_queue: "queue.Queue[logging.LogRecord]", *handlers: logging.Handler
+    ) -> None:
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.stop_timeout: float = 5.0
+
+    def stop(self) -> None:
+        """Write out all queued records and stop the thread."""
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(self._sentinel, timeout=self.stop_timeout)  # type: ignore
+        except queue.Full:
+            pass
+        else:
+            self._thread.join()
+        self._thread = None
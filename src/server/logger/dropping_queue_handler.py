@@ -0,0 +1,54 @@
+import copy
+import logging
+import queue
+from logging.handlers import QueueHandler
+from typing import Any, Iterable, Mapping
+
+from ..metrics import METRICS
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler which never blocks the logging thread.
+
+    Records are put into a bounded queue consumed by a QueueListener thread, which does the
+    formatting and the disk writes. If the queue is full (e.g. the disk stalls), the record is
+    dropped and counted in METRICS.LOG_RECORDS_DROPPED instead of waiting.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.dropped: int = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            METRICS.LOG_RECORDS_DROPPED.inc(record.levelname)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Return a copy of the record safe to pass to another thread.
+
+        Unlike QueueHandler.prepare(), a message whose arguments are all immutable (str, numbers,
+        None) is not merged with them here, it is formatted in the listener thread. Any other
+        argument may change after the call, so such messages are merged right away, as by the
+        standard handler. The traceback is always rendered, as it refers to frames of the
+        logging thread.
+        """
+        record = copy.copy(record)
+        if record.args and not _immutable(record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_IMMUTABLE_TYPES: tuple[type, ...] = (str, int, float, bool, bytes, type(None))
+
+
+def _immutable(args: Any) -> bool:
+    """Return True if formatting the arguments later gives the same message as now."""
+    values: Iterable[Any] = args.values() if isinstance(args, Mapping) else args
+    return all(isinstance(value, _IMMUTABLE_TYPES) for value in values)
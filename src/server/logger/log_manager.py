@@ -1,20 +1,42 @@
+import atexit
 import logging
 import os
+import queue
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 
 from .. import CONSTANTS
+from . import DrainingQueueListener, DroppingQueueHandler, JsonFormatter
 
 
 class LogManager:
-    """Setup logging for the server."""
+    """Setup logging for the server.
+
+    Logging threads only put records into bounded queues, formatting and writing to the rotating
+    files is done by QueueListener threads, so a slow disk or file rotation does not add latency
+    to requests. When a queue is full, records are dropped and counted instead.
+    """
+
+    listeners: list[DrainingQueueListener] = []
 
     @classmethod
     def initialize(cls) -> None:
-        """Initialize logging manager."""
+        """Initialize logging manager, does nothing if it is already initialized."""
+        if cls.listeners:
+            return
+
         cls._ensure_log_dir_exists()
         cls._setup_logger_config()
+        cls._setup_slow_query_logger()
         cls._setup_external_loggers()
+        atexit.register(cls.shutdown)
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Stop listener threads after writing out all queued records."""
+        for listener in cls.listeners:
+            listener.stop()
+        cls.listeners.clear()
 
     @classmethod
     def _ensure_log_dir_exists(cls) -> None:
@@ -30,17 +52,46 @@ class LogManager:
             backupCount=10,
             encoding="utf-8",
         )
+        if CONSTANTS.LOG_FORMAT == "json":
+            rotating_file_handler.setFormatter(JsonFormatter())
+        else:
+            rotating_file_handler.setFormatter(
+                logging.Formatter(
+                    "%(levelname)s|%(asctime)s|%(name)s|%(filename)s:%(lineno)d|%(funcName)s()| "
+                    "%(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S",
+                )
+            )
+
+        root_logger: logging.Logger = logging.getLogger()
+        root_logger.handlers = [cls._queued(rotating_file_handler)]
+        root_logger.setLevel(CONSTANTS.LOG_LEVEL)
 
-        logging.basicConfig(
-            format="%(levelname)s|%(asctime)s|%(name)s|%(filename)s:%(lineno)d|%(funcName)s()| "
-            f"%(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-            level=CONSTANTS.LOG_LEVEL,
+    @classmethod
+    def _setup_slow_query_logger(cls) -> None:
+        """Write slow queries (one JSON object per line) to their own file only."""
+        slow_query_handler: RotatingFileHandler = RotatingFileHandler(
+            filename=f"{CONSTANTS.LOG_DIRECTORY}/slow_queries.log",
+            maxBytes=1000 * 1000 * 50,  # 50 MB
+            backupCount=10,
             encoding="utf-8",
-            handlers=[rotating_file_handler],
         )
+        slow_query_handler.setFormatter(logging.Formatter("%(message)s"))
+
+        slow_query_logger: logging.Logger = logging.getLogger("ctb.slow_query")
+        slow_query_logger.handlers = [cls._queued(slow_query_handler)]
+        slow_query_logger.propagate = False
 
     @classmethod
     def _setup_external_loggers(cls) -> None:
         logging.getLogger("werkzeug").setLevel(logging.INFO)
         logging.getLogger("apscheduler").setLevel(logging.WARNING)
+
+    @classmethod
+    def _queued(cls, handler: logging.Handler) -> DroppingQueueHandler:
+        """Return handler putting records into a queue consumed by a thread writing to handler."""
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(CONSTANTS.LOG_QUEUE_SIZE)
+        listener: DrainingQueueListener = DrainingQueueListener(log_queue, handler)
+        listener.start()
+        cls.listeners.append(listener)
+        return DroppingQueueHandler(log_queue)
@@ -1,28 +1,55 @@
-from flask import Blueprint, Flask
+import logging
+import time
+from typing import Any
+
+from flask import Blueprint, Flask, Response, g, request
 from flask_cors import CORS
 from flask_swagger_ui import get_swaggerui_blueprint
 
-from . import SchemaValidator
-from .auth import AuthController
+from . import CONSTANTS, SchemaValidator
+from .auth import AuthController, PasswordHasher
 from .database import DatabaseProvider, DatabaseUpdater
 from .logger import LogManager
+from .metrics import METRICS
+from .metrics.metrics_controller import MetricsController
+from .profiler import ProfilerController, RequestProfiler
 from .stock_market import StockMarketController
 from .wallet import WalletController
 
 
 class Server:
-    """Main application start point."""
+    """Main application start point.
+
+    Components are initialized in two steps. The constructor loads immutable data (settings,
+    compiled schema validators, the application with its routes). start() opens the database
+    connection and starts threads (log listeners, password hashing pool, leader election),
+    which do not survive fork().
+
+    With preload=True start() is not called, so the server can be created once in the gunicorn
+    master process and shared copy-on-write by its workers, each calling start() after fork,
+    see gunicorn.conf.py.
+    """
+
+    def __init__(self, preload: bool = False) -> None:
+        """Initialize server application along with its endpoints and cors.
 
-    def __init__(self) -> None:
-        """Initialize server application along with its endpoints and cors."""
-        LogManager.initialize()
-        DatabaseProvider.initialize()
-        SchemaValidator.initialize()
-        DatabaseUpdater.initialize()
+        Args:
+            preload (bool): Create the server in a process which forks workers, skip start().
+
+        """
+        self.startup_times: dict[str, float] = {}
+        if not preload:
+            self._initialize(LogManager)
+        self._initialize(RequestProfiler, SchemaValidator)
+        if preload and CONSTANTS.PRELOAD_MODEL:
+            start: float = time.perf_counter()
+            DatabaseUpdater.get_stock_predictor()
+            self.startup_times["StockPredictorManager"] = time.perf_counter() - start
 
         self.name: str = __name__
         self.app: Flask = self._create_app()
         self.app.json.sort_keys = False
+        self.app.extensions["ctb_server"] = self
         self.ctx = self.app.app_context()
         self.ctx.push()
 
@@ -31,6 +58,30 @@ class Server:
         )
         self._setup_endpoints()
 
+        if not preload:
+            self.start()
+
+    def start(self) -> None:
+        """Initialize components which open connections or start threads, once per process."""
+        self._initialize(LogManager, DatabaseProvider, PasswordHasher, DatabaseUpdater)
+        logging.info(
+            "Startup times: %s",
+            ", ".join(
+                f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.startup_times.items()
+            ),
+        )
+
+    def _initialize(self, *components: Any) -> None:
+        """Call initialize() of components, recording the time of each call."""
+        for component in components:
+            start: float = time.perf_counter()
+            component.initialize()
+            name: str = component.__name__
+            self.startup_times[name] = (
+                self.startup_times.get(name, 0.0) + time.perf_counter() - start
+            )
+            METRICS.STARTUP_DURATION.set(self.startup_times[name], name)
+
     def _create_app(self) -> Flask:
         """Create Flask server."""
         return Flask(self.name)
@@ -48,6 +99,13 @@ class Server:
         self.v1.register_blueprint(WalletController.blueprint)
         self.api.register_blueprint(self.v1)
         self.app.register_blueprint(self.api)
+        self.app.register_blueprint(MetricsController.blueprint)
+        self.app.register_blueprint(ProfilerController.blueprint)
+
+        self.app.before_request(start_request_timer)
+        self.app.before_request(RequestProfiler.start_request)
+        self.app.after_request(observe_request_duration)
+        self.app.teardown_request(RequestProfiler.stop_request)
 
 
 def hello_world_endpoint() -> str:
@@ -55,7 +113,24 @@ def hello_world_endpoint() -> str:
     return "<p>Hello, World!</p>"
 
 
-def create_app() -> Flask:
-    """Server launch."""
-    server = Server()
+def start_request_timer() -> None:
+    """Remember when handling of the request started."""
+    g.request_start = time.perf_counter()
+
+
+def observe_request_duration(response: Response) -> Response:
+    """Record request duration labelled with the route pattern, not the actual path."""
+    if "request_start" in g:
+        METRICS.HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - g.request_start,
+            request.method,
+            request.url_rule.rule if request.url_rule is not None else "unmatched",
+            str(response.status_code),
+        )
+    return response
+
+
+def create_app(preload: bool = False) -> Flask:
+    """Server launch, with preload=True the server is started later by Server.start()."""
+    server = Server(preload)
     return server.app
@@ -0,0 +1,3 @@
+from .metric_types import Counter, Gauge, Histogram
+from .metrics_registry import MetricsRegistry
+from .server_metrics import METRICS
@@ -0,0 +1,158 @@
+import bisect
+import math
+import threading
+from typing import Generator, Sequence
+
+Labels = tuple[str, ...]
+
+
+class Metric:
+    """Base class of metrics with a fixed set of label names.
+
+    Values are kept per label values tuple, updates are guarded by a lock per metric, which costs
+    well below a microsecond, so metrics can be updated on every request and query.
+    """
+
+    type_name: str = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> None:
+        """Create metric, its name must follow Prometheus naming rules.
+
+        Args:
+            name (str): Metric name, e.g. ctb_http_requests_total.
+            documentation (str): Description shown in the HELP line.
+            label_names (Sequence[str]): Names of labels, values are given on every update.
+
+        """
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_names: Labels = tuple(label_names)
+        self._lock: threading.Lock = threading.Lock()
+
+    def samples(self) -> Generator[tuple[str, Labels, Labels, float], None, None]:
+        """Yield (sample name, label names, label values, value) of every exposed sample."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Remove all collected values."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+
+    type_name: str = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, label_names)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Increase value of the counter with given label values."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        """Return current value for given label values."""
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Generator[tuple[str, Labels, Labels, float], None, None]:
+        with self._lock:
+            values: list[tuple[Labels, float]] = list(self._values.items())
+        for labels, value in values:
+            yield self.name, self.label_names, labels, value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    """Value which can go up and down."""
+
+    type_name: str = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        """Set value of the gauge with given label values."""
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        """Decrease value of the gauge with given label values."""
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets, e.g. latencies in seconds."""
+
+    type_name: str = "histogram"
+    DEFAULT_BUCKETS: tuple[float, ...] = (
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+    )
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        # label values -> [count per bucket (last one is +Inf), sum of observed values]
+        self._values: dict[Labels, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record a single value with given label values."""
+        index: int = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(labels, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def count(self, *labels: str) -> int:
+        """Return number of observations for given label values."""
+        return sum(self._values[labels][0]) if labels in self._values else 0
+
+    def samples(self) -> Generator[tuple[str, Labels, Labels, float], None, None]:
+        with self._lock:
+            values: list[tuple[Labels, list[int], float]] = [
+                (labels, list(counts), total[0]) for labels, (counts, total) in self._values.items()
+            ]
+
+        bucket_label_names: Labels = self.label_names + ("le",)
+        for labels, counts, total in values:
+            cumulative: int = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    bucket_label_names,
+                    labels + (_format_value(bound),),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", self.label_names, labels, total
+            yield f"{self.name}_count", self.label_names, labels, cumulative
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+def _format_value(value: float) -> str:
+    """Format number as in Prometheus text format."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
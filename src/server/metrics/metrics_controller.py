@@ -0,0 +1,25 @@
+from flask import Blueprint, Response
+
+from ..auth import TokenService
+from .metrics_registry import MetricsRegistry
+
+
+class MetricsController:
+    """Internal endpoints, not part of the public API, see TokenService.internal_token_required.
+
+    Not exported by the metrics package: the database package imports metrics, so importing auth
+    from there would be circular.
+
+    Under gunicorn a scrape is served by a single worker and returns only its metrics, labelled
+    with its pid. Scrape often enough for every worker to be reached within the staleness window,
+    or scrape the workers directly, e.g. one bind address per worker.
+    """
+
+    blueprint = Blueprint("internal", __name__, url_prefix="/internal")
+
+    @staticmethod
+    @blueprint.route("/metrics", methods=["GET"])
+    @TokenService.internal_token_required
+    def metrics() -> Response:
+        """Metrics in Prometheus text format."""
+        return Response(MetricsRegistry.render(), content_type=MetricsRegistry.CONTENT_TYPE)
@@ -0,0 +1,65 @@
+import os
+from typing import TypeVar
+
+from .metric_types import Labels, Metric, _format_value
+
+MetricType = TypeVar("MetricType", bound=Metric)
+
+
+class MetricsRegistry:
+    """Collection of all metrics exposed by the server in Prometheus text format.
+
+    Metrics are registered once, when their module is imported:
+
+        REQUESTS = MetricsRegistry.register(Counter("ctb_requests_total", "Requests", ["route"]))
+        REQUESTS.inc("/api/v1/stock/price")
+        MetricsRegistry.render()  # '# HELP ctb_requests_total Requests\\n...'
+
+    Values are kept in the memory of the process. Every gunicorn worker has its own registry, so
+    render() adds a pid label to all samples: series of different workers do not overwrite each
+    other and are summed up in queries, e.g. sum without (pid) (rate(ctb_requests_total[5m])).
+    """
+
+    CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+    metrics: dict[str, Metric] = {}
+
+    @classmethod
+    def register(cls, metric: MetricType) -> MetricType:
+        """Add metric to the registry and return it, names must be unique."""
+        if metric.name in cls.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        cls.metrics[metric.name] = metric
+        return metric
+
+    @classmethod
+    def render(cls) -> str:
+        """Return all metrics in Prometheus text exposition format."""
+        lines: list[str] = []
+        pid: Labels = (str(os.getpid()),)
+        for metric in cls.metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, label_names, labels, value in metric.samples():
+                lines.append(
+                    f"{name}{_format_labels(label_names + ('pid',), labels + pid)} "
+                    f"{_format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def clear(cls) -> None:
+        """Reset values of all metrics."""
+        for metric in cls.metrics.values():
+            metric.clear()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_names: Labels, labels: Labels) -> str:
+    if not label_names:
+        return ""
+    pairs: str = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(label_names, labels))
+    return "{" + pairs + "}"
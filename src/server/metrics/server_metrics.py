@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+
+from .metric_types import Counter, Gauge, Histogram
+from .metrics_registry import MetricsRegistry
+
+
+@dataclass(frozen=True)
+class METRICS:
+    """All metrics collected by the server."""
+
+    HTTP_REQUEST_DURATION: Histogram = MetricsRegistry.register(
+        Histogram(
+            "ctb_http_request_duration_seconds",
+            "Time spent handling HTTP requests.",
+            ["method", "route", "status"],
+        )
+    )
+    DATABASE_QUERY_DURATION: Histogram = MetricsRegistry.register(
+        Histogram(
+            "ctb_database_query_duration_seconds",
+            "Time spent executing database queries, by QUERIES name.",
+            ["query"],
+        )
+    )
+    DATABASE_ROWS: Counter = MetricsRegistry.register(
+        Counter(
+            "ctb_database_rows_total",
+            "Rows fetched or modified by database queries, by QUERIES name.",
+            ["query"],
+        )
+    )
+    DATABASE_SLOW_QUERIES: Counter = MetricsRegistry.register(
+        Counter(
+            "ctb_database_slow_queries_total",
+            "Queries slower than CTB_SLOW_QUERY_MS, by QUERIES name.",
+            ["query"],
+        )
+    )
+    DATABASE_ERRORS: Counter = MetricsRegistry.register(
+        Counter(
+            "ctb_database_errors_total",
+            "Failed database handler contexts, by resulting Message.",
+            ["message"],
+        )
+    )
+    CACHE_REQUESTS: Counter = MetricsRegistry.register(
+        Counter(
+            "ctb_cache_requests_total",
+            "Cache lookups, by cache name and result (hit or miss).",
+            ["cache", "result"],
+        )
+    )
+    LOG_RECORDS_DROPPED: Counter = MetricsRegistry.register(
+        Counter(
+            "ctb_log_records_dropped_total",
+            "Log records dropped because the logging queue was full, by level.",
+            ["level"],
+        )
+    )
+    PASSWORD_HASH_PENDING: Gauge = MetricsRegistry.register(
+        Gauge(
+            "ctb_password_hash_pending",
+            "Password hash operations waiting for or running in the hashing pool.",
+        )
+    )
+    PASSWORD_HASH_WAIT: Histogram = MetricsRegistry.register(
+        Histogram(
+            "ctb_password_hash_wait_seconds",
+            "Time password hash operations waited for a hashing pool thread, by operation.",
+            ["operation"],
+        )
+    )
+    PASSWORD_HASH_DURATION: Histogram = MetricsRegistry.register(
+        Histogram(
+            "ctb_password_hash_duration_seconds",
+            "Time spent computing password hashes, by operation (hash or verify).",
+            ["operation"],
+        )
+    )
+    PASSWORD_HASH_REJECTED: Counter = MetricsRegistry.register(
+        Counter(
+            "ctb_password_hash_rejected_total",
+            "Password hash operations rejected because the hashing pool was full, by operation.",
+            ["operation"],
+        )
+    )
+    STARTUP_DURATION: Gauge = MetricsRegistry.register(
+        Gauge(
+            "ctb_startup_duration_seconds",
+            "Time spent in initialize() of every server component when the process started.",
+            ["component"],
+        )
+    )
+    SCHEDULER_LEADER: Gauge = MetricsRegistry.register(
+        Gauge(
+            "ctb_scheduler_leader",
+            "1 if this process is the leader running scheduled jobs, 0 otherwise.",
+        )
+    )
+    DATA_UPDATE_NOTIFICATIONS: Counter = MetricsRegistry.register(
+        Counter(
+            "ctb_data_update_notifications_total",
+            'Data update notifications received from the leader, by payload or "other".',
+            ["payload"],
+        )
+    )
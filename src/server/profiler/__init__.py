@@ -0,0 +1,2 @@
+from .request_profiler import ProfilerSettings, RequestProfiler
+from .profiler_controller import ProfilerController
@@ -0,0 +1,29 @@
+from dataclasses import asdict
+
+from flask import Blueprint, Response, request
+
+from .. import Responses, SchemaValidator
+from ..auth import TokenService
+from . import ProfilerSettings, RequestProfiler
+
+
+class ProfilerController:
+    """Internal endpoints toggling the request profiler at runtime, see TokenService."""
+
+    blueprint = Blueprint("profiler", __name__, url_prefix="/internal/profiler")
+
+    @staticmethod
+    @blueprint.route("", methods=["GET"])
+    @TokenService.internal_token_required
+    def settings() -> Response:
+        """Current profiler settings."""
+        return Responses.profiler_settings(asdict(RequestProfiler.settings))
+
+    @staticmethod
+    @blueprint.route("", methods=["POST"])
+    @TokenService.internal_token_required
+    @SchemaValidator.validate("profiler")
+    def configure() -> Response:
+        """Update given profiler settings."""
+        settings: ProfilerSettings = RequestProfiler.configure(**request.get_json())
+        return Responses.profiler_settings(asdict(settings))
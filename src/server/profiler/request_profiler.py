@@ -0,0 +1,176 @@
+import collections
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from types import CodeType, FrameType
+from typing import Any, Optional
+
+from flask import g, request
+
+from .. import CONSTANTS
+from ..auth import TokenService
+
+
+@dataclass
+class ProfilerSettings:
+    """Which requests are profiled and how often their stacks are sampled.
+
+    Attributes:
+        enabled (bool): Profile requests selected by sample_rate or route.
+        sample_rate (float): Fraction of requests profiled at random.
+        route (str): Requests to routes containing this text are always profiled.
+        interval (float): Time between stack samples, in seconds, at least 1 ms.
+    """
+
+    enabled: bool = True
+    sample_rate: float = 0.0
+    route: str = ""
+    interval: float = 0.005
+
+
+class RequestProfiler:
+    """Statistical profiler of selected requests.
+
+    A single sampler thread periodically reads stacks of threads handling profiled requests
+    (sys._current_frames()), so a profiled request is not slowed down by tracing, and requests
+    which are not profiled cost one random() call. Requests are profiled if they have the
+    X-CTB-Profile: 1 header together with the internal token (see TokenService), their route
+    contains settings.route or they are picked with probability settings.sample_rate.
+
+    Stacks are written by the sampler thread in collapsed format ("root;caller;callee count"),
+    which flamegraph.pl and speedscope read directly, appended to one file per route:
+
+        logs/profiles/api_v1_stock_chart.folded
+
+    A file larger than CONSTANTS.PROFILE_MAX_FILE_SIZE is renamed to *.folded.1, replacing the
+    previous one, so profiles of a route take at most twice that size.
+    """
+
+    HEADER: str = "X-CTB-Profile"
+
+    settings: ProfilerSettings = ProfilerSettings()
+    _active: dict[int, collections.Counter[str]] = {}
+    _finished: "queue.Queue[tuple[str, collections.Counter[str]]]" = queue.Queue()
+    _frame_names: dict[CodeType, str] = {}
+    _lock: threading.Lock = threading.Lock()
+    _wakeup: threading.Event = threading.Event()
+    _thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def initialize(cls) -> None:
+        """Load settings from environment."""
+        cls.configure(
+            sample_rate=CONSTANTS.PROFILE_SAMPLE_RATE,
+            route=CONSTANTS.PROFILE_ROUTE,
+            interval=CONSTANTS.PROFILE_INTERVAL,
+        )
+
+    @classmethod
+    def configure(cls, **settings: Any) -> ProfilerSettings:
+        """Update given settings at runtime and return all of them."""
+        new_settings: ProfilerSettings = ProfilerSettings(**{**asdict(cls.settings), **settings})
+        new_settings.interval = max(new_settings.interval, CONSTANTS.PROFILE_MIN_INTERVAL)
+        cls.settings = new_settings
+        logging.info("Profiler settings: %s", new_settings)
+        return new_settings
+
+    @classmethod
+    def start_request(cls) -> None:
+        """Start sampling the current thread if the request is selected for profiling."""
+        if not cls._is_selected():
+            return
+
+        g.profiled = True
+        with cls._lock:
+            cls._active[threading.get_ident()] = collections.Counter()
+        cls._ensure_sampler()
+        cls._wakeup.set()
+
+    @classmethod
+    def stop_request(cls, _error: Optional[BaseException] = None) -> None:
+        """Stop sampling the current thread and pass its stacks to the sampler to be written."""
+        if not g.get("profiled", False):
+            return
+
+        with cls._lock:
+            stacks: Optional[collections.Counter[str]] = cls._active.pop(
+                threading.get_ident(), None
+            )
+        route: str = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        if stacks:
+            cls._finished.put((route, stacks))
+            cls._wakeup.set()
+
+    @classmethod
+    def _is_selected(cls) -> bool:
+        if request.headers.get(cls.HEADER) == "1" and TokenService.has_internal_token():
+            return True
+        if not cls.settings.enabled:
+            return False
+        if cls.settings.route and request.url_rule is not None:
+            if cls.settings.route in request.url_rule.rule:
+                return True
+        return random.random() < cls.settings.sample_rate
+
+    @classmethod
+    def _ensure_sampler(cls) -> None:
+        with cls._lock:
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._thread = threading.Thread(
+                    target=cls._sample_forever, name="request-profiler", daemon=True
+                )
+                cls._thread.start()
+
+    @classmethod
+    def _sample_forever(cls) -> None:
+        """Sample stacks of profiled threads while there are any, write finished profiles."""
+        while True:
+            if not cls._active and cls._finished.empty():
+                cls._wakeup.wait(timeout=1.0)
+                cls._wakeup.clear()
+                continue
+
+            frames: dict[int, FrameType] = sys._current_frames()  # pylint: disable=W0212
+            with cls._lock:
+                for thread_id, stacks in cls._active.items():
+                    if thread_id in frames:
+                        stacks[cls._collapse(frames[thread_id])] += 1
+            del frames
+
+            while not cls._finished.empty():
+                cls._write(*cls._finished.get_nowait())
+
+            time.sleep(cls.settings.interval)
+
+    @classmethod
+    def _collapse(cls, frame: Optional[FrameType]) -> str:
+        """Return stack as "root;...;leaf" frame names."""
+        names: list[str] = []
+        while frame is not None:
+            name: Optional[str] = cls._frame_names.get(frame.f_code)
+            if name is None:
+                name = f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})"
+                cls._frame_names[frame.f_code] = name
+            names.append(name)
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    @classmethod
+    def _write(cls, route: str, stacks: collections.Counter[str]) -> None:
+        directory: str = os.path.join(CONSTANTS.LOG_DIRECTORY, "profiles")
+        file_name: str = re.sub(r"[^A-Za-z0-9_]+", "_", route).strip("_") or "root"
+        path: str = os.path.join(directory, f"{file_name}.folded")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > CONSTANTS.PROFILE_MAX_FILE_SIZE:
+                os.replace(path, f"{path}.1")
+            with open(path, "a", encoding="utf-8") as file:
+                file.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+        except OSError as err:
+            logging.warning("Cannot write profile of %s: %s", route, err)
@@ -56,6 +56,11 @@ class Responses:
             200,
         )
 
+    @staticmethod
+    def assets(assets: list[dict[str, str]]) -> Response:
+        """200: list of tracked assets."""
+        return make_response({"assets": assets}, 200)
+
     @staticmethod
     def chart(filtered_list: list[dict]) -> Response:
         """200: success on chart endpoint."""
@@ -71,9 +76,14 @@ class Responses:
 
     @staticmethod
     def price(price: float) -> Response:
-        """200: successfully retrieved current BTC price."""
+        """200: successfully retrieved current price of an asset."""
         return make_response({"price": price}, 200)
 
+    @staticmethod
+    def profiler_settings(settings: dict[str, Union[bool, float, str]]) -> Response:
+        """200: current settings of the request profiler."""
+        return make_response(settings, 200)
+
     @staticmethod
     def auth_token(token: str) -> Response:
         """201: returning auth token to user on login or refresh."""
@@ -131,6 +141,30 @@ class Responses:
             400,
         )
 
+    @staticmethod
+    def chart_invalid_resolution_error() -> Response:
+        """400: unsupported resolution in chart endpoint."""
+        return make_response(
+            {"message": "Resolution must be one of 1m, 5m, 15m, 30m, 1h, 4h, 12h or 1d!"},
+            400,
+        )
+
+    @staticmethod
+    def chart_invalid_points_error() -> Response:
+        """400: invalid number of points in chart endpoint."""
+        return make_response(
+            {"message": "Points must be an integer of at least 3!"},
+            400,
+        )
+
+    @staticmethod
+    def chart_invalid_downsample_error() -> Response:
+        """400: unsupported downsampling method in chart endpoint."""
+        return make_response(
+            {"message": "Downsample must be one of lttb or minmax!"},
+            400,
+        )
+
     @staticmethod
     def unauthorized_error() -> Response:
         """401: generic problem with authorization or token."""
@@ -149,6 +183,22 @@ class Responses:
             {"WWW-Authenticate": 'Basic realm ="Wrong password"'},
         )
 
+    @staticmethod
+    def unknown_asset(asset: str) -> Response:
+        """404: requested asset is not tracked."""
+        return make_response(
+            {"message": f"Unknown asset {asset}"},
+            404,
+        )
+
+    @staticmethod
+    def internal_endpoint_disabled() -> Response:
+        """404: internal endpoint is disabled, no internal token is configured."""
+        return make_response(
+            {"message": "Not found"},
+            404,
+        )
+
     @staticmethod
     def not_enough_money_to_withdraw() -> Response:
         """409: user tried to withdraw more money than they have."""
@@ -191,6 +241,15 @@ class Responses:
             500,
         )
 
+    @staticmethod
+    def service_unavailable() -> Response:
+        """503: server is overloaded, the request can be retried later."""
+        return make_response(
+            {"message": "Server is busy, try again later"},
+            503,
+            {"Retry-After": "1"},
+        )
+
     @staticmethod
     def internal_database_error(_message: Message) -> Response:
         """500: database internal error."""
@@ -2,28 +2,38 @@ import json
 import logging
 from functools import wraps
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Optional
 
 from flask import Response, request
-from jsonschema import validate
-from jsonschema.exceptions import ValidationError
+from jsonschema.exceptions import ValidationError, best_match
+from jsonschema.protocols import Validator
+from jsonschema.validators import validator_for
 
 from . import PATHS, Responses
 
 
 class SchemaValidator:
-    """Class for validating JSON requests."""
+    """Class for validating JSON requests.
+
+    Schemas are checked against their metaschema and compiled into validator objects once, in
+    initialize(), so a request only pays for validating its JSON.
+    """
 
     schemas: dict = {}
+    validators: dict[str, Validator] = {}
+    _empty_validator: Validator = validator_for({})({})
 
     @classmethod
     def initialize(cls) -> None:
-        """Load schema files."""
+        """Load schema files and compile their validators."""
         logging.info("Loading schemas...")
         files = [p.stem for p in Path(PATHS.VALIDATION_SCHEMAS).iterdir() if p.is_file()]
         for schema in files:
             with open(f"{PATHS.VALIDATION_SCHEMAS}{schema}.json") as file:
                 cls.schemas[schema] = json.load(file)
+            validator_class: type[Validator] = validator_for(cls.schemas[schema])
+            validator_class.check_schema(cls.schemas[schema])
+            cls.validators[schema] = validator_class(cls.schemas[schema])
         logging.info("Schemas loaded.")
 
     @classmethod
@@ -31,6 +41,11 @@ class SchemaValidator:
         """Get schema by name."""
         return cls.schemas.get(schema, {})
 
+    @classmethod
+    def get_validator(cls, schema: str) -> Validator:
+        """Get compiled validator by schema name, unknown schemas accept any JSON."""
+        return cls.validators.get(schema, cls._empty_validator)
+
     @classmethod
     def validate(
         cls, schema_name: str
@@ -40,10 +55,11 @@ class SchemaValidator:
         def decorator(fun: Callable[..., Response]) -> Callable[..., Response]:
             @wraps(fun)
             def decorated(*args: tuple, **kwargs: dict) -> Response:
-                try:
-                    validate(request.get_json(), SchemaValidator.get_schema(schema_name))
-                except ValidationError as e:
-                    logging.error(f"{e=}")
+                error: Optional[ValidationError] = best_match(
+                    SchemaValidator.get_validator(schema_name).iter_errors(request.get_json())
+                )
+                if error is not None:
+                    logging.error("e=%r", error)
                     return Responses.invalid_json_format_error()
                 return fun(*args, **kwargs)
 
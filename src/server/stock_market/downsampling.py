@@ -0,0 +1,123 @@
+from typing import Optional
+
+import numpy as np
+
+
+class Downsampler:
+    """Choose at most a given number of points of a series to draw it without losing its shape.
+
+    Both methods keep the first and the last point and split the others into equal buckets by
+    position. They return sorted indices of chosen points and process all buckets at once with
+    NumPy reductions, instead of a Python loop over buckets:
+
+        indices: np.ndarray = Downsampler.lttb(values, 500)
+        indices: np.ndarray = Downsampler.min_max(values, 500)
+    """
+
+    @staticmethod
+    def lttb(y: np.ndarray, points: int, x: Optional[np.ndarray] = None) -> np.ndarray:
+        """Largest-Triangle-Three-Buckets: choose the most prominent point of every bucket.
+
+        The point chosen in a bucket spans the largest triangle with the point chosen in the
+        previous bucket and the average point of the next one. Instead of walking the buckets one
+        by one, all of them are evaluated at once against the average point of the previous bucket,
+        then buckets whose previous bucket chose a different point are evaluated again against
+        it, until no choice changes. The result is the same as that of sequential LTTB.
+
+        Args:
+            y (np.ndarray): Values of the series.
+            points (int): Maximum number of returned indices, at least 3.
+            x (Optional[np.ndarray]): Positions of the values, equally spaced if not given.
+
+        Returns:
+            np.ndarray: Sorted indices of chosen points.
+
+        """
+        size: int = len(y)
+        if size <= points:
+            return np.arange(size)
+
+        y = np.asarray(y, dtype=np.float64)
+        x = np.arange(size, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+        bucket, edges = Downsampler._buckets(size, points - 2)
+        starts: np.ndarray = edges[:-1] - 1  # first point of every bucket in inner points
+        counts: np.ndarray = np.diff(edges)
+        inner_x: np.ndarray = x[1:-1]
+        inner_y: np.ndarray = y[1:-1]
+
+        mean_x: np.ndarray = np.add.reduceat(inner_x, starts) / counts
+        mean_y: np.ndarray = np.add.reduceat(inner_y, starts) / counts
+        right_x: np.ndarray = np.concatenate((mean_x[1:], [x[-1]]))
+        right_y: np.ndarray = np.concatenate((mean_y[1:], [y[-1]]))
+        left_x: np.ndarray = np.concatenate(([x[0]], mean_x[:-1]))
+        left_y: np.ndarray = np.concatenate(([y[0]], mean_y[:-1]))
+
+        chosen: np.ndarray = np.full(points - 2, -1)
+        # Only buckets whose left point changed in the last pass are evaluated again.
+        pending: np.ndarray = np.arange(points - 2)
+        while len(pending):
+            # inner points of pending buckets: bucket of every point and its index in inner points
+            lengths: np.ndarray = counts[pending]
+            offsets: np.ndarray = np.cumsum(lengths) - lengths
+            group: np.ndarray = np.repeat(np.arange(len(pending)), lengths)
+            members: np.ndarray = pending[group]
+            indices: np.ndarray = (starts[pending] - offsets)[group] + np.arange(len(group))
+
+            anchor_x, anchor_y = left_x[members], left_y[members]
+            # doubled area of the triangle (left, point, right)
+            area: np.ndarray = np.abs(
+                (anchor_x - right_x[members]) * (inner_y[indices] - anchor_y)
+                - (anchor_x - inner_x[indices]) * (right_y[members] - anchor_y)
+            )
+            area = np.nan_to_num(area, nan=-1.0)
+            largest: np.ndarray = np.maximum.reduceat(area, offsets)[group] == area
+            best: np.ndarray = np.minimum.reduceat(np.where(largest, indices, size), offsets)
+
+            moved: np.ndarray = pending[best != chosen[pending]]
+            chosen[pending] = best
+            moved = moved[moved < points - 3]
+            left_x[moved + 1], left_y[moved + 1] = inner_x[chosen[moved]], inner_y[chosen[moved]]
+            pending = moved + 1
+
+        return np.concatenate(([0], chosen + 1, [size - 1]))
+
+    @staticmethod
+    def min_max(y: np.ndarray, points: int) -> np.ndarray:
+        """Choose the lowest and the highest point of every bucket, so no peak is flattened.
+
+        Args:
+            y (np.ndarray): Values of the series.
+            points (int): Maximum number of returned indices, at least 2.
+
+        Returns:
+            np.ndarray: Sorted indices of chosen points.
+
+        """
+        size: int = len(y)
+        if size <= points:
+            return np.arange(size)
+
+        y = np.asarray(y, dtype=np.float64)
+        buckets: int = (points - 2) // 2
+        if buckets == 0:
+            return np.array([0, size - 1])
+
+        bucket, edges = Downsampler._buckets(size, buckets)
+        # sorted by bucket, then by value: a bucket starts with its lowest and ends with its highest
+        order: np.ndarray = np.lexsort((y[1:-1], bucket))
+        lowest: np.ndarray = order[edges[:-1] - 1]
+        highest: np.ndarray = order[edges[1:] - 2]
+        return np.concatenate(([0], np.unique(np.concatenate((lowest, highest))) + 1, [size - 1]))
+
+    @staticmethod
+    def _buckets(size: int, buckets: int) -> tuple[np.ndarray, np.ndarray]:
+        """Split points between the first and the last one into buckets of (almost) equal size.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Bucket of every inner point and indices of the first
+                point of every bucket, followed by the index of the last point of the series.
+
+        """
+        edges: np.ndarray = np.linspace(1, size - 1, buckets + 1).astype(np.int64)
+        bucket: np.ndarray = np.repeat(np.arange(buckets), np.diff(edges))
+        return bucket, edges
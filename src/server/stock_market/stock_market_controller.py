@@ -1,6 +1,8 @@
+from typing import Optional
+
 from flask import Blueprint, Response, request
 
-from .. import Responses
+from .. import CONSTANTS, Responses
 from . import StockMarketService
 
 
@@ -9,25 +11,55 @@ class StockMarketController:
 
     blueprint = Blueprint("stock", __name__, url_prefix="/stock")
 
+    @staticmethod
+    @blueprint.route("/assets", methods=["GET"])
+    def assets() -> Response:
+        """Tracked assets retrieval endpoint."""
+        return StockMarketService.assets()
+
     @staticmethod
     @blueprint.route("/chart")
     def chart() -> Response:
         """Chart data retrieval endpoint."""
         args = request.args
+        asset: str = args.get("asset", CONSTANTS.DEFAULT_ASSET).upper()
         from_param: str = args.get("from", "")
         to_param: str = args.get("to", "")
         aggregate_param: int = int(args.get("aggregate", 1))
+        resolution_param: str = args.get("resolution", "1d")
+        points_param: Optional[int] = args.get("points", None, type=int)
+        method_param: str = args.get("downsample", "lttb")
 
         if from_param == "" or to_param == "":
             return Responses.chart_missing_parameters_error()
 
-        return StockMarketService.chart(from_param, to_param, aggregate_param)
+        if "points" in args and (points_param is None or points_param < 3):
+            return Responses.chart_invalid_points_error()
+        if method_param not in StockMarketService.DOWNSAMPLING_METHODS:
+            return Responses.chart_invalid_downsample_error()
+        points_param = min(points_param or CONSTANTS.CHART_MAX_POINTS, CONSTANTS.CHART_MAX_POINTS)
+
+        if resolution_param in StockMarketService.INTRADAY_RESOLUTIONS:
+            return StockMarketService.intraday_chart(
+                asset,
+                from_param,
+                to_param,
+                StockMarketService.INTRADAY_RESOLUTIONS[resolution_param],
+                points_param,
+                method_param,
+            )
+        if resolution_param != "1d":
+            return Responses.chart_invalid_resolution_error()
+
+        return StockMarketService.chart(
+            asset, from_param, to_param, aggregate_param, points_param, method_param
+        )
 
     @staticmethod
     @blueprint.route("/price", methods=["GET"])
     def price() -> Response:
-        """BTC price retrieval endpoint."""
-        return StockMarketService.price()
+        """Asset price retrieval endpoint."""
+        return StockMarketService.price(request.args.get("asset", CONSTANTS.DEFAULT_ASSET).upper())
 
     @staticmethod
     @blueprint.route("/future_value")
@@ -1,22 +1,66 @@
 import logging
-from typing import Optional
+from datetime import date, datetime, time, timezone
+from typing import Any, Optional
 
 from flask import Response
 
 from .. import QUERIES, Responses
-from ..database import DatabaseProvider
+from ..database import DatabaseHandler, DatabaseProvider
 
 
 class StockMarketService:
-    """Stock Market Service class."""
+    """Stock Market Service class.
+
+    Every query filters exchange_rate_history by asset and, for charts, by a date range, so
+    Postgres reads only the index of one asset in the yearly partitions covering the range.
+    Intraday charts are downsampled in the database from one-minute bars to the requested
+    resolution, so the response has one point per bucket whatever the number of bars.
+
+    Charts with more rows than the requested number of points (CONSTANTS.CHART_MAX_POINTS at
+    most and by default) are downsampled by Downsampler (NumPy) before the response is built, so
+    its size is bounded whatever the range.
+    """
+
+    DOWNSAMPLING_METHODS: tuple[str, ...] = ("lttb", "minmax")
+
+    # chart resolution -> length of its buckets in seconds
+    INTRADAY_RESOLUTIONS: dict[str, int] = {
+        "1m": 60,
+        "5m": 5 * 60,
+        "15m": 15 * 60,
+        "30m": 30 * 60,
+        "1h": 60 * 60,
+        "4h": 4 * 60 * 60,
+        "12h": 12 * 60 * 60,
+    }
+
+    @staticmethod
+    def assets() -> Response:
+        """Tracked assets endpoint handler."""
+        with DatabaseProvider.handler() as handler:
+            handler().execute(QUERIES.SELECT_ASSETS)
+            data: list[tuple[str, str, str]] = handler().fetchall()
+
+        if not handler.success:
+            return Responses.internal_database_error(handler.message)
+
+        return Responses.assets([{"symbol": symbol, "name": name} for symbol, name, _ in data])
 
     @staticmethod
-    def chart(from_param: str, to_param: str, aggregate_param: int) -> Response:
+    def chart(
+        asset: str,
+        from_param: str,
+        to_param: str,
+        aggregate_param: int,
+        points: Optional[int] = None,
+        method: str = "lttb",
+    ) -> Response:
         """Chart data retrieval endpoint handler."""
+        asset_exists: bool = True
         with DatabaseProvider.handler() as handler:
             if aggregate_param == 1:
-                handler().execute(QUERIES.SELECT_CHART, [from_param, to_param])
-                data = handler().fetchall()
+                handler().execute(QUERIES.SELECT_CHART, [asset, from_param, to_param])
+                data = StockMarketService._downsample(handler().fetchall(), 0, 1, points, method)
                 filtered_list = [
                     {"date": date.strftime("%Y-%m-%d"), "avg": avg} for date, avg in data
                 ]
@@ -27,11 +71,12 @@ class StockMarketService:
                     (
                         from_param,
                         aggregate_param,
+                        asset,
                         from_param,
                         to_param,
                     ),
                 )
-                data = handler().fetchall()
+                data = StockMarketService._downsample(handler().fetchall(), 1, 2, points, method)
                 filtered_list = [
                     {
                         "date": date.strftime("%Y-%m-%d"),
@@ -42,26 +87,141 @@ class StockMarketService:
                     for period, date, avg, low, high in data
                 ]
 
+            if not data:
+                asset_exists = StockMarketService._asset_exists(handler, asset)
+
         if not handler.success:
             return Responses.internal_database_error(handler.message)
 
+        if not asset_exists:
+            return Responses.unknown_asset(asset)
+
         return Responses.chart(filtered_list)
 
     @staticmethod
-    def price() -> Response:
-        """BTC price endpoint service."""
+    def intraday_chart(
+        asset: str,
+        from_param: str,
+        to_param: str,
+        resolution: int,
+        points: Optional[int] = None,
+        method: str = "lttb",
+    ) -> Response:
+        """Intraday chart data retrieval endpoint handler, resolution is given in seconds."""
+        asset_exists: bool = True
         with DatabaseProvider.handler() as handler:
-            handler().execute(QUERIES.SELECT_LATEST_STOCK_PRICE)
+            handler().execute(
+                QUERIES.SELECT_CHART_INTRADAY,
+                (
+                    resolution,
+                    resolution,
+                    asset,
+                    from_param,
+                    to_param,
+                    StockMarketService._intraday_range_end(to_param),
+                ),
+            )
+            data = StockMarketService._downsample(handler().fetchall(), 0, 1, points, method)
+            filtered_list = [
+                {
+                    # timestamptz is returned in the TimeZone of the connection
+                    "date": bucket.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "avg": round(avg, 2),
+                    "low": round(low, 2),
+                    "high": round(high, 2),
+                }
+                for bucket, avg, low, high in data
+            ]
+
+            if not data:
+                asset_exists = StockMarketService._asset_exists(handler, asset)
+
+        if not handler.success:
+            return Responses.internal_database_error(handler.message)
+
+        if not asset_exists:
+            return Responses.unknown_asset(asset)
+
+        return Responses.chart(filtered_list)
+
+    @staticmethod
+    def _intraday_range_end(to_param: str) -> str:
+        """Return interval added to `to` to get the exclusive end of an intraday chart.
+
+        A date includes all bars of that day, a timestamp includes the bar starting at it.
+        """
+        try:
+            date.fromisoformat(to_param)
+        except ValueError:
+            return "1 microsecond"
+        return "1 day"
+
+    @staticmethod
+    def price(asset: str) -> Response:
+        """Asset price endpoint service."""
+        asset_exists: bool = True
+        with DatabaseProvider.handler() as handler:
+            handler().execute(QUERIES.SELECT_LATEST_STOCK_PRICE, (asset, asset))
             price: Optional[tuple[str]] = handler().fetchone()
+            if price is None:
+                asset_exists = StockMarketService._asset_exists(handler, asset)
+
+        if handler.success and not asset_exists:
+            return Responses.unknown_asset(asset)
 
         if not handler.success or price is None:
-            logging.error(f"Cannot retrieve current BTC price from database: {price=}")
+            logging.error("Cannot retrieve current %s price from database: price=%r", asset, price)
             return Responses.internal_database_error(handler.message)
 
         try:
             price_float: float = round(float(price[0]), 2)
         except Exception:
-            logging.error(f"Cannot convert price '{price[0]}' to float")
+            logging.error("Cannot convert price '%s' to float", price[0])
             return Responses.internal_database_error(handler.message)
         else:
             return Responses.price(price_float)
+
+    @staticmethod
+    def _downsample(
+        data: list[tuple[Any, ...]],
+        date_column: int,
+        column: int,
+        points: Optional[int],
+        method: str,
+    ) -> list[tuple[Any, ...]]:
+        """Return at most `points` rows of a chart, chosen by their values in the given column.
+
+        LTTB places the values at the epoch time of their dates, so gaps in the data (days
+        without a price) are not closed up as if the points were equally spaced.
+        """
+        if points is None or len(data) <= points:
+            return data
+
+        # NumPy is imported only by processes which downsample charts.
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        from .downsampling import Downsampler
+
+        values: np.ndarray = np.array([row[column] for row in data], dtype=np.float64)
+        if method == "minmax":
+            indices: np.ndarray = Downsampler.min_max(values, points)
+        else:
+            x: np.ndarray = np.array(
+                [StockMarketService._epoch(row[date_column]) for row in data], dtype=np.float64
+            )
+            indices = Downsampler.lttb(values, points, x)
+        return [data[index] for index in indices.tolist()]
+
+    @staticmethod
+    def _epoch(value: date) -> float:
+        """Return seconds since the epoch of a datetime, or of the UTC midnight of a date."""
+        if isinstance(value, datetime):
+            return value.timestamp()
+        return datetime.combine(value, time(), timezone.utc).timestamp()
+
+    @staticmethod
+    def _asset_exists(handler: DatabaseHandler, asset: str) -> bool:
+        """Check if the asset is tracked, used only when no price of the asset was found."""
+        handler().execute(QUERIES.SELECT_ASSET, (asset,))
+        return handler().fetchone() is not None
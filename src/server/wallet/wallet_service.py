@@ -26,7 +26,7 @@ class WalletService:
             handler().execute(QUERIES.SELECT_USER_DATA_BY_UUID, (uuid,))
             user_data: list[tuple[str, str, str]] = handler().fetchall()
         if not handler.success:
-            logging.error(f"{handler.message}")
+            logging.error("%s", handler.message)
             return Responses.internal_database_error(handler.message)
 
         if user_data:
@@ -52,7 +52,7 @@ class WalletService:
         with DatabaseProvider.handler() as handler:
             handler().execute(QUERIES.WALLET_DEPOSIT, (amount, uuid))
         if not handler.success:
-            logging.error(f"{handler.message}")
+            logging.error("%s", handler.message)
             return Responses.internal_database_error(handler.message)
 
         return Responses.successfully_deposited()
@@ -82,7 +82,7 @@ class WalletService:
             else:
                 handler().execute(QUERIES.WALLET_WITHDRAW, (amount, uuid))
         if not handler.success:
-            logging.error(f"{handler.message}")
+            logging.error("%s", handler.message)
             return Responses.internal_database_error(handler.message)
 
         return Responses.successfully_withdrawn()
@@ -105,7 +105,7 @@ class WalletService:
             handler().execute(QUERIES.SELECT_USER_DATA_BY_UUID, (uuid,))
             user_data: tuple[str, str, str] = handler().fetchone()
             if user_data:
-                handler().execute(QUERIES.SELECT_LATEST_STOCK_PRICE)
+                handler().execute(QUERIES.SELECT_LATEST_STOCK_PRICE, (CONSTANTS.DEFAULT_ASSET,) * 2)
                 price: tuple[str] = handler().fetchone()
                 if price:
                     total_price = float(price[0]) * amount
@@ -119,7 +119,7 @@ class WalletService:
             else:
                 return Responses.internal_server_error()
         if not handler.success:
-            logging.error(f"{handler.message}")
+            logging.error("%s", handler.message)
             return Responses.internal_database_error(handler.message)
 
         return Responses.successfully_bought()
@@ -144,7 +144,9 @@ class WalletService:
             if user_data:
                 # Check if user has enough BTC to perform transaction
                 if float(user_data[2]) >= amount:
-                    handler().execute(QUERIES.SELECT_LATEST_STOCK_PRICE)
+                    handler().execute(
+                        QUERIES.SELECT_LATEST_STOCK_PRICE, (CONSTANTS.DEFAULT_ASSET,) * 2
+                    )
                     price: tuple[str] = handler().fetchone()
                     if price:
                         total_price = float(price[0]) * amount
@@ -156,7 +158,7 @@ class WalletService:
             else:
                 return Responses.internal_server_error()
         if not handler.success:
-            logging.error(f"{handler.message}")
+            logging.error("%s", handler.message)
             return Responses.internal_database_error(handler.message)
 
         return Responses.successfully_sold()
@@ -176,7 +178,7 @@ class WalletService:
             handler().execute(QUERIES.WALLET_TRANSACTION_HISTORY, (uuid,))
             transaction_history: list[tuple[str, str, str, str, str, str]] = handler().fetchall()
         if not handler.success:
-            logging.error(f"{handler.message}")
+            logging.error("%s", handler.message)
             return Responses.internal_database_error(handler.message)
 
         transactions: list[dict[str, Union[str, float]]] = []
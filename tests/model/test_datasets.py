@@ -0,0 +1,185 @@
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.model.datasets import DatasetCache, DatasetParser, MlBatch, MlData
+
+TWEETS_HEADER: str = ',"id","datetime","query","author","author","content"\n'
+TWEETS: list[str] = [
+    '"0","1","Mon Apr 06 22:19:45 PDT 2009","NO_QUERY","a","a","bitcoin, to the moon"\n',
+    '"1","2","Tue Apr 07 09:05:00 PDT 2009","NO_QUERY","b","b","""quoted""\nover two lines"\n',
+    '"2","3","Wed Apr 08 23:59:59 PDT 2009","NO_QUERY","c","c"\n',  # short row, no content
+]
+
+
+class Test_Datasets:
+    @pytest.fixture(name="tweets_path")
+    def fixture_tweets_path(self, tmp_path: Path) -> str:
+        path: str = str(tmp_path / "tweets.csv")
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            file.write(TWEETS_HEADER + "".join(TWEETS))
+        return path
+
+    class Test_DatasetParser:
+        @pytest.fixture(autouse=True)
+        def prepare_tests(self, tweets_path: str) -> None:
+            self.path: str = tweets_path
+            self.parser: DatasetParser = DatasetParser(tweets_path)
+
+        def test_short_row_has_empty_content(self) -> None:
+            rows: list[MlData] = list(self.parser.read())
+
+            assert rows[-1] == MlData(year=2009, month=4, day=8, hour=23, minute=59, content="")
+
+        def test_read_batches_matches_read(self) -> None:
+            batch: MlBatch = MlBatch.concatenate(list(self.parser.read_batches(batch_size=2)))
+
+            assert list(batch.rows()) == list(self.parser.read())
+
+        def test_read_new_matches_read(self) -> None:
+            assert list(self.parser.read_new()) == list(self.parser.read())
+
+        def test_read_chunks_matches_read(self) -> None:
+            chunks: list[list[MlData]] = list(self.parser.read_chunks(chunk_size=40, workers=2))
+
+            assert len(chunks) > 1
+            assert [row for chunk in chunks for row in chunk] == list(self.parser.read())
+
+        @pytest.mark.parametrize(
+            "timestamp",
+            [
+                "Mon Apr 06 22:19:45 PDT 2009",
+                "Sun Dec 31 23:59:59 UTC 2017",
+                "Thu Feb 29 00:00:00 CEST 2024",
+                "Tue Jan 01 07:05:00 GMT 2019",
+            ],
+        )
+        def test_tweet_timestamp_matches_strptime(self, timestamp: str) -> None:
+            expected: datetime = datetime.strptime(
+                timestamp[:20] + timestamp[-4:], "%a %b %d %X %Y"
+            )
+
+            actual = DatasetParser._parse_tweet_timestamp(timestamp)
+
+            assert actual == (
+                expected.year,
+                expected.month,
+                expected.day,
+                expected.hour,
+                expected.minute,
+            )
+
+        @pytest.mark.parametrize(
+            "timestamp", ["Mon Apr 06 24:19:45 PDT 2009", "Fri Feb 30 10:00:00 PDT 2009"]
+        )
+        def test_invalid_tweet_timestamp_raises(self, timestamp: str) -> None:
+            with pytest.raises(ValueError):
+                DatasetParser._parse_tweet_timestamp(timestamp)
+
+    class Test_ReadNew:
+        @pytest.fixture(autouse=True)
+        def prepare_tests(self, tweets_path: str) -> None:
+            self.path: str = tweets_path
+            self.parser: DatasetParser = DatasetParser(tweets_path)
+            self.new_row: str = (
+                '"3","4","Thu Apr 09 12:00:00 PDT 2009","NO_QUERY","d","d","gains"\n'
+            )
+
+        def append(self, text: str) -> None:
+            with open(self.path, "a", encoding="utf-8", newline="") as file:
+                file.write(text)
+
+        def test_yields_only_appended_rows(self) -> None:
+            list(self.parser.read_new())
+            self.append(self.new_row)
+
+            rows: list[MlData] = list(self.parser.read_new())
+
+            assert rows == [MlData(year=2009, month=4, day=9, hour=12, minute=0, content="gains")]
+            assert not list(self.parser.read_new())
+
+        def test_leaves_partial_row_for_next_call(self) -> None:
+            list(self.parser.read_new())
+            self.append(self.new_row[:30])
+
+            assert not list(self.parser.read_new())
+            self.append(self.new_row[30:])
+            assert [row.content for row in self.parser.read_new()] == ["gains"]
+
+        def test_leaves_row_with_open_quoted_newline_for_next_call(self) -> None:
+            list(self.parser.read_new())
+            self.append(self.new_row[:-8] + '"two\n')
+
+            assert not list(self.parser.read_new())
+            self.append('lines"\n')
+            assert [row.content for row in self.parser.read_new()] == ["two\nlines"]
+
+        def test_abandoned_generator_rows_are_read_again(self) -> None:
+            next(self.parser.read_new())
+
+            assert len(list(self.parser.read_new())) == len(TWEETS)
+
+        def test_reads_from_start_after_truncation(self) -> None:
+            list(self.parser.read_new())
+            with open(self.path, "w", encoding="utf-8", newline="") as file:
+                file.write(TWEETS_HEADER + TWEETS[0])
+
+            assert [row.content for row in self.parser.read_new()] == ["bitcoin, to the moon"]
+
+        def test_follow_stops_when_stop_is_set(self) -> None:
+            stop = threading.Event()
+            rows: list[MlData] = []
+
+            for row in self.parser.follow(poll_interval=0.01, stop=stop):
+                rows.append(row)
+                if len(rows) == len(TWEETS):
+                    stop.set()
+
+            assert rows == list(self.parser.read())
+
+    class Test_DatasetCache:
+        @pytest.fixture(autouse=True)
+        def prepare_tests(self, tweets_path: str, tmp_path: Path) -> None:
+            self.path: str = tweets_path
+            self.cache: DatasetCache = DatasetCache(str(tmp_path / "cache"))
+
+        def append_row(self, path: str) -> None:
+            with open(path, "a", encoding="utf-8", newline="") as file:
+                file.write('"3","4","Thu Apr 09 12:00:00 PDT 2009","NO_QUERY","d","d","gains"\n')
+
+        def test_cached_dataset_equals_parsed_one(self) -> None:
+            expected: list[MlData] = list(DatasetParser(self.path).read())
+
+            DatasetParser(self.path, cache=self.cache).read_all()
+            batch: MlBatch = DatasetParser(self.path, cache=self.cache).read_all()
+
+            assert isinstance(batch.year, np.memmap)
+            assert list(batch.rows()) == expected
+
+        def test_modified_file_is_parsed_again(self) -> None:
+            DatasetParser(self.path, cache=self.cache).read_all()
+            old_key: str = self.cache.key(self.path)
+
+            self.append_row(self.path)
+            batch: MlBatch = DatasetParser(self.path, cache=self.cache).read_all()
+
+            assert self.cache.key(self.path) != old_key
+            assert not os.path.exists(os.path.join(self.cache.directory, old_key))
+            assert list(batch.rows()) == list(DatasetParser(self.path).read())
+
+        def test_entry_shared_by_a_copy_is_kept(self) -> None:
+            copy_path: str = self.path + ".copy"
+            shutil.copyfile(self.path, copy_path)
+            DatasetParser(self.path, cache=self.cache).read_all()
+            key: str = self.cache.key(copy_path)
+
+            self.append_row(self.path)
+            self.cache.key(self.path)
+
+            assert key == self.cache.key(copy_path)
+            assert self.cache.load_batch(key) is not None
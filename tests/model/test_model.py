@@ -0,0 +1,374 @@
+import struct
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Generator
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import DataLoader
+
+from src.model import (
+    Backtester,
+    BacktestResult,
+    DailyTextFeatures,
+    ForecastScenario,
+    StockPredictorConfig,
+    StockPredictorManager,
+    TextFeaturePipeline,
+)
+from src.model.datasets import MlBatch, StringColumn
+from src.model.rate_history_loader import RateHistoryLoader
+from src.server import QUERIES
+from src.server.database import DatabaseHandler, DatabaseProvider, Message
+
+
+def synthetic_history(days: int, input_dim: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """Return ascending daily dates and (days, input_dim) float32 values of a noisy sine."""
+    dates: np.ndarray = np.datetime64("2020-01-01") + np.arange(days).astype("timedelta64[D]")
+    steps: np.ndarray = np.arange(days, dtype=np.float32)
+    prices: np.ndarray = 100 + 10 * np.sin(steps / 7) + np.random.default_rng(0).random(days)
+    values: np.ndarray = np.tile(prices.astype(np.float32).reshape(-1, 1), (1, input_dim))
+    return dates, values
+
+
+def binary_copy(dates: np.ndarray, values: np.ndarray) -> bytes:
+    """Return (date, real) rows in binary COPY format, as sent by Postgres."""
+    days: np.ndarray = (dates - np.datetime64("2000-01-01", "D")).astype(int)
+    header: bytes = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 4) + b"\x00" * 4
+    records: bytes = b"".join(
+        struct.pack(">hiiif", 2, 4, int(day), 4, float(value)) for day, value in zip(days, values)
+    )
+    return header + records + struct.pack(">h", -1)
+
+
+class Test_Model:
+    @pytest.fixture(name="config")
+    def fixture_config(self) -> StockPredictorConfig:
+        return StockPredictorConfig(
+            hidden_dim=8,
+            num_layers=1,
+            seq_length=8,
+            batch_size=16,
+            max_epochs=2,
+            fine_tune_max_epochs=50,
+            replay_size=64,
+        )
+
+    @pytest.fixture(name="manager")
+    def fixture_manager(
+        self, config: StockPredictorConfig, monkeypatch: pytest.MonkeyPatch
+    ) -> StockPredictorManager:
+        torch.manual_seed(0)
+        manager = StockPredictorManager(config)
+        history: tuple[np.ndarray, np.ndarray] = synthetic_history(200)
+        monkeypatch.setattr(manager, "_get_data", lambda: history)
+        return manager
+
+    class Test_FineTune:
+        @pytest.fixture(autouse=True)
+        def prepare_tests(
+            self, manager: StockPredictorManager, monkeypatch: pytest.MonkeyPatch
+        ) -> None:
+            self.manager: StockPredictorManager = manager
+            self.manager.train_model()
+            dates, values = self.manager._get_data()
+            self.new_days: int = 10
+            self.manager.last_trained_date = dates[-self.new_days - 1]
+
+            self.loaders: list[tuple[DataLoader, DataLoader]] = []
+            fit = self.manager._fit
+
+            def recording_fit(train_loader: DataLoader, val_loader: DataLoader, *args: Any) -> None:
+                self.loaders.append((train_loader, val_loader))
+                fit(train_loader, val_loader, *args)
+
+            monkeypatch.setattr(self.manager, "_fit", recording_fit)
+
+        @staticmethod
+        def windows(loader: DataLoader) -> set[bytes]:
+            inputs, _ = loader.dataset.tensors  # type: ignore
+            return {window.numpy().tobytes() for window in inputs}
+
+        def test_validation_windows_are_not_trained_on(self) -> None:
+            assert self.manager.fine_tune_model()
+
+            train_loader, val_loader = self.loaders[0]
+            train: set[bytes] = self.windows(train_loader)
+            validation: set[bytes] = self.windows(val_loader)
+            assert validation
+            assert not train & validation
+
+        def test_validates_on_newest_window(self) -> None:
+            self.manager.fine_tune_model()
+
+            _, values = self.manager._get_data()
+            newest: np.ndarray = self.manager.scaler.transform(values)[-9:-1].astype(np.float32)
+            train_loader, val_loader = self.loaders[0]
+            assert newest.tobytes() in self.windows(val_loader)
+            assert newest.tobytes() not in self.windows(train_loader)
+
+        def test_stops_early_without_improvement(self) -> None:
+            self.manager.config = StockPredictorConfig(
+                **{**vars(self.manager.config), "patience": 2, "min_delta": 1.0}
+            )
+
+            assert self.manager.fine_tune_model()
+
+            assert self.manager.training_stats.epochs == 3
+            assert self.manager.config.fine_tune_max_epochs > 3
+
+        def test_returns_false_without_new_data(self) -> None:
+            dates, _ = self.manager._get_data()
+            self.manager.last_trained_date = dates[-1]
+
+            assert not self.manager.fine_tune_model()
+            assert not self.loaders
+
+    class Test_SaveLoad:
+        @pytest.fixture(autouse=True)
+        def prepare_tests(self, manager: StockPredictorManager, tmp_path: Path) -> None:
+            self.manager: StockPredictorManager = manager
+            self.manager.train_model()
+            self.path: str = str(tmp_path / "model.pt")
+
+        def test_restores_weights_scaler_and_training_date(
+            self, config: StockPredictorConfig
+        ) -> None:
+            self.manager.save_model(self.path)
+
+            loaded = StockPredictorManager(config)
+            loaded.load_model(self.path)
+
+            assert loaded.last_trained_date == self.manager.last_trained_date
+            np.testing.assert_array_equal(loaded.scaler.data_min_, self.manager.scaler.data_min_)
+            np.testing.assert_array_equal(loaded.scaler.data_max_, self.manager.scaler.data_max_)
+            for name, weights in self.manager.stock_predictor.state_dict().items():
+                assert torch.equal(loaded.stock_predictor.state_dict()[name], weights)
+
+        def test_loaded_model_fine_tunes_only_new_prices(
+            self, config: StockPredictorConfig, monkeypatch: pytest.MonkeyPatch
+        ) -> None:
+            self.manager.save_model(self.path)
+            loaded = StockPredictorManager(config)
+            loaded.load_model(self.path)
+            monkeypatch.setattr(loaded, "_get_data", self.manager._get_data)
+
+            assert not loaded.fine_tune_model()
+
+    class Test_InferenceModel:
+        @pytest.fixture(autouse=True)
+        def prepare_tests(self, manager: StockPredictorManager) -> None:
+            self.manager: StockPredictorManager = manager
+            self.manager.train_model()
+            self.windows: torch.Tensor = torch.rand(
+                16, 8, 1, generator=torch.Generator().manual_seed(1)
+            )
+
+        def test_exported_model_matches_eager_model(self) -> None:
+            exported: torch.nn.Module = self.manager.export_inference_model(quantize=False)
+
+            assert exported is not self.manager.stock_predictor
+            with torch.no_grad():
+                torch.testing.assert_close(
+                    exported(self.windows), self.manager.stock_predictor(self.windows)
+                )
+
+        def test_falls_back_to_eager_model_above_tolerance(self) -> None:
+            self.manager.config = StockPredictorConfig(
+                **{**vars(self.manager.config), "inference_tolerance": -1.0}
+            )
+
+            assert self.manager.export_inference_model() is self.manager.stock_predictor
+
+        def test_export_is_reused_until_retraining(self) -> None:
+            exported: torch.nn.Module = self.manager._get_inference_model()
+
+            assert self.manager._get_inference_model() is exported
+            self.manager.train_model()
+            assert self.manager._get_inference_model() is not exported
+
+    class Test_PredictBatch:
+        @pytest.fixture(autouse=True)
+        def prepare_tests(
+            self, manager: StockPredictorManager, monkeypatch: pytest.MonkeyPatch
+        ) -> None:
+            self.manager: StockPredictorManager = manager
+            self.manager.train_model()
+            self.dates, self.values = self.manager._get_data()
+            newest: tuple[np.ndarray, np.ndarray] = (self.dates[:-9:-1], self.values[:-9:-1])
+            monkeypatch.setattr(self.manager, "_get_newest_dates", lambda: newest)
+
+        def test_matches_predict_values(self) -> None:
+            expected = self.manager.predict_values(days=7)
+
+            forecast: np.ndarray = self.manager.predict_batch([ForecastScenario(horizon=7)])
+
+            np.testing.assert_array_equal(forecast["date"], expected.index.values)
+            np.testing.assert_allclose(forecast["value"], expected["value"], rtol=1e-6)
+
+        def test_batched_scenarios_match_single_ones(self) -> None:
+            scenarios: list[ForecastScenario] = [
+                ForecastScenario(horizon=3),
+                ForecastScenario(horizon=5, as_of=self.dates[100]),
+                ForecastScenario(horizon=1, as_of=self.dates[20]),
+            ]
+
+            forecast: np.ndarray = self.manager.predict_batch(scenarios)
+
+            assert forecast["scenario"].tolist() == [0] * 3 + [1] * 5 + [2]
+            for index, scenario in enumerate(scenarios):
+                single: np.ndarray = self.manager.predict_batch([scenario])
+                rows: np.ndarray = forecast[forecast["scenario"] == index]
+                np.testing.assert_array_equal(rows["date"], single["date"])
+                np.testing.assert_allclose(rows["value"], single["value"], rtol=1e-5)
+
+        def test_forecast_starts_after_as_of(self) -> None:
+            forecast: np.ndarray = self.manager.predict_batch(
+                [ForecastScenario(horizon=2, as_of=self.dates[50])]
+            )
+
+            assert forecast["date"].tolist() == [self.dates[51], self.dates[52]]
+
+        def test_raises_without_full_window_before_as_of(self) -> None:
+            with pytest.raises(ValueError, match="Not enough history"):
+                self.manager.predict_batch([ForecastScenario(as_of=self.dates[3])])
+
+    class Test_Backtester:
+        @pytest.fixture(autouse=True)
+        def prepare_tests(self, manager: StockPredictorManager) -> None:
+            self.manager: StockPredictorManager = manager
+            self.manager.train_model()
+
+        def test_evaluates_every_as_of_position(self) -> None:
+            history: tuple[np.ndarray, np.ndarray] = synthetic_history(40)
+
+            results: list[BacktestResult] = Backtester(self.manager, workers=1).run(
+                horizons=(1, 3), history=history
+            )
+
+            # as-of positions from the end of the first window to the last one with known values
+            assert [result.horizon for result in results] == [1, 3]
+            assert [result.windows for result in results] == [40 - 8 - 3 + 1] * 2
+            assert all(np.isfinite(result.mae) for result in results)
+            assert all(0 <= result.directional_accuracy <= 1 for result in results)
+
+        def test_raises_on_too_short_history(self) -> None:
+            history: tuple[np.ndarray, np.ndarray] = synthetic_history(10)
+
+            with pytest.raises(ValueError, match="too short"):
+                Backtester(self.manager, workers=1).run(horizons=(1, 3), history=history)
+
+    class Test_RateHistoryLoader:
+        @pytest.fixture(autouse=True)
+        def prepare_tests(self, monkeypatch: pytest.MonkeyPatch) -> None:
+            self.dates, values = synthetic_history(50)
+            self.values: np.ndarray = values[:, 0]
+            data: bytes = binary_copy(self.dates, self.values)
+            # Postgres sends the stream in pieces which do not follow row boundaries.
+            self.pieces: list[bytes] = [data[start : start + 7] for start in range(0, len(data), 7)]
+
+            self.cursor: Mock = Mock()
+            self.cursor.copy.side_effect = lambda query, params: nullcontext(self.pieces)
+            self.cursor.fetchone.return_value = (len(self.dates),)
+
+            @contextmanager
+            def mocked_handler() -> Generator[DatabaseHandler, None, None]:
+                yield DatabaseHandler(self.cursor, Message.OK)
+
+            monkeypatch.setattr(DatabaseProvider, "handler", mocked_handler)
+
+        def test_load_decodes_dates_and_values(self) -> None:
+            dates, values = RateHistoryLoader.load(QUERIES.COPY_RATE_HISTORY, ["BTC"])
+
+            assert dates.dtype == np.dtype("datetime64[D]") and values.dtype == np.float32
+            np.testing.assert_array_equal(dates, self.dates)
+            np.testing.assert_array_equal(values, self.values)
+
+        def test_chunks_match_whole_result(self) -> None:
+            chunks = list(RateHistoryLoader.iter_chunks(QUERIES.COPY_RATE_HISTORY, ["BTC"], 8))
+
+            assert max(len(dates) for dates, _ in chunks) == 8
+            np.testing.assert_array_equal(np.concatenate([d for d, _ in chunks]), self.dates)
+            np.testing.assert_array_equal(np.concatenate([v for _, v in chunks]), self.values)
+
+        def test_load_grows_arrays_when_rows_were_added_after_counting(self) -> None:
+            self.cursor.fetchone.return_value = (3,)
+
+            dates, values = RateHistoryLoader.load(QUERIES.COPY_RATE_HISTORY, ["BTC"])
+
+            np.testing.assert_array_equal(dates, self.dates)
+            np.testing.assert_array_equal(values, self.values)
+
+        def test_raises_on_null_value(self) -> None:
+            data: bytearray = bytearray(b"".join(self.pieces))
+            header_size: int = 11 + 8 + 4  # signature, flags and extension length, extension
+            data[header_size + 10 : header_size + 14] = struct.pack(">i", -1)  # row 0 value length
+            self.pieces = [bytes(data)]
+
+            with pytest.raises(RuntimeError, match="NULL"):
+                RateHistoryLoader.load(QUERIES.COPY_RATE_HISTORY, ["BTC"])
+
+    class Test_TextFeatures:
+        @pytest.fixture(autouse=True)
+        def prepare_tests(self) -> None:
+            self.texts: list[str] = [
+                "Bitcoin to the moon",
+                "bad day, CRASH and panic",
+                "good",
+                "nothing to see here",
+                "great gains but some fear",
+            ]
+            self.batch = MlBatch(
+                year=np.full(5, 2021, dtype=np.int16),
+                month=np.full(5, 3, dtype=np.int8),
+                day=np.array([1, 1, 2, 2, 2], dtype=np.int8),
+                hour=np.zeros(5, dtype=np.int8),
+                minute=np.zeros(5, dtype=np.int8),
+                content=StringColumn.from_strings(self.texts),
+            )
+
+        def test_scores_words_at_text_boundaries(self) -> None:
+            scores: np.ndarray = TextFeaturePipeline(workers=1).score(self.batch.content)
+
+            np.testing.assert_allclose(scores, [1.0, -1.0, 1.0, 0.0, 1 / 3])
+
+        def test_parallel_scores_match_serial_ones(self) -> None:
+            serial: np.ndarray = TextFeaturePipeline(workers=1).score(self.batch.content)
+
+            parallel: np.ndarray = TextFeaturePipeline(workers=2, chunk_rows=2).score(
+                self.batch.content
+            )
+
+            np.testing.assert_array_equal(parallel, serial)
+
+        def test_aggregates_scores_per_day(self) -> None:
+            features: DailyTextFeatures = TextFeaturePipeline(workers=1).daily_features(self.batch)
+
+            assert features.days.tolist() == [
+                np.datetime64("2021-03-01"),
+                np.datetime64("2021-03-02"),
+            ]
+            np.testing.assert_allclose(
+                features.values,
+                [[0.0, 0.5, np.log1p(2)], [(1 + 0 + 1 / 3) / 3, 2 / 3, np.log1p(3)]],
+                rtol=1e-6,
+            )
+
+        def test_days_without_text_are_zeros(self) -> None:
+            features: DailyTextFeatures = TextFeaturePipeline(workers=1).daily_features(self.batch)
+            dates: np.ndarray = np.arange("2021-02-28", "2021-03-04", dtype="datetime64[D]")
+
+            aligned: np.ndarray = features.align(dates)
+
+            np.testing.assert_array_equal(aligned[[0, 3]], 0)
+            np.testing.assert_array_equal(aligned[1:3], features.values)
+
+        def test_manager_requires_input_dim_of_features(self) -> None:
+            with pytest.raises(ValueError, match="input_dim"):
+                StockPredictorManager(StockPredictorConfig(), DailyTextFeatures())
+
+            manager = StockPredictorManager(StockPredictorConfig(input_dim=4), DailyTextFeatures())
+            dates, _ = synthetic_history(10)
+            assert manager._with_features(dates, np.ones(10, dtype=np.float32)).shape == (10, 4)
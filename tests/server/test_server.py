@@ -1,15 +1,39 @@
+import json
 import logging
+import os
+import queue
+import runpy
 from contextlib import contextmanager
-from typing import Any, Generator
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Any, Generator, Optional
 from unittest.mock import Mock
 
+import jsonschema
+import numpy as np
 import psycopg
 import pytest
+import requests
+from flask import Flask
 from flask.testing import FlaskClient
-
-from src.server import QUERIES, Server
-from src.server.auth import TokenService
-from src.server.database import DatabaseHandler, DatabaseProvider, Message
+from jsonschema.exceptions import best_match
+from werkzeug.security import generate_password_hash
+
+from src.server import CONSTANTS, PATHS, QUERIES, SchemaValidator, Server
+from src.server.auth import PasswordHasher, TokenService
+from src.server.database import (
+    DatabaseHandler,
+    DatabaseProvider,
+    DatabaseUpdater,
+    InstrumentedCursor,
+    LeaderElection,
+    Message,
+    QueryStats,
+)
+from src.server.logger import DrainingQueueListener, DroppingQueueHandler, JsonFormatter, LogManager
+from src.server.metrics import METRICS
+from src.server.profiler import ProfilerSettings, RequestProfiler
+from src.server.stock_market import StockMarketService
+from src.server.stock_market.downsampling import Downsampler
 
 
 class FakeDatabase:
@@ -19,6 +43,13 @@ class FakeDatabase:
         ] = []  # uuid, email, pwd_hash, usd, btc
         self._db_tokens: list[tuple[str, str]] = []
         self._db_prices: list[tuple[float, str]] = []  # price, date
+        self._db_assets: list[tuple[str, str, str]] = []  # symbol, name, coingecko_id
+        self._db_rates: list[tuple[str, datetime, float]] = []  # asset, date, value
+        # (asset, minute) -> open, high, low, close
+        self._db_intraday: dict[tuple[str, datetime], list[float]] = {}
+        self.partitions: list[Any] = []
+        self.notifications: list[str] = []
+        self.timezone: tzinfo = timezone.utc  # TimeZone of the connection
         self._last_query: str = ""
         self._last_params: list | tuple = []
         self._last_result: list = []
@@ -28,6 +59,39 @@ class FakeDatabase:
 
     def prefill(self) -> None:
         self._db_prices.append((3.0, "01-01-2019"))
+        self._db_assets.append(("BTC", "Bitcoin", "bitcoin"))
+
+    def clear(self) -> None:
+        self._db_users.clear()
+        self._db_tokens.clear()
+        self._db_prices.clear()
+        self._db_assets.clear()
+        self._db_rates.clear()
+        self._db_intraday.clear()
+        self.partitions.clear()
+        self.notifications.clear()
+        self.timezone = timezone.utc
+        self._last_query = ""
+        self._last_params = []
+        self._last_result = []
+        self._last_generator = self._invalid_generator()
+
+    def timestamp(self, value: str) -> datetime:
+        """Parse timestamptz parameter, like Postgres in the TimeZone of the connection."""
+        parsed: datetime = datetime.fromisoformat(value)
+        return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=self.timezone)
+
+    def daily_rows(self, asset: str) -> list[tuple[datetime, float]]:
+        """Daily prices of an asset by date, the prefilled prices being BTC ones."""
+        rows: list[tuple[datetime, float]] = [
+            (date, value) for rate_asset, date, value in self._db_rates if rate_asset == asset
+        ]
+        if asset == "BTC":
+            rows += [
+                (datetime.strptime(date, "%d-%m-%Y").replace(tzinfo=self.timezone), value)
+                for value, date in self._db_prices
+            ]
+        return sorted(rows)
 
     @property
     def db_users(self) -> list[tuple[str, str, str, str, str]]:
@@ -103,6 +167,23 @@ class FakeDatabase:
                     self._db_users[index] = (
                         old_user[:3] + (old_user[3] + params[0] * 3,) + (old_user[4] - params[0],)
                     )
+            case QUERIES.UPSERT_INTRADAY_TICK:
+                asset, tick_time, open_, high, low, close = params
+                key = (asset, tick_time.replace(second=0, microsecond=0))
+                bar: Optional[list[float]] = self._db_intraday.get(key)
+                if bar is None:
+                    self._db_intraday[key] = [open_, high, low, close]
+                else:
+                    self._db_intraday[key] = [bar[0], max(bar[1], high), min(bar[2], low), close]
+            case QUERIES.INSERT_PRICE:
+                asset, date, value = params
+                if self.timestamp(date) in [row_date for row_date, _ in self.daily_rows(asset)]:
+                    raise psycopg.IntegrityError()
+                self._db_rates.append((asset, self.timestamp(date), value))
+            case QUERIES.CREATE_INTRADAY_PARTITION | QUERIES.CREATE_RATE_HISTORY_PARTITION:
+                self.partitions.append(params[0])
+            case QUERIES.NOTIFY_DATA_UPDATED:
+                self.notifications.append(params[1])
             case _:
                 self._last_result = self.fetchall_side_effect()
                 self._last_generator = self._fetchone_generator()
@@ -139,8 +220,58 @@ class FakeDatabase:
                     for token, expiry in self.db_tokens
                     if token == self.last_params[0] and expiry > self.last_params[1]
                 ]
+            case QUERIES.SELECT_ASSETS:
+                return sorted(self._db_assets)
+            case QUERIES.SELECT_ASSET:
+                return [
+                    (symbol,) for symbol, _, _ in self._db_assets if symbol == self.last_params[0]
+                ]
             case QUERIES.SELECT_LATEST_STOCK_PRICE:
-                return [(value, data) for value, data in self.db_prices]
+                # newest of the last daily price and the last intraday bar
+                rows: list[tuple[datetime, float]] = self.daily_rows(self.last_params[0])
+                rows += [
+                    (minute, bar[3])
+                    for (asset, minute), bar in self._db_intraday.items()
+                    if asset == self.last_params[1]
+                ]
+                rows.sort(key=lambda row: row[0], reverse=True)
+                return [(value,) for _, value in rows[:1]]
+            case QUERIES.SELECT_LAST_KNOWN_DATE:
+                return [
+                    (max((date for date, _ in self.daily_rows(self.last_params[0])), default=None),)
+                ]
+            case QUERIES.SELECT_CHART:
+                asset, start, end = self.last_params
+                return [
+                    (date, value)
+                    for date, value in self.daily_rows(asset)
+                    if self.timestamp(start) <= date <= self.timestamp(end)
+                ]
+            case QUERIES.SELECT_CHART_INTRADAY:
+                resolution, _, asset, start, end, interval = self.last_params
+                end_time: datetime = (
+                    self.timestamp(end)
+                    + {
+                        "1 day": timedelta(days=1),
+                        "1 microsecond": timedelta(microseconds=1),
+                    }[interval]
+                )
+                buckets: dict[datetime, list[list[float]]] = {}
+                for (bar_asset, minute), bar in sorted(self._db_intraday.items()):
+                    if bar_asset == asset and self.timestamp(start) <= minute < end_time:
+                        bucket: datetime = datetime.fromtimestamp(
+                            minute.timestamp() // resolution * resolution, self.timezone
+                        )
+                        buckets.setdefault(bucket, []).append(bar)
+                return [
+                    (
+                        bucket,
+                        sum(bar[3] for bar in bars) / len(bars),
+                        min(bar[2] for bar in bars),
+                        max(bar[1] for bar in bars),
+                    )
+                    for bucket, bars in buckets.items()
+                ]
             case _:
                 return []
 
@@ -167,14 +298,7 @@ DATABASE = FakeDatabase()
 
 @pytest.fixture(name="clear_database", autouse=True)
 def fixture_clear_fake_database() -> None:
-    DATABASE._db_users.clear()
-    DATABASE._db_tokens.clear()
-    DATABASE._db_prices.clear()
-    DATABASE._last_query = ""
-    DATABASE._last_params = []
-    DATABASE._last_result = []
-    DATABASE._last_generator = DATABASE._invalid_generator()
-
+    DATABASE.clear()
     DATABASE.prefill()
 
 
@@ -411,6 +535,59 @@ class Test_Server:
                 )
                 assert response.status_code == 403
 
+            def test_send_503_when_password_hashing_is_overloaded(
+                self, monkeypatch: pytest.MonkeyPatch
+            ) -> None:
+                self.client.post(
+                    self.register_path,
+                    json={
+                        "email": "legit_email@gmail.com",
+                        "password": "thelegend27",
+                        "confirmPassword": "thelegend27",
+                    },
+                )
+                monkeypatch.setattr(PasswordHasher, "max_pending", 0)
+
+                response = self.client.post(
+                    self.url_path,
+                    json={"email": "legit_email@gmail.com", "password": "thelegend27"},
+                )
+                assert response.status_code == 503
+
+            def test_method_without_cost_does_not_need_rehash(
+                self, monkeypatch: pytest.MonkeyPatch
+            ) -> None:
+                monkeypatch.setattr(PasswordHasher, "method", "pbkdf2:sha256")
+
+                password_hash: str = generate_password_hash("thelegend27", "pbkdf2:sha256")
+
+                assert password_hash.startswith("pbkdf2:sha256:")
+                assert not PasswordHasher.needs_rehash(password_hash)
+                assert PasswordHasher.needs_rehash(
+                    generate_password_hash("thelegend27", "pbkdf2:sha256:1000")
+                )
+
+            def test_rehash_outdated_password_on_login(
+                self, monkeypatch: pytest.MonkeyPatch
+            ) -> None:
+                with monkeypatch.context() as context:
+                    context.setattr(PasswordHasher, "method", "pbkdf2:sha256:1000")
+                    self.client.post(
+                        self.register_path,
+                        json={
+                            "email": "legit_email@gmail.com",
+                            "password": "thelegend27",
+                            "confirmPassword": "thelegend27",
+                        },
+                    )
+
+                response = self.client.post(
+                    self.url_path,
+                    json={"email": "legit_email@gmail.com", "password": "thelegend27"},
+                )
+                assert response.status_code == 201
+                assert DATABASE.last_query == QUERIES.UPDATE_USER_PASSWORD_HASH
+
         class Test_MeEndpoint:
             @pytest.fixture(autouse=True)
             def prepare_tests(self, client: FlaskClient) -> None:
@@ -800,6 +977,346 @@ class Test_Server:
                 )
 
     class Test_Stock:
+        class Test_ChartEndpoint:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self, client: FlaskClient) -> None:
+                self.url_path: str = "api/v1/stock/chart"
+                self.client: FlaskClient = client
+
+            def test_send_400_on_invalid_resolution(self) -> None:
+                response = self.client.get(
+                    self.url_path,
+                    query_string={"from": "2019-01-01", "to": "2019-01-02", "resolution": "7m"},
+                )
+
+                assert response.status_code == 400
+
+            def test_send_400_on_too_few_points(self) -> None:
+                response = self.client.get(
+                    self.url_path,
+                    query_string={"from": "2019-01-01", "to": "2019-01-02", "points": "2"},
+                )
+
+                assert response.status_code == 400
+
+            def test_send_400_on_unknown_downsample_method(self) -> None:
+                response = self.client.get(
+                    self.url_path,
+                    query_string={"from": "2019-01-01", "to": "2019-01-02", "downsample": "avg"},
+                )
+
+                assert response.status_code == 400
+                assert "Downsample" in response.get_json()["message"]
+
+            def test_downsamples_to_max_points_by_default(
+                self, monkeypatch: pytest.MonkeyPatch
+            ) -> None:
+                monkeypatch.setattr(CONSTANTS, "CHART_MAX_POINTS", 3)
+                DATABASE._db_prices.extend(
+                    (float(day), f"{day:02}-01-2019") for day in range(2, 11)
+                )
+
+                response = self.client.get(
+                    self.url_path, query_string={"from": "2019-01-01", "to": "2019-01-10"}
+                )
+
+                assert response.status_code == 200
+                assert len(response.get_json()) == 3
+
+            def test_lttb_places_prices_at_their_dates(self) -> None:
+                values: list[float] = [0.1, 0.0, 0.6, 0.7, 0.2, 0.6, 1.9, 2.8, 2.1, 0.8, 0.2, 0.3]
+                days: list[int] = [
+                    0,
+                    1,
+                    2,
+                    3,
+                    4,
+                    5,
+                    30,
+                    31,
+                    32,
+                    33,
+                    34,
+                    35,
+                ]  # a month without prices
+                dates: list[datetime] = [datetime(2019, 1, 1) + timedelta(days=day) for day in days]
+                DATABASE._db_prices[:] = [
+                    (value, date.strftime("%d-%m-%Y")) for value, date in zip(values, dates)
+                ]
+
+                response = self.client.get(
+                    self.url_path,
+                    query_string={"from": "2019-01-01", "to": "2019-02-28", "points": "5"},
+                )
+
+                # equally spaced points would give indices 0, 1, 6, 7 and 11
+                assert [point["date"] for point in response.get_json()] == [
+                    dates[index].strftime("%Y-%m-%d") for index in (0, 3, 4, 7, 11)
+                ]
+
+        class Test_MultipleAssets:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self, client: FlaskClient) -> None:
+                self.client: FlaskClient = client
+                DATABASE._db_assets.append(("ETH", "Ethereum", "ethereum"))
+                for day in range(2, 5):
+                    date = datetime(2019, 1, day, tzinfo=timezone.utc)
+                    DATABASE._db_rates.append(("BTC", date, 1000.0 + day))
+                    DATABASE._db_rates.append(("ETH", date, 100.0 + day))
+
+            def get_chart(self, asset: str) -> list[dict[str, Any]]:
+                response = self.client.get(
+                    "api/v1/stock/chart",
+                    query_string={"asset": asset, "from": "2019-01-01", "to": "2019-01-10"},
+                )
+                assert response.status_code == 200
+                return response.get_json()
+
+            def test_lists_assets(self) -> None:
+                response = self.client.get("api/v1/stock/assets")
+
+                assert [asset["symbol"] for asset in response.get_json()["assets"]] == [
+                    "BTC",
+                    "ETH",
+                ]
+
+            def test_chart_of_non_default_asset(self) -> None:
+                assert self.get_chart("eth") == [
+                    {"date": f"2019-01-0{day}", "avg": 100.0 + day} for day in range(2, 5)
+                ]
+
+            def test_chart_of_default_asset_has_only_its_prices(self) -> None:
+                assert [point["avg"] for point in self.get_chart("btc")] == [
+                    3.0,
+                    1002.0,
+                    1003.0,
+                    1004.0,
+                ]
+
+            def test_price_of_each_asset(self) -> None:
+                btc = self.client.get("api/v1/stock/price").get_json()["price"]
+                eth = self.client.get("api/v1/stock/price", query_string={"asset": "ETH"})
+
+                assert btc == 1004.0
+                assert eth.get_json()["price"] == 104.0
+
+            def test_intraday_close_of_other_asset_is_not_price(self) -> None:
+                minute = datetime(2024, 3, 1, 10, 0, tzinfo=timezone.utc)
+                DATABASE._db_intraday[("ETH", minute)] = [40.0, 45.0, 39.0, 42.5]
+
+                response = self.client.get("api/v1/stock/price")
+
+                assert response.get_json()["price"] == 1004.0
+
+        class Test_DailyPricesUpdate:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self, monkeypatch: pytest.MonkeyPatch) -> None:
+                self.prices: dict[str, float] = {"bitcoin": 30000.0, "ethereum": 2000.0}
+                self.get: Mock = Mock(side_effect=self.response)
+                monkeypatch.setattr(requests, "get", self.get)
+                DATABASE._db_assets.append(("ETH", "Ethereum", "ethereum"))
+                self.today: datetime = datetime.combine(
+                    date.today(), datetime.min.time(), timezone.utc
+                )
+
+            def response(self, url: str) -> Mock:
+                coingecko_id: str = url.split("/coins/")[1].split("/")[0]
+                price: dict[str, Any] = {"current_price": {"usd": self.prices[coingecko_id]}}
+                return Mock(json=Mock(return_value={"market_data": price}))
+
+            def days_ago(self, days: int) -> datetime:
+                return self.today - timedelta(days=days)
+
+            def test_each_asset_is_updated_from_its_last_known_date(self) -> None:
+                DATABASE._db_rates.append(("BTC", self.days_ago(1), 29000.0))
+                DATABASE._db_rates.append(("ETH", self.days_ago(3), 1900.0))
+
+                DatabaseUpdater.daily_prices_update()
+
+                assert DATABASE.daily_rows("BTC")[-2:] == [
+                    (self.days_ago(1), 29000.0),
+                    (self.today, 30000.0),
+                ]
+                assert DATABASE.daily_rows("ETH") == [
+                    (self.days_ago(3), 1900.0),
+                    (self.days_ago(2), 2000.0),
+                    (self.days_ago(1), 2000.0),
+                    (self.today, 2000.0),
+                ]
+                assert self.get.call_count == 4
+                assert DATABASE.notifications == ["prices"] * 4
+
+            def test_partition_is_created_before_insert(self) -> None:
+                DATABASE._db_rates.append(("BTC", self.days_ago(1), 29000.0))
+                DATABASE._db_rates.append(("ETH", self.days_ago(1), 1900.0))
+
+                DatabaseUpdater.daily_prices_update()
+
+                assert DATABASE.partitions == [self.today.strftime("%Y-%m-%d")] * 2
+
+            def test_asset_without_prices_starts_today(self) -> None:
+                DATABASE._db_rates.append(("BTC", self.today, 29000.0))
+
+                DatabaseUpdater.daily_prices_update()
+
+                assert DATABASE.daily_rows("ETH") == [(self.today, 2000.0)]
+                assert self.get.call_count == 1
+
+        class Test_MultiAssetMigration:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self) -> None:
+                with open(PATHS.DATABASE_SCHEMA) as file:
+                    self.schema: str = file.read()
+                with open(
+                    PATHS.RESOURCES + "migrations/001_multi_asset_exchange_rate_history.sql"
+                ) as file:
+                    self.migration: str = file.read()
+
+            @staticmethod
+            def statement(sql: str, start: str) -> str:
+                begin: int = sql.index(start)
+                return sql[begin : sql.index(";", sql.index(")", begin)) + 1]
+
+            def test_creates_table_of_schema(self) -> None:
+                table: str = self.statement(self.migration, "CREATE TABLE exchange_rate_history\n")
+
+                assert table.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS") in self.schema
+
+            def test_creates_partition_function_of_schema(self) -> None:
+                start: str = "CREATE OR REPLACE FUNCTION create_exchange_rate_history_partition"
+                bodies: list[str] = [
+                    sql[sql.index(start) :].split("$$")[1] for sql in (self.migration, self.schema)
+                ]
+
+                assert bodies[0] == bodies[1]
+
+            def test_checks_row_count_before_dropping_old_table(self) -> None:
+                check: int = self.migration.index("RAISE EXCEPTION")
+
+                assert check < self.migration.index(
+                    "DROP TABLE exchange_rate_history_unpartitioned"
+                )
+
+        class Test_IntradayChartEndpoint:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self, client: FlaskClient) -> None:
+                self.url_path: str = "api/v1/stock/chart"
+                self.client: FlaskClient = client
+                for hour, minute, price in [(10, 0, 1.0), (10, 1, 2.0), (23, 59, 3.0)]:
+                    time = datetime(2024, 3, 1, hour, minute, tzinfo=timezone.utc)
+                    DATABASE._db_intraday[("BTC", time)] = [price, price, price, price]
+
+            def get_dates(self, to: str) -> list[str]:
+                response = self.client.get(
+                    self.url_path,
+                    query_string={"from": "2024-03-01", "to": to, "resolution": "1m"},
+                )
+                assert response.status_code == 200
+                return [point["date"] for point in response.get_json()]
+
+            def test_dates_are_utc_in_any_connection_timezone(self) -> None:
+                DATABASE.timezone = timezone(timedelta(hours=2))
+
+                dates: list[str] = self.get_dates("2024-03-01T23:59:00Z")
+
+                assert dates == [
+                    "2024-03-01T10:00:00Z",
+                    "2024-03-01T10:01:00Z",
+                    "2024-03-01T23:59:00Z",
+                ]
+
+            def test_date_only_to_includes_whole_day(self) -> None:
+                assert self.get_dates("2024-03-01")[-1] == "2024-03-01T23:59:00Z"
+
+            def test_timestamp_to_includes_bar_starting_at_it(self) -> None:
+                dates: list[str] = self.get_dates("2024-03-01T10:01:00Z")
+
+                assert dates == ["2024-03-01T10:00:00Z", "2024-03-01T10:01:00Z"]
+
+            def test_buckets_aggregate_bars(self) -> None:
+                response = self.client.get(
+                    self.url_path,
+                    query_string={"from": "2024-03-01", "to": "2024-03-01", "resolution": "1h"},
+                )
+
+                assert response.get_json()[0] == {
+                    "date": "2024-03-01T10:00:00Z",
+                    "avg": 1.5,
+                    "low": 1.0,
+                    "high": 2.0,
+                }
+
+        class Test_IntradayPricesUpdate:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self, monkeypatch: pytest.MonkeyPatch) -> None:
+                self.quotes: list[dict[str, dict[str, float]]] = []
+                self.get: Mock = Mock(
+                    side_effect=lambda url, timeout: Mock(
+                        json=Mock(return_value=self.quotes.pop(0))
+                    )
+                )
+                monkeypatch.setattr(requests, "get", self.get)
+                self.time: datetime = datetime(2024, 3, 1, 10, 0, 5, tzinfo=timezone.utc)
+
+            def quote(self, price: float, seconds: int) -> dict[str, dict[str, float]]:
+                return {
+                    "bitcoin": {"usd": price, "last_updated_at": self.time.timestamp() + seconds}
+                }
+
+            def test_merges_ticks_of_a_minute_into_a_bar(self) -> None:
+                self.quotes = [self.quote(100.0, 0), self.quote(120.0, 20), self.quote(90.0, 40)]
+
+                for _ in range(3):
+                    DatabaseUpdater.intraday_prices_update()
+
+                minute: datetime = self.time.replace(second=0)
+                assert DATABASE._db_intraday == {("BTC", minute): [100.0, 120.0, 90.0, 90.0]}
+                assert DATABASE.partitions == [
+                    self.time + timedelta(seconds=s) for s in (0, 20, 40)
+                ]
+                assert DATABASE.notifications == ["intraday"] * 3
+                assert "ids=bitcoin" in self.get.call_args.args[0]
+
+            def test_ticks_of_next_minute_start_a_new_bar(self) -> None:
+                self.quotes = [self.quote(100.0, 0), self.quote(110.0, 60)]
+
+                DatabaseUpdater.intraday_prices_update()
+                DatabaseUpdater.intraday_prices_update()
+
+                assert len(DATABASE._db_intraday) == 2
+
+            def test_writes_nothing_when_request_fails(self) -> None:
+                self.get.side_effect = requests.ConnectionError("offline")
+
+                DatabaseUpdater.intraday_prices_update()
+
+                assert not DATABASE._db_intraday and not DATABASE.notifications
+
+        class Test_Downsampler:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self) -> None:
+                self.values: np.ndarray = np.cumsum(np.random.default_rng(0).normal(size=1000))
+
+            def test_lttb_keeps_ends_within_points(self) -> None:
+                indices = Downsampler.lttb(self.values, 100)
+
+                assert len(indices) == 100
+                assert indices[0] == 0 and indices[-1] == len(self.values) - 1
+                assert np.all(np.diff(indices) > 0)
+
+            def test_aggregated_dates_are_utc_midnight(self) -> None:
+                midnight = datetime(2019, 1, 2, tzinfo=timezone.utc)
+
+                assert StockMarketService._epoch(midnight.date()) == midnight.timestamp()
+                assert StockMarketService._epoch(midnight) == midnight.timestamp()
+
+            def test_min_max_keeps_extremes(self) -> None:
+                indices = Downsampler.min_max(self.values, 100)
+
+                assert len(indices) <= 100
+                assert self.values[indices].min() == self.values.min()
+                assert self.values[indices].max() == self.values.max()
+
         class Test_PriceEndpoint:
             @pytest.fixture(autouse=True)
             def prepare_tests(self, client: FlaskClient) -> None:
@@ -828,3 +1345,470 @@ class Test_Server:
                 response = self.client.get(self.url_path)
 
                 assert response.status_code == 500
+
+            def test_send_newer_intraday_close(self) -> None:
+                minute = datetime(2024, 3, 1, 10, 0, tzinfo=timezone.utc)
+                DATABASE._db_intraday[("BTC", minute)] = [40.0, 45.0, 39.0, 42.5]
+
+                response = self.client.get(self.url_path)
+
+                assert response.get_json()["price"] == 42.5
+
+            def test_send_newer_daily_price(self) -> None:
+                minute = datetime(2018, 3, 1, 10, 0, tzinfo=timezone.utc)
+                DATABASE._db_intraday[("BTC", minute)] = [40.0, 45.0, 39.0, 42.5]
+
+                response = self.client.get(self.url_path)
+
+                assert response.get_json()["price"] == float(DATABASE.db_prices[0][0])
+
+            def test_send_404_on_unknown_asset(self) -> None:
+                response = self.client.get(self.url_path, query_string={"asset": "doge"})
+
+                assert response.status_code == 404
+
+    class Test_SchemaValidator:
+        @pytest.fixture(autouse=True)
+        def prepare_tests(self, server: Server) -> None:
+            self.app: Flask = server.app
+            self.endpoint: Mock = Mock(return_value="ok")
+
+        def call(self, schema: str, payload: Any) -> Any:
+            with self.app.test_request_context(json=payload):
+                return SchemaValidator.validate(schema)(self.endpoint)()
+
+        @pytest.mark.parametrize(
+            "payload",
+            [{}, {"email": 1, "password": "x"}, {"email": "a@b.pl", "password": "x", "x": []}],
+        )
+        def test_reports_same_error_as_jsonschema_validate(self, payload: dict) -> None:
+            validator = SchemaValidator.get_validator("login")
+
+            with pytest.raises(jsonschema.ValidationError) as expected:
+                jsonschema.validate(payload, SchemaValidator.get_schema("login"))
+
+            assert validator.is_valid(payload) is False
+            assert best_match(validator.iter_errors(payload)).message == expected.value.message
+
+        def test_send_400_on_invalid_payload(self) -> None:
+            response = self.call("login", {"email": 1})
+
+            assert response.status_code == 400
+            assert response.get_json() == {"message": "Invalid Json format"}
+            self.endpoint.assert_not_called()
+
+        def test_unknown_schema_accepts_any_json(self) -> None:
+            assert self.call("unknown", {"anything": [1, 2]}) == "ok"
+            assert SchemaValidator.get_schema("unknown") == {}
+
+    class Test_Startup:
+        @pytest.fixture(autouse=True)
+        def prepare_tests(self, monkeypatch: pytest.MonkeyPatch) -> None:
+            self.components: dict[str, Mock] = {}
+            for component in (
+                LogManager,
+                RequestProfiler,
+                SchemaValidator,
+                DatabaseProvider,
+                PasswordHasher,
+                DatabaseUpdater,
+            ):
+                self.components[component.__name__] = Mock()
+                monkeypatch.setattr(component, "initialize", self.components[component.__name__])
+            self.config: dict[str, Any] = runpy.run_path("gunicorn.conf.py")
+
+        def calls(self) -> dict[str, int]:
+            return {name: mock.call_count for name, mock in self.components.items()}
+
+        def test_preload_does_not_start_server(self) -> None:
+            server: Server = Server(preload=True)
+
+            assert self.calls() == {
+                "LogManager": 0,
+                "RequestProfiler": 1,
+                "SchemaValidator": 1,
+                "DatabaseProvider": 0,
+                "PasswordHasher": 0,
+                "DatabaseUpdater": 0,
+            }
+            assert set(server.startup_times) == {"RequestProfiler", "SchemaValidator"}
+
+        def test_post_fork_starts_server_once_per_worker(self) -> None:
+            server: Server = Server(preload=True)
+            workers: list[Mock] = [Mock(), Mock()]
+
+            for worker in workers:
+                worker.app.wsgi.return_value = server.app
+                self.config["post_fork"](Mock(), worker)
+
+            assert self.calls() == {
+                "LogManager": 2,
+                "RequestProfiler": 1,
+                "SchemaValidator": 1,
+                "DatabaseProvider": 2,
+                "PasswordHasher": 2,
+                "DatabaseUpdater": 2,
+            }
+            assert set(server.startup_times) == set(self.components)
+
+        def test_reports_startup_times(self, caplog: pytest.LogCaptureFixture) -> None:
+            server: Server = Server(preload=True)
+
+            with caplog.at_level(logging.INFO):
+                server.start()
+
+            report: str = [r.getMessage() for r in caplog.records if "Startup" in r.msg][-1]
+            for name, seconds in server.startup_times.items():
+                assert f"{name} {seconds * 1000:.1f} ms" in report
+                assert METRICS.STARTUP_DURATION.value(name) == seconds
+
+        def test_one_worker_by_default(self, monkeypatch: pytest.MonkeyPatch) -> None:
+            monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+
+            assert runpy.run_path("gunicorn.conf.py")["workers"] == 1
+
+    class Test_Internal:
+        class Test_MetricsEndpoint:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self, client: FlaskClient, monkeypatch: pytest.MonkeyPatch) -> None:
+                self.url_path: str = "internal/metrics"
+                self.client: FlaskClient = client
+                self.headers: dict[str, str] = {TokenService.INTERNAL_TOKEN_HEADER: "internal"}
+                monkeypatch.setattr(TokenService, "_internal_token", "internal")
+
+            def test_send_200_with_request_durations(self) -> None:
+                self.client.get("api/v1/stock/price")
+
+                response = self.client.get(self.url_path, headers=self.headers)
+                actual: str = response.get_data(as_text=True)
+
+                assert response.status_code == 200
+                assert response.content_type.startswith("text/plain")
+                assert "# TYPE ctb_http_request_duration_seconds histogram" in actual
+                assert (
+                    'ctb_http_request_duration_seconds_count{method="GET",'
+                    f'route="/api/v1/stock/price",status="200",pid="{os.getpid()}"}}' in actual
+                )
+
+            def test_send_401_on_missing_token(self) -> None:
+                response = self.client.get(self.url_path)
+
+                assert response.status_code == 401
+
+            def test_send_404_when_token_not_configured(
+                self, monkeypatch: pytest.MonkeyPatch
+            ) -> None:
+                monkeypatch.setattr(TokenService, "_internal_token", "")
+
+                response = self.client.get(self.url_path, headers=self.headers)
+
+                assert response.status_code == 404
+
+        class Test_DataUpdateListener:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self, monkeypatch: pytest.MonkeyPatch) -> None:
+                self.model: Mock = Mock()
+                monkeypatch.setattr(DatabaseUpdater, "_stock_predictor", self.model)
+                monkeypatch.setattr(LeaderElection, "is_leader", False)
+
+            def test_follower_drops_model_on_new_predictions(self) -> None:
+                DatabaseUpdater._on_data_updated("predictions")
+
+                assert DatabaseUpdater._stock_predictor is None
+
+            def test_follower_keeps_model_on_new_prices(self) -> None:
+                DatabaseUpdater._on_data_updated("prices")
+
+                assert DatabaseUpdater._stock_predictor is self.model
+
+            def test_leader_keeps_its_model(self, monkeypatch: pytest.MonkeyPatch) -> None:
+                monkeypatch.setattr(LeaderElection, "is_leader", True)
+
+                DatabaseUpdater._on_data_updated("predictions")
+
+                assert DatabaseUpdater._stock_predictor is self.model
+
+            def test_dispatches_known_payload(self, monkeypatch: pytest.MonkeyPatch) -> None:
+                listener: Mock = Mock()
+                monkeypatch.setattr(LeaderElection, "listeners", [listener])
+                count: float = METRICS.DATA_UPDATE_NOTIFICATIONS.value("prices")
+
+                LeaderElection._dispatch(
+                    psycopg.Notify(LeaderElection.DATA_UPDATED_CHANNEL, "prices", 1)
+                )
+
+                listener.assert_called_once_with("prices")
+                assert METRICS.DATA_UPDATE_NOTIFICATIONS.value("prices") == count + 1
+
+            def test_ignores_unknown_payload(self, monkeypatch: pytest.MonkeyPatch) -> None:
+                listener: Mock = Mock()
+                monkeypatch.setattr(LeaderElection, "listeners", [listener])
+                count: float = METRICS.DATA_UPDATE_NOTIFICATIONS.value("other")
+
+                LeaderElection._dispatch(
+                    psycopg.Notify(LeaderElection.DATA_UPDATED_CHANNEL, "x" * 64, 1)
+                )
+
+                listener.assert_not_called()
+                assert METRICS.DATA_UPDATE_NOTIFICATIONS.value("other") == count + 1
+                assert METRICS.DATA_UPDATE_NOTIFICATIONS.value("x" * 64) == 0
+
+        class Test_SchedulerGating:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self, monkeypatch: pytest.MonkeyPatch) -> None:
+                self.start: Mock = Mock()
+                monkeypatch.setattr(LeaderElection, "start", self.start)
+                monkeypatch.setattr(LeaderElection, "listeners", [])
+
+            def test_disabled_scheduler_does_not_compete(
+                self, monkeypatch: pytest.MonkeyPatch
+            ) -> None:
+                monkeypatch.setattr(CONSTANTS, "RUN_SCHEDULER", False)
+
+                DatabaseUpdater.initialize()
+
+                self.start.assert_not_called()
+                assert LeaderElection.listeners == []
+
+            def test_enabled_scheduler_competes_and_subscribes_once(
+                self, monkeypatch: pytest.MonkeyPatch
+            ) -> None:
+                monkeypatch.setattr(CONSTANTS, "RUN_SCHEDULER", True)
+
+                DatabaseUpdater.initialize()
+                DatabaseUpdater.initialize()
+
+                assert self.start.call_args.kwargs == {
+                    "on_elected": DatabaseUpdater._start_scheduler,
+                    "on_demoted": DatabaseUpdater._stop_scheduler,
+                }
+                assert LeaderElection.listeners == [DatabaseUpdater._on_data_updated]
+
+        class Test_StockPredictorLoading:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> None:
+                import src.model  # pylint: disable=import-outside-toplevel
+
+                self.manager: Mock = Mock()
+                monkeypatch.setattr(
+                    src.model, "StockPredictorManager", Mock(return_value=self.manager)
+                )
+                monkeypatch.setattr(DatabaseUpdater, "_stock_predictor", None)
+                self.saved: str = str(tmp_path / "saved.pt")
+                self.shipped: str = str(tmp_path / "shipped.pt")
+                monkeypatch.setattr(PATHS, "MODEL_ARTIFACT", self.saved)
+                monkeypatch.setattr(PATHS, "SHIPPED_MODEL_ARTIFACT", self.shipped)
+                open(self.shipped, "wb").close()
+
+            def test_loads_saved_model(self) -> None:
+                open(self.saved, "wb").close()
+
+                DatabaseUpdater.get_stock_predictor()
+
+                self.manager.load_model.assert_called_once_with(self.saved)
+
+            def test_falls_back_to_shipped_model(self) -> None:
+                DatabaseUpdater.get_stock_predictor()
+
+                self.manager.load_model.assert_called_once_with(self.shipped)
+
+            def test_skips_model_not_fitting_architecture(self) -> None:
+                open(self.saved, "wb").close()
+                self.manager.load_model.side_effect = [RuntimeError("size mismatch"), None]
+
+                assert DatabaseUpdater.get_stock_predictor() is self.manager
+                assert self.manager.load_model.call_count == 2
+
+        class Test_Logging:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self) -> None:
+                self.queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=1)
+                self.handler: DroppingQueueHandler = DroppingQueueHandler(self.queue)
+                self.logger: logging.Logger = logging.Logger("ctb.test")
+                self.logger.addHandler(self.handler)
+
+            def test_drops_and_counts_records_when_queue_is_full(self) -> None:
+                dropped: float = METRICS.LOG_RECORDS_DROPPED.value("WARNING")
+
+                self.logger.warning("first")
+                self.logger.warning("second")
+
+                assert self.queue.get_nowait().getMessage() == "first"
+                assert self.queue.empty()
+                assert self.handler.dropped == 1
+                assert METRICS.LOG_RECORDS_DROPPED.value("WARNING") == dropped + 1
+
+            def test_mutable_arguments_are_formatted_at_call_time(self) -> None:
+                state: list[int] = [1]
+
+                self.logger.warning("state %s of %s", state, "asset")
+                state.append(2)
+
+                assert self.queue.get_nowait().getMessage() == "state [1] of asset"
+
+            def test_immutable_arguments_are_formatted_later(self) -> None:
+                self.logger.warning("price of %s is %.2f", "BTC", 1.5)
+
+                record: logging.LogRecord = self.queue.get_nowait()
+                assert record.args == ("BTC", 1.5)
+                assert record.getMessage() == "price of BTC is 1.50"
+
+            def test_json_formatter_writes_record_fields(self) -> None:
+                try:
+                    raise ValueError("broken")
+                except ValueError:
+                    self.logger.exception("failed %s", "update")
+
+                entry: dict[str, Any] = json.loads(JsonFormatter().format(self.queue.get_nowait()))
+                assert entry["level"] == "ERROR"
+                assert entry["logger"] == "ctb.test"
+                assert entry["message"] == "failed update"
+                assert entry["function"] == "test_json_formatter_writes_record_fields"
+                assert entry["location"].startswith("test_server.py:")
+                assert "ValueError: broken" in entry["exception"]
+                assert datetime.fromisoformat(entry["time"])
+
+            def test_listener_stops_with_full_queue(self) -> None:
+                target: Mock = Mock(spec=logging.Handler, level=logging.NOTSET)
+                listener = DrainingQueueListener(self.queue, target)
+                self.logger.warning("queued")
+                listener.start()
+
+                for _ in range(100):
+                    self.logger.warning("more")
+                listener.stop()
+
+                assert target.handle.call_count >= 1
+                assert listener._thread is None
+
+            def test_listener_gives_up_when_records_are_not_taken(self) -> None:
+                listener = DrainingQueueListener(self.queue)
+                listener.stop_timeout = 0.01
+                thread: Mock = Mock()  # a thread which never takes records
+                listener._thread = thread
+                self.logger.warning("queued")
+
+                listener.stop()
+
+                thread.join.assert_not_called()
+
+        class Test_SlowQueryExplain:
+            provider_handler = DatabaseProvider.handler  # before the handler fixture mocks it
+
+            @pytest.fixture(autouse=True)
+            def prepare_tests(self, monkeypatch: pytest.MonkeyPatch) -> None:
+                self.connection: Mock = Mock()
+                self.connection.info.transaction_status = psycopg.pq.TransactionStatus.INTRANS
+                self.connection.rollback.side_effect = lambda: setattr(
+                    self.connection.info, "transaction_status", psycopg.pq.TransactionStatus.IDLE
+                )
+                self.cursor: InstrumentedCursor = InstrumentedCursor.__new__(InstrumentedCursor)
+                self.cursor._conn = self.connection
+                self.cursor._stats = None
+                self.connection.cursor.return_value = self.cursor
+                monkeypatch.setattr(DatabaseProvider, "connection", self.connection)
+                monkeypatch.setattr(CONSTANTS, "SLOW_QUERY_THRESHOLD", 0.0)
+                monkeypatch.setattr(CONSTANTS, "SLOW_QUERY_EXPLAIN_RATE", 1.0)
+                self.explain: Mock = Mock(
+                    side_effect=lambda stats: self.connection.commit.assert_not_called()
+                )
+                monkeypatch.setattr(InstrumentedCursor, "_explain", self.explain)
+
+            def run_slow_query(self, error: Optional[Exception] = None) -> DatabaseHandler:
+                with self.provider_handler() as handler:
+                    handler()._stats = QueryStats(QUERIES.SELECT_CHART, [], "SELECT_CHART")
+                    if error is not None:
+                        raise error
+                return handler
+
+            def test_explains_slow_query_before_commit(self) -> None:
+                handler: DatabaseHandler = self.run_slow_query()
+
+                assert handler.success
+                self.explain.assert_called_once()
+                self.connection.commit.assert_called_once()
+
+            def test_does_not_explain_slow_query_of_failed_handler(self) -> None:
+                count: float = METRICS.DATABASE_SLOW_QUERIES.value("SELECT_CHART")
+
+                handler: DatabaseHandler = self.run_slow_query(psycopg.DataError("invalid"))
+
+                assert not handler.success
+                self.connection.rollback.assert_called_once()
+                self.explain.assert_not_called()
+                assert METRICS.DATABASE_SLOW_QUERIES.value("SELECT_CHART") == count + 1
+
+            def test_does_not_explain_outside_transaction(self) -> None:
+                self.connection.info.transaction_status = psycopg.pq.TransactionStatus.INERROR
+
+                self.run_slow_query()
+
+                self.explain.assert_not_called()
+
+            def test_explains_only_queries_without_side_effects(self) -> None:
+                explainable: frozenset[str] = InstrumentedCursor.explainable_queries
+
+                assert explainable <= set(InstrumentedCursor.query_names.values())
+                for name in explainable:
+                    query: str = getattr(QUERIES, name)
+                    assert query.lstrip().upper().startswith("SELECT")
+                    assert "pg_" not in query and "create_" not in query
+                assert "NOTIFY_DATA_UPDATED" not in explainable
+                assert "TRY_ADVISORY_LOCK" not in explainable
+                assert "CREATE_RATE_HISTORY_PARTITION" not in explainable
+
+        class Test_ProfilerEndpoint:
+            @pytest.fixture(autouse=True)
+            def prepare_tests(
+                self, client: FlaskClient, monkeypatch: pytest.MonkeyPatch
+            ) -> Generator[None, None, None]:
+                self.url_path: str = "internal/profiler"
+                self.client: FlaskClient = client
+                self.headers: dict[str, str] = {TokenService.INTERNAL_TOKEN_HEADER: "internal"}
+                monkeypatch.setattr(TokenService, "_internal_token", "internal")
+                settings: ProfilerSettings = RequestProfiler.settings
+                yield
+                RequestProfiler.settings = settings
+
+            def test_send_200_on_success(self) -> None:
+                response = self.client.post(
+                    self.url_path,
+                    json={"sample_rate": 0.25, "route": "/stock/"},
+                    headers=self.headers,
+                )
+
+                assert response.status_code == 200
+                assert response.get_json()["sample_rate"] == 0.25
+                assert (
+                    self.client.get(self.url_path, headers=self.headers).get_json()["route"]
+                    == "/stock/"
+                )
+
+            def test_send_400_on_invalid_json_format(self) -> None:
+                response = self.client.post(
+                    self.url_path, json={"sample_rate": 2}, headers=self.headers
+                )
+
+                assert response.status_code == 400
+
+            def test_send_400_on_too_short_interval(self) -> None:
+                response = self.client.post(
+                    self.url_path, json={"interval": 1e-9}, headers=self.headers
+                )
+
+                assert response.status_code == 400
+
+            def test_send_401_when_unauthorized_no_token(self) -> None:
+                response = self.client.post(self.url_path, json={"sample_rate": 0.25})
+
+                assert response.status_code == 401
+                assert RequestProfiler.settings.sample_rate != 0.25
+
+            def test_send_404_when_internal_token_not_set(
+                self, monkeypatch: pytest.MonkeyPatch
+            ) -> None:
+                monkeypatch.setattr(TokenService, "_internal_token", "")
+
+                response = self.client.get(self.url_path, headers=self.headers)
+
+                assert response.status_code == 404